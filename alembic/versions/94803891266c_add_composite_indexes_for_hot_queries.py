@@ -0,0 +1,42 @@
+"""add composite indexes for hot queries
+
+Revision ID: 94803891266c
+Revises: '6b56716a0d2b'
+Create Date: 2026-10-19 09:12:31.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '94803891266c'
+down_revision = '6b56716a0d2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Saldo (SUM por usuario y estados) y validación de cruces/periodos por usuario
+    op.create_index('ix_vacation_periods_user_status', 'vacation_periods', ['user_id', 'status'], unique=False)
+    op.create_index('ix_vacation_periods_user_start', 'vacation_periods', ['user_id', 'start_date'], unique=False)
+    # Colas del dashboard/reportes: status = X AND start_date >= hoy ORDER BY start_date
+    op.create_index('ix_vacation_periods_status_start', 'vacation_periods', ['status', 'start_date'], unique=False)
+    # Historial de una vacación ordenado por fecha
+    op.create_index('ix_vacation_logs_period_created', 'vacation_logs', ['vacation_period_id', 'created_at'], unique=False)
+    # Bandejas 'pending_review' (se unen por vacation_period_id)
+    op.create_index('ix_modification_requests_status_period', 'modification_requests', ['status', 'vacation_period_id'], unique=False)
+    op.create_index('ix_suspension_requests_status_period', 'suspension_requests', ['status', 'vacation_period_id'], unique=False)
+
+
+def downgrade() -> None:
+    # MySQL descarta el índice implícito de una FK cuando otro índice la cubre;
+    # antes de borrar los compuestos dejamos índices simples para user_id y vacation_period_id.
+    op.create_index('ix_vacation_periods_user_id', 'vacation_periods', ['user_id'], unique=False)
+    op.create_index('ix_vacation_logs_vacation_period_id', 'vacation_logs', ['vacation_period_id'], unique=False)
+    op.drop_index('ix_suspension_requests_status_period', table_name='suspension_requests')
+    op.drop_index('ix_modification_requests_status_period', table_name='modification_requests')
+    op.drop_index('ix_vacation_logs_period_created', table_name='vacation_logs')
+    op.drop_index('ix_vacation_periods_status_start', table_name='vacation_periods')
+    op.drop_index('ix_vacation_periods_user_start', table_name='vacation_periods')
+    op.drop_index('ix_vacation_periods_user_status', table_name='vacation_periods')
@@ -1,23 +1,17 @@
 # app/api/calculator.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel
 from datetime import date
 from sqlalchemy.orm import Session
 
 from app import crud
 from app.auth import get_current_user
-from app.db import SessionLocal
+from app.db import get_db
 from app.logic.vacation_calculator import VacationCalculator
+from app.ratelimit import limiter, RATELIMIT_CALCULATOR
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 class DateCalculationRequest(BaseModel):
     start_date: date
     period_type: int
@@ -25,7 +19,9 @@ class DateCalculationRequest(BaseModel):
     vacation_id: int = None  # <--- NUEVO CAMPO OPCIONAL
 
 @router.post("/calculate-end-date", name="api_calculate_end_date")
+@limiter.limit(RATELIMIT_CALCULATOR)  # reemplaza el límite global para esta ruta
 def calculate_end_date_api(
+    request: Request,
     calc_request: DateCalculationRequest,
     current=Depends(get_current_user), 
     db: Session = Depends(get_db)
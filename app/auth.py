@@ -71,6 +71,11 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
         print(f"ALERTA: Usuario {user_email} autenticado por Google, pero no encontrado en la BD.")
         raise HTTPException(status_code=302, detail="Usuario no autorizado", headers={"Location": login_url})
 
+    # La sincronización y la carga masiva desactivan (ya no borran) a quien deja la institución:
+    # un token emitido antes de la baja no debe seguir dando acceso.
+    if not user.is_active:
+        raise HTTPException(status_code=302, detail="Usuario inactivo", headers={"Location": login_url + "?error=inactive"})
+
     return user
 
 # --- Funciones de Roles (Dependen de get_current_user) ---
@@ -0,0 +1,218 @@
+# app/cache.py
+# Caché compartida con invalidación por etiquetas.
+#
+# Una interfaz, dos backends (CACHE_URL):
+# - "memory://" (por defecto): LRU con TTL dentro del proceso. Sin dependencias; con varios
+#   workers cada uno tiene su copia y una invalidación solo llega al worker que la hizo
+#   (el TTL acota cuánto puede durar un dato viejo en los demás).
+# - "redis://host:6379/1": compartida por todos los workers; una invalidación llega a todos.
+#
+# Etiquetas: cada etiqueta tiene un número de versión en el backend. Una entrada guarda las
+# versiones de sus etiquetas al crearse y deja de valer cuando alguna cambia.
+# invalidate_tags() solo incrementa contadores: no hace falta saber qué claves usan la etiqueta.
+#
+# Solo se guardan datos simples (dicts, sets, fechas), nunca objetos ORM ligados a una sesión.
+
+import os
+import time
+import pickle
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 300))     # segundos
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))    # solo backend en memoria
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "vacaciones")
+
+logger = logging.getLogger("app.cache")
+
+class Cache(ABC):
+    """
+    Interfaz común. get/set/add/delete se resuelven aquí sobre los métodos abstractos que
+    implementa cada backend (_raw, versiones de etiqueta, incremento y vaciado): un backend
+    incompleto falla al instanciarse, no en el primer uso.
+    """
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._get_raw(key)
+        if entry is None:
+            return default
+        versions, value = entry
+        if versions and self.tag_versions(versions.keys()) != versions:
+            return default
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = (), versions: dict = None):
+        if versions is None:
+            versions = self.tag_versions(tags)
+        self._set_raw(key, (versions, value), ttl or CACHE_DEFAULT_TTL)
+
+    def get_or_set(self, key: str, compute: Callable[[], Any], ttl: Optional[int] = None, tags: Iterable[str] = ()) -> Any:
+        """
+        Devuelve el valor cacheado o lo calcula y guarda.
+        Las versiones se leen ANTES de calcular: si alguien invalida mientras tanto,
+        lo guardado ya nace vencido en vez de quedar un valor viejo como vigente.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        versions = self.tag_versions(tags)
+        value = compute()
+        self.set(key, value, ttl, versions=versions)
+        return value
+
+    def add(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Guarda solo si la clave no existe (atómico). True si se guardó."""
+        return self._add_raw(key, ({}, value), ttl or CACHE_DEFAULT_TTL)
+
+    def delete(self, key: str):
+        self._delete_raw(key)
+
+    def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            self._bump_tag(tag)
+
+    # --- A implementar por cada backend ---
+    @abstractmethod
+    def tag_versions(self, tags: Iterable[str]) -> dict: ...
+    @abstractmethod
+    def _get_raw(self, key): ...
+    @abstractmethod
+    def _set_raw(self, key, entry, ttl): ...
+    @abstractmethod
+    def _add_raw(self, key, entry, ttl) -> bool: ...
+    @abstractmethod
+    def _delete_raw(self, key): ...
+    @abstractmethod
+    def _bump_tag(self, tag):
+        """Incremento atómico de la versión de una etiqueta (el 'incr' del backend)."""
+    @abstractmethod
+    def clear(self): ...
+
+_MISSING = object()
+
+class MemoryCache(Cache):
+    """
+    LRU con TTL, protegido con un lock (se usa desde el threadpool).
+    Con max_entries=None nunca desaloja por tamaño: las entradas solo salen al vencer.
+    """
+    def __init__(self, max_entries: Optional[int] = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()   # clave -> (expira, entrada)
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def _get_raw(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def _store(self, key, entry, ttl):
+        self._data[key] = (time.monotonic() + ttl, entry)
+        self._data.move_to_end(key)
+        if self.max_entries is None:
+            # Sin límite: se purgan las vencidas del frente (con TTL uniforme, las más antiguas)
+            now = time.monotonic()
+            while self._data and next(iter(self._data.values()))[0] < now:
+                self._data.popitem(last=False)
+            return
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def _set_raw(self, key, entry, ttl):
+        with self._lock:
+            self._store(key, entry, ttl)
+
+    def _add_raw(self, key, entry, ttl):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] >= time.monotonic():
+                return False
+            self._store(key, entry, ttl)
+            return True
+
+    def _delete_raw(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _bump_tag(self, tag):
+        with self._lock:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+class RedisCache(Cache):
+    """
+    Backend sobre cualquier cliente con la API de redis-py (redis.Redis, fakeredis.FakeRedis...).
+    Si Redis falla, se comporta como una caché vacía: las rutas siguen funcionando contra la BD.
+    """
+    def __init__(self, client, prefix: str = CACHE_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f"{self.prefix}:cache:{key}"
+
+    def _tag_key(self, tag):
+        return f"{self.prefix}:tag:{tag}"
+
+    def _safe(self, op, default=None):
+        try:
+            return op()
+        except Exception as e:  # redis.RedisError y errores de conexión
+            logger.warning("Caché Redis no disponible: %s", e)
+            return default
+
+    def tag_versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = self._safe(lambda: self.client.mget([self._tag_key(t) for t in tags]), [None] * len(tags))
+        return {tag: int(v or 0) for tag, v in zip(tags, values)}
+
+    def _get_raw(self, key):
+        raw = self._safe(lambda: self.client.get(self._key(key)))
+        return pickle.loads(raw) if raw is not None else None
+
+    def _set_raw(self, key, entry, ttl):
+        self._safe(lambda: self.client.set(self._key(key), pickle.dumps(entry), ex=ttl))
+
+    def _add_raw(self, key, entry, ttl):
+        return bool(self._safe(lambda: self.client.set(self._key(key), pickle.dumps(entry), ex=ttl, nx=True), False))
+
+    def _delete_raw(self, key):
+        self._safe(lambda: self.client.delete(self._key(key)))
+
+    def _bump_tag(self, tag):
+        self._safe(lambda: self.client.incr(self._tag_key(tag)))
+
+    def clear(self):
+        def op():
+            for key in self.client.scan_iter(f"{self.prefix}:*"):
+                self.client.delete(key)
+        self._safe(op)
+
+def build_cache(url: str, max_entries: Optional[int] = CACHE_MAX_ENTRIES, prefix: str = CACHE_KEY_PREFIX) -> Cache:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis  # solo si se configura Redis
+        return RedisCache(redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5), prefix=prefix)
+    return MemoryCache(max_entries)
+
+cache = build_cache(CACHE_URL)
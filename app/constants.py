@@ -0,0 +1,70 @@
+# app/constants.py
+# Constantes compartidas. Este módulo no importa nada: cualquier router puede usarlo sin costo.
+
+# Cuadro Orgánico de Puestos (COP) oficial: (nivel, nombre del área), en el orden institucional.
+COP_ORDENADO = [
+    (1, "OFICINA DE AUDITORÍA"), (1, "DEFENSORÍA UNIVERSITARIA"), (1, "OFICINA DE AUDITORÍA ACADÉMICA"),
+    (1, "RECTORADO"), (2, "OFICINA DE SECRETARÍA GENERAL"), (2, "DIRECCIÓN DE PLANIFICACIÓN Y DESARROLLO UNIVERSITARIO"),(3, "UNIDAD DE TRANSFORMACION DIGITAL"),
+    (3, "UNIDAD DE PLANEAMIENTO Y PRESUPUESTO"), (3, "UNIDAD DE ORGANIZACION Y METODOS DE TRABAJO"), (3, "UNIDAD DE ESTADISTICA"),
+    (2, "OFICINA DE ASESORÍA JURÍDICA"), (2, "DIRECCIÓN DE TECNOLOGÍAS DE INFORMACIÓN"), (3, "UNIDAD DE DESARROLLO DE PROYECTOS INFORMÁTICOS"),
+    (3, "UNIDAD DE DISEÑO Y PROGRAMACIÓN"), (3, "UNIDAD DE PRODUCCIÓN Y SOPORTE INFORMÁTICO"), (2, "OFICINA DE MARKETING, PROMOCIÓN E IMAGEN INSTITUCIONAL"),
+    (3, "UNIDAD DE MARKETING DIGITAL"), (3, "UNIDAD DE IMAGEN INSTITUCIONAL"), (1, "VICERRECTORADO ADMINISTRATIVO"),
+    (2, "CENTROS DE PRODUCCIÓN DE BIENES Y SERVICIOS"), (3, "CENTRO DE IDIOMAS"), (3, "CENTRO DE FORMACIÓN EN TECNOLOGÍAS DE INFORMACIÓN"),
+    (2, "DIRECCIÓN DE ADMINISTRACIÓN"), (3, "UNIDAD DE CONTABILIDAD"), (3, "UNIDAD DE TESORERÍA"), (3, "UNIDAD DE PATRIMONIO"),
+    (3, "UNIDAD DE ABASTECIMIENTOS"), (3, "UNIDAD DE SERVICIOS GENERALES"), (2, "DIRECCIÓN DE RECURSOS HUMANOS"),
+    (3, "UNIDAD DE CONTROL, DESARROLLO HUMANO Y ESCALAFÓN"), (3, "UNIDAD DE REMUNERACIONES"), (3, "UNIDAD DE SEGURIDAD Y SALUD EN EL TRABAJO"),
+    (2, "DIRECCIÓN DE BIENESTAR UNIVERSITARIO"), (3, "UNIDAD DE SALUD"), (3, "UNIDAD DE SERVICIO SOCIAL"),
+    (2, "OFICINA DE INFRAESTRUCTURA Y OBRAS"), (3, "UNIDAD DE PROYECTOS Y OBRAS"), (3, "UNIDAD DE MANTENIMIENTO"),
+    (2, "DIRECCIÓN DE PROMOCIÓN DEL DEPORTE"), (3, "UNIDAD DE DEPORTE EN GENERAL Y RECREACIÓN"), (3, "UNIDAD DE DEPORTE DE ALTA COMPETENCIA"),
+    (1, "VICERRECTORADO DE INVESTIGACIÓN"), (2, "OFICINA DE ASESORÍA EN GESTIÓN DE LA INVESTIGACIÓN"),
+    (2, "COORDINACIÓN DE TRANSFERENCIA TECNOLÓGICA Y PATENTES"), (2, "INSTITUTO CIENTÍFICO DE INVESTIGACIÓN"),
+    (3, "COORDINACIÓN CIENTÍFICA"), (3, "COORDINACIÓN DE INVESTIGACIÓN EN RESPONSABILIDAD SOCIAL UNIVERSITARIA"),
+    (3, "CENTRO DE INVESTIGACIÓN ALTAMENTE ESPECIALIZADO DE BIOMÉDICAS"), (3, "BIOTERIO AUTOMATIZADO."),
+    (2, "DIRECCIÓN DE GESTIÓN DE LA INVESTIGACIÓN Y DE LA PRODUCCIÓN INTELECTUAL"), (3, "COORDINACIÓN DE FOMENTO DE LA INVESTIGACIÓN"),
+    (3, "COORDINACIÓN DE ADMINISTRACIÓN DE PROYECTOS DE INVESTIGACIÓN."), (3, "COORDINACIÓN EN PRODUCCIÓN INTELECTUAL."),
+    (2, "DIRECCIÓN DE BIBLIOTECAS Y EDITORIAL UNIVERSITARIA"), (3, "COORDINACIÓN DE BIBLIOTECA"),
+    (3, "BIBLIOTECA - FACULTAD DE DERECHO Y CIENCIA POLÍTICA"), (3, "BIBLIOTECA - FACULTAD DE INGENIERÍA"),
+    (3, "BIBLIOTECA - FACULTAD DE CIENCIAS ECONÓMICAS, ADMINISTRATIVAS Y CONTABLES."),
+    (3, "BIBLIOTECA - FACULTAD DE CIENCIAS SOCIALES Y EDUCACIÓN"), (3, "BIBLIOTECA - FACULTAD DE CIENCIAS DE LA SALUD"),
+    (3, "BIBLIOTECA – ESCUELA DE POSGRADO"), (3, "COORDINACIÓN DE EDITORIAL UNIVERSITARIA."),
+    (2, "DIRECCIÓN DE INNOVACIÓN Y EMPRENDIMIENTO."), (3, "COORDINACIÓN EN INNOVACIÓN Y EMPRENDIMIENTO."),
+    (3, "COORDINACIÓN EN INCUBADORAS Y DESARROLLO DE CAPACIDADES EMPRESARIALES"), (1, "VICERRECTORADO ACADÉMICO"),
+    (2, "COORDINACIÓN DE GESTIÓN CON LA SUNEDU"), (2, "DIRECCIÓN DE SERVICIOS ACADÉMICOS"), (3, "UNIDAD DE PROCESOS TÉCNICOS ACADÉMICOS"),
+    (3, "UNIDAD DE REGISTRO CENTRAL Y ESTADÍSTICA ACADÉMICA"), (2, "DIRECCIÓN DE ADMISIÓN Y CENTRO PREUNIVERSITARIO"),
+    (3, "UNIDAD DE ADMISIÓN Y PROCESOS TÉCNICOS"), (3, "COORDINACIÓN DEL CENTRO PREUNIVERSITARIO DE CONSOLIDACIÓN DEL PERFIL DEL INGRESANTE"),
+    (2, "DIRECCIÓN DE DESARROLLO ACADÉMICO"), (3, "COORDINACIÓN DE DESARROLLO CURRICULAR Y FORMACIÓN CONTINUA"),
+    (3, "COORDINACIÓN de TUTORÍA ACADÉMICA Y ATENCIÓN PSICOPEDAGÓGICA"), (3, "UNIDAD DE EDUCACIÓN VIRTUAL Y A DISTANCIA"),
+    (2, "DIRECCIÓN DE CALIDAD ACADÉMICA Y ACREDITACIÓN UNIVERSITARIA"), (3, "COORDINACIÓN DE CALIDAD ACADÉMICA DE PRE Y POSGRADO"),
+    (3, "COORDINACIÓN DE ACREDITACIÓN DE PRE Y POSGRADO"), (2, "DIRECCIÓN DE RESPONSABILIDAD SOCIAL Y EXTENSIÓN UNIVERSITARIA"),
+    (3, "UNIDAD DE ATENCIÓN AL DESARROLLO FORMATIVO: ARTE Y CULTURA"), (3, "UNIDAD DE COOPERACIÓN PARA EL DESARROLLO SOSTENIBLE"),
+    (3, "UNIDAD DE EXTENSIÓN UNIVERSITARIA"), (3, "COORDINACIÓN DEL SISTEMA DE SEGUIMIENTO AL EGRESADO Y GRADUADO DE LA UAC"),
+    (2, "DIRECCIÓN DE COOPERACIÓN NACIONAL E INTERNACIONAL"), (3, "UNIDAD DE CONVENIOS Y BECAS DE ESTUDIO"),
+    (3, "UNIDAD DE MOVILIDAD ACADÉMICA Y ADMINISTRATIVA"), (3, "COORDINACIÓN DE BECAS Y CRÉDITO INTERINSTITUCIONAL"),
+    (2, "FACULTAD DE CIENCIAS Y HUMANIDADES"), (3, "LABORATORIO DE QUÍMICA"), (3, "LABORATORIO DE FÍSICA"),
+    (3, "HUMANIDADES Y EDUCACIÓN"), (3, "TURISMO"), (3, "DEPARTAMENTO ACADÉMICO DE MATEMÁTICA, FÍSICA, QUÍMICA Y ESTADÍSTICA"),
+    (3, "ESCUELA PROFESIONAL DE EDUCACIÓN"), (3, "ESCUELA PROFESIONAL DE TURISMO"), (3, "ESCUELA DE ESTUDIOS DE FORMACIÓN GENERAL"),
+    (3, "UNIDAD DE INVESTIGACIÓN"), (2, "FACULTAD DE CIENCIAS DE LA SALUD"), (3, "CENTRO ESTOMATOLÓGICO"),
+    (3, "CENTRO DE SALUD INTEGRAL"), (3, "LABORATORIO DE CIENCIAS BÁSICAS"), (3, "LABORATORIO DE SIMULACIÓN CLÍNICA"),
+    (3, "LABORATORIO DE CIRUGÍA EXPERIMENTAL"), (3, "MEDICINA HUMANA"), (3, "ESTOMATOLOGÍA"),
+    (3, "OBSTETRICIA Y ENFERMERÍA"), (3, "PSICOLOGÍA"), (3, "ESCUELA PROFESIONAL DE MEDICINA HUMANA"),
+    (3, "ESCUELA PROFESIONAL DE ESTOMATOLOGÍA"), (3, "ESCUELA PROFESIONAL DE OBSTETRICIA"), (3, "ESCUELA PROFESIONAL DE PSICOLOGÍA"),
+    (3, "ESCUELA PROFESIONAL DE ENFERMERÍA"), (3, "ESCUELA PROFESIONAL DE TECNOLOGÍA MÉDICA"), (2, "FACULTAD DE DERECHO Y CIENCIA POLÍTICA"),
+    (3, "DERECHO"), (3, "ESCUELA PROFESIONAL DE DERECHO"), (2, "FACULTAD DE CIENCIAS ECONÓMICAS, ADMINISTRATIVAS Y CONTABLES"),
+    (3, "ECONOMÍA"), (3, "ADMINISTRACIÓN"), (3, "CONTABILIDAD"), (3, "ESCUELA PROFESIONAL DE ECONOMÍA"),
+    (3, "ESCUELA PROFESIONAL DE ADMINISTRACIÓN"), (3, "ESCUELA PROFESIONAL DE CONTABILIDAD"), (3, "ESCUELA PROFESIONAL DE ADMINISTRACIÓN DE NEGOCIOS INTERNACIONALES"),
+    (3, "ESCUELA PROFESIONAL DE FINANZAS"), (3, "ESCUELA PROFESIONAL DE MARKETING"), (2, "FACULTAD DE INGENIERÍA Y ARQUITECTURA"),
+    (3, "LABORATORIOS DE INGENIERÍA INDUSTRIAL"), (3, "LABORATORIOS DE INGENIERÍA CIVIL"), (3, "LABORATORIO DE INGENIERÍA DE SISTEMAS"),
+    (3, "INGENIERÍA INDUSTRIAL"), (3, "INGENIERÍA DE SISTEMAS"), (3, "INGENIERÍA CIVIL"), (3, "ARQUITECTURA"), (3, "INGENIERÍA AMBIENTAL"),
+    (3, "ESCUELA PROFESIONAL DE INGENIERÍA INDUSTRIAL"), (3, "ESCUELA PROFESIONAL DE INGENIERÍA DE SISTEMAS"), (3, "ESCUELA PROFESIONAL DE INGENIERÍA CIVIL"),
+    (3, "ESCUELA PROFESIONAL DE ARQUITECTURA"), (3, "ESCUELA PROFESIONAL DE INGENIERÍA AMBIENTAL"), (2, "ESCUELA DE POSGRADO"),
+    (3, "COORDINACIÓN GENERAL DE LOS PROGRAMAS DE POSGRADO"), (3, "UNIDAD DE POSGRADO"), (3, "UNIDAD DE INVESTIGACIÓN"),
+    (1, "FILIAL PUERTO MALDONADO"), (1, "FILIAL QUILLABAMBA"), (1, "FILIAL SICUANI")
+]
+
+# Sedes (User.location): valor guardado -> nombre mostrado
+SEDES = {
+    "CUSCO": "Sede Central (Cusco)",
+    "P_MALDONADO": "Filial Puerto Maldonado",
+    "QUILLABAMBA": "Filial Quillabamba",
+    "SICUANI": "Filial Sicuani",
+}
@@ -1,22 +1,49 @@
 # app/crud.py
 import re
-from .db import SessionLocal, get_db
 from . import models
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, insert, select, update
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, date
 import os
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List, Dict, Any
 
 from app.logic.vacation_calculator import VacationCalculator
+from app.cache import cache
+
+# Etiquetas de caché (app/cache.py) que invalidan las escrituras de este módulo
+CACHE_TAG_SETTINGS = "settings"
+CACHE_TAG_HOLIDAYS = "holidays"
+
+# Máquina de estados de VacationPeriod: estado actual -> estados a los que puede pasar.
+# Toda transición se aplica con un UPDATE condicionado al estado leído (compare-and-swap):
+# si otro usuario ya la movió, el UPDATE no toca filas y se informa un conflicto
+# en vez de pisar su cambio. No bloquea tablas: solo compite por la fila.
+ALLOWED_TRANSITIONS = {
+    "draft": {"pending_hr"},
+    "pending_hr": {"approved", "rejected"},
+    "approved": {"pending_suspension"},
+    "rejected": {"pending_modification"},
+    "pending_modification": {"approved", "rejected"},
+    "pending_suspension": {"approved", "suspended"},
+}
+
+class VacationConflict(Exception):
+    """La solicitud (o su modificación/suspensión) cambió de estado mientras se procesaba."""
+
+CONFLICT_MSG = "La solicitud fue atendida por otro usuario mientras la procesabas. Recarga la página para ver su estado actual."
 
 pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
 
 def get_user_by_username(db, username):
     return db.query(models.User).filter(models.User.username==username).first()
 
+def get_user_by_email(db, email):
+    return db.query(models.User).filter(models.User.email==email).first()
+
 def create_user(
+    db: Session,
     username, 
     role="employee", 
     full_name=None, 
@@ -25,9 +52,9 @@ def create_user(
     vacation_days_total=30, 
     manager_id=None,
     location="CUSCO",
-    can_request_own_vacation=False
+    can_request_own_vacation=False,
+    vacation_policy_id=None
 ):
-    db = SessionLocal()
     u = models.User(
         username=username, 
         role=role, 
@@ -37,12 +64,12 @@ def create_user(
         vacation_days_total=vacation_days_total,
         manager_id=manager_id,
         location=location,
-        can_request_own_vacation=can_request_own_vacation
+        can_request_own_vacation=can_request_own_vacation,
+        vacation_policy_id=vacation_policy_id
     )
     db.add(u)
     db.commit()
     db.refresh(u)
-    db.close()
     return u
 
 def get_user_vacation_balance(db: Session, user: models.User):
@@ -56,14 +83,38 @@ def get_user_vacation_balance(db: Session, user: models.User):
         
     return user.vacation_days_total - total_days_used
 
-def create_vacation_log(db: Session, vacation: models.VacationPeriod, user: models.User, log_text: str):
+def get_balances_for_users(db: Session, users: list) -> dict:
+    """Como get_user_vacation_balance pero para muchos usuarios con un solo SUM agrupado: {user_id: saldo}."""
+    if not users:
+        return {}
+    used = dict(db.query(models.VacationPeriod.user_id, func.sum(models.VacationPeriod.days)).filter(
+        models.VacationPeriod.user_id.in_([u.id for u in users]),
+        models.VacationPeriod.status.in_(['draft', 'pending_hr', 'approved', 'pending_modification', 'pending_suspension'])
+    ).group_by(models.VacationPeriod.user_id).all())
+    return {u.id: u.vacation_days_total - (used.get(u.id) or 0) for u in users}
+
+def get_vacations_by_user(db: Session, user_ids: list) -> dict:
+    """Vacaciones de varios usuarios en una consulta, agrupadas y ordenadas por inicio: {user_id: [VacationPeriod]}."""
+    grouped = {}
+    if not user_ids:
+        return grouped
+    vacations = db.query(models.VacationPeriod).filter(
+        models.VacationPeriod.user_id.in_(user_ids)
+    ).order_by(models.VacationPeriod.start_date.asc()).all()
+    for v in vacations:
+        grouped.setdefault(v.user_id, []).append(v)
+    return grouped
+
+def create_vacation_log(db: Session, vacation: models.VacationPeriod, user: models.User, log_text: str, commit: bool = True):
+    """Con commit=False el log queda en la transacción del llamador (un solo commit para cambio + log)."""
     log = models.VacationLog(
         vacation_period_id=vacation.id,
         user_id=user.id,
         log_text=log_text
     )
     db.add(log)
-    db.commit()
+    if commit:
+        db.commit()
 
 def get_logs_for_vacation(db: Session, vacation_id: int):
     return db.query(models.VacationLog).options(
@@ -72,6 +123,33 @@ def get_logs_for_vacation(db: Session, vacation_id: int):
         models.VacationLog.vacation_period_id == vacation_id
     ).order_by(models.VacationLog.created_at.desc()).all()
 
+def lock_user_for_write(db: Session, user_id: int):
+    """
+    Serializa las escrituras que consumen saldo de UN usuario (crear, editar, modificar):
+    bloquea su fila con SELECT ... FOR UPDATE hasta el commit/rollback, así dos solicitudes
+    simultáneas no pueden validar el mismo saldo. Los demás usuarios siguen en paralelo.
+
+    Antes cierra la transacción de lectura en curso: en MySQL (REPEATABLE READ) la foto se fija
+    en la primera lectura, y el saldo leído después del lock debe incluir lo que confirmó quien
+    lo tenía. SQLite ignora FOR UPDATE; ahí un UPDATE sin efecto toma el lock de escritura.
+    """
+    db.commit()
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(update(models.User).where(models.User.id == user_id).values(id=models.User.id))
+    else:
+        db.execute(select(models.User.id).where(models.User.id == user_id).with_for_update())
+
+def lock_users_for_write(db: Session):
+    """
+    Como lock_user_for_write, pero para TODA la tabla de usuarios: lo usa la carga masiva de
+    admin, que revalida jefaturas (ciclos), roles y estados de todos antes de escribir.
+    """
+    db.commit()
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(update(models.User).values(id=models.User.id))
+    else:
+        db.execute(select(models.User.id).with_for_update())
+
 def create_vacation(
     db: Session,
     user: models.User, 
@@ -79,9 +157,11 @@ def create_vacation(
     type_period: int, 
     file_name: str = None
 ):
+    lock_user_for_write(db, user.id)
     remaining_balance = get_user_vacation_balance(db, user)
     
     if type_period > remaining_balance:
+        db.rollback()
         raise ValueError(f"Saldo insuficiente ({remaining_balance} días). No puedes pedir {type_period}.")
     
     calculator = VacationCalculator(db, user)
@@ -118,15 +198,17 @@ def create_vacation(
             attached_file=file_name
         )
         db.add(vp)
+        db.flush()
+        create_vacation_log(db, vp, user, f"Solicitud creada en estado 'draft'.", commit=False)
         db.commit()
         db.refresh(vp)
-        
-        create_vacation_log(db, vp, user, f"Solicitud creada en estado 'draft'.")
         return vp
         
     except ValueError as e:
+        db.rollback()
         raise Exception(f"Error: {str(e)}")
     except Exception as e:
+        db.rollback()
         raise Exception(f"Error inesperado: {str(e)}")
 
 def get_dashboard_data(db: Session, user: models.User):
@@ -163,10 +245,16 @@ def get_dashboard_data(db: Session, user: models.User):
             models.SuspensionRequest.status == 'pending_review'
         ).all()
     elif user.role in ["admin", "hr"]:
-        data["pending_modifications"] = db.query(models.ModificationRequest).filter(
+        data["pending_modifications"] = db.query(models.ModificationRequest).options(
+            joinedload(models.ModificationRequest.requesting_user),
+            joinedload(models.ModificationRequest.vacation_period).joinedload(models.VacationPeriod.user)
+        ).filter(
             models.ModificationRequest.status == 'pending_review'
         ).all()
-        data["pending_suspensions"] = db.query(models.SuspensionRequest).filter(
+        data["pending_suspensions"] = db.query(models.SuspensionRequest).options(
+            joinedload(models.SuspensionRequest.requesting_user),
+            joinedload(models.SuspensionRequest.vacation_period).joinedload(models.VacationPeriod.user)
+        ).filter(
             models.SuspensionRequest.status == 'pending_review'
         ).all()
     else:
@@ -196,15 +284,105 @@ def get_vacation_by_id(db: Session, vacation_id: int):
         joinedload(models.VacationPeriod.user)
     ).filter(models.VacationPeriod.id == vacation_id).first()
 
-def update_vacation_status(db: Session, vacation: models.VacationPeriod, new_status: str, actor: models.User):
+def transition_vacation(db: Session, vacation: models.VacationPeriod, new_status: str, values: Dict[str, Any] = None):
+    """
+    Pasa la vacación a 'new_status' (y aplica 'values') con un UPDATE condicionado al estado
+    que se leyó. Sin commit: el llamador confirma junto con sus logs. Si la transición no está
+    permitida o la fila ya cambió, deshace la transacción y lanza VacationConflict.
+    """
+    old_status = vacation.status
+    if new_status not in ALLOWED_TRANSITIONS.get(old_status, ()):
+        db.rollback()
+        raise VacationConflict(f"No se puede pasar una solicitud de '{old_status}' a '{new_status}'. {CONFLICT_MSG}")
+    values = dict(values or {}, status=new_status)
+    updated = db.query(models.VacationPeriod).filter(
+        models.VacationPeriod.id == vacation.id,
+        models.VacationPeriod.status == old_status
+    ).update(values, synchronize_session=False)
+    if updated != 1:
+        db.rollback()
+        raise VacationConflict(CONFLICT_MSG)
+    for key, value in values.items():
+        set_committed_value(vacation, key, value)
+
+def claim_review_request(db: Session, req, new_status: str):
+    """CAS sobre una ModificationRequest/SuspensionRequest: solo se resuelve si sigue en 'pending_review'."""
+    model = type(req)
+    updated = db.query(model).filter(
+        model.id == req.id, model.status == "pending_review"
+    ).update({"status": new_status}, synchronize_session=False)
+    if updated != 1:
+        db.rollback()
+        raise VacationConflict(CONFLICT_MSG)
+    set_committed_value(req, "status", new_status)
+
+def update_vacation_status(db: Session, vacation: models.VacationPeriod, new_status: str, actor: models.User, from_status: str = "pending_hr"):
+    """
+    Resolución directa de RRHH: solo desde 'from_status'. Si entretanto la solicitud pasó a otro
+    estado (p. ej. una modificación o suspensión pendiente), un aprobar/rechazar viejo no debe
+    aplicarse sobre ella: lanza VacationConflict.
+    """
     if vacation:
         old_status = vacation.status
-        vacation.status = new_status
+        if old_status != from_status:
+            db.rollback()
+            raise VacationConflict(CONFLICT_MSG)
+        transition_vacation(db, vacation, new_status)
+        create_vacation_log(db, vacation, actor, f"Estado cambiado de '{old_status}' a '{new_status}'.", commit=False)
         db.commit()
-        db.refresh(vacation)
-        create_vacation_log(db, vacation, actor, f"Estado cambiado de '{old_status}' a '{new_status}'.")
     return vacation
 
+BULK_CHUNK_SIZE = 500  # ids por sentencia (límite práctico de listas IN)
+
+def bulk_update_vacation_status(
+    db: Session, actor: models.User, new_status: str, from_status: str = "pending_hr",
+    vacation_ids: List[int] = None, area: str = None
+) -> List[models.VacationPeriod]:
+    """
+    Cambia de estado varias solicitudes en UNA transacción: un UPDATE condicionado al estado
+    actual por bloque de ids y un INSERT masivo de logs. Solo se tocan las que siguen en
+    'from_status' (las ya resueltas por otra persona se omiten); la transición debe estar
+    en ALLOWED_TRANSITIONS. Con 'area' y 'vacation_ids' se combinan ambos filtros. Devuelve las actualizadas,
+    con su usuario cargado para las notificaciones.
+    """
+    if new_status not in ALLOWED_TRANSITIONS.get(from_status, ()):
+        raise VacationConflict(f"No se puede pasar una solicitud de '{from_status}' a '{new_status}'.")
+    query = db.query(models.VacationPeriod).options(joinedload(models.VacationPeriod.user)).filter(
+        models.VacationPeriod.status == from_status
+    )
+    if area is None and not vacation_ids:
+        return []
+    # Con ids y área a la vez se toman solo las marcadas que son de esa área
+    if area is not None:
+        query = query.join(models.User, models.VacationPeriod.user_id == models.User.id).filter(models.User.area == area)
+    if vacation_ids:
+        query = query.filter(models.VacationPeriod.id.in_(vacation_ids))
+
+    # Bloquea las filas hasta el commit (MySQL); SQLite serializa las escrituras igual
+    vacations = query.with_for_update(of=models.VacationPeriod).all()
+    if not vacations:
+        return []
+
+    ids = [v.id for v in vacations]
+    for i in range(0, len(ids), BULK_CHUNK_SIZE):
+        chunk = ids[i:i + BULK_CHUNK_SIZE]
+        db.query(models.VacationPeriod).filter(
+            models.VacationPeriod.id.in_(chunk),
+            models.VacationPeriod.status == from_status
+        ).update({models.VacationPeriod.status: new_status}, synchronize_session="evaluate")
+
+    log_text = f"Estado cambiado de '{from_status}' a '{new_status}' (en lote)."
+    db.execute(insert(models.VacationLog), [
+        {"vacation_period_id": v_id, "user_id": actor.id, "log_text": log_text} for v_id in ids
+    ])
+    db.commit()
+    # El commit expira los objetos: se recargan en bloque (con su usuario) en vez de uno por uno
+    return [
+        v for i in range(0, len(ids), BULK_CHUNK_SIZE)
+        for v in db.query(models.VacationPeriod).options(joinedload(models.VacationPeriod.user))
+        .filter(models.VacationPeriod.id.in_(ids[i:i + BULK_CHUNK_SIZE])).all()
+    ]
+
 def check_edit_permission(vacation: models.VacationPeriod, user: models.User):
     if not vacation: return False
     if vacation.status != 'draft': return False
@@ -213,6 +391,66 @@ def check_edit_permission(vacation: models.VacationPeriod, user: models.User):
     if user.role == 'manager' and vacation.user.manager_id == user.id: return True
     return False
 
+def check_view_permission(vacation: models.VacationPeriod, user: models.User):
+    if not vacation: return False
+    if user.role in ['admin', 'hr']: return True
+    if user.role == 'manager' and vacation.user.manager_id == user.id: return True
+    if user.id == vacation.user_id: return True
+    return False
+
+def get_vacation_document_names(db: Session, vacation: models.VacationPeriod):
+    """Nombres de todos los documentos asociados a una vacación (propios, del jefe, modificaciones y suspensiones)."""
+    names = {vacation.attached_file, vacation.consolidated_doc_path, vacation.manager_individual_doc_path}
+    mod_docs = db.query(models.ModificationRequest.attached_doc_path).filter(
+        models.ModificationRequest.vacation_period_id == vacation.id
+    ).all()
+    sus_docs = db.query(models.SuspensionRequest.attached_doc_path).filter(
+        models.SuspensionRequest.vacation_period_id == vacation.id
+    ).all()
+    names.update(r[0] for r in mod_docs)
+    names.update(r[0] for r in sus_docs)
+    names.discard(None)
+    return names
+
+def get_vacations_for_bundle(db: Session, area: str = None, manager_id: int = None, date_from: date = None, date_to: date = None):
+    """Vacaciones (con su usuario) filtradas por área, jefe y/o rango de fecha de inicio."""
+    query = db.query(models.VacationPeriod).join(models.User).options(
+        joinedload(models.VacationPeriod.user)
+    )
+    if area:
+        query = query.filter(models.User.area == area)
+    if manager_id:
+        query = query.filter(models.User.manager_id == manager_id)
+    if date_from:
+        query = query.filter(models.VacationPeriod.start_date >= date_from)
+    if date_to:
+        query = query.filter(models.VacationPeriod.start_date <= date_to)
+    return query.order_by(models.User.area, models.User.full_name, models.VacationPeriod.start_date).all()
+
+def get_request_docs_for_vacations(db: Session, vacation_ids: List[int]):
+    """
+    Documentos de modificaciones y suspensiones agrupados por vacación, en dos consultas.
+    Devuelve {vacation_id: [(tipo, nombre_archivo, estado), ...]}.
+    """
+    docs = {}
+    if not vacation_ids:
+        return docs
+    mods = db.query(
+        models.ModificationRequest.vacation_period_id,
+        models.ModificationRequest.attached_doc_path,
+        models.ModificationRequest.status
+    ).filter(models.ModificationRequest.vacation_period_id.in_(vacation_ids)).all()
+    sus = db.query(
+        models.SuspensionRequest.vacation_period_id,
+        models.SuspensionRequest.attached_doc_path,
+        models.SuspensionRequest.status
+    ).filter(models.SuspensionRequest.vacation_period_id.in_(vacation_ids)).all()
+    for vid, path, status in mods:
+        docs.setdefault(vid, []).append(("modificacion", path, status))
+    for vid, path, status in sus:
+        docs.setdefault(vid, []).append(("suspension", path, status))
+    return docs
+
 def update_vacation_details(
     db: Session,
     vacation: models.VacationPeriod,
@@ -224,10 +462,15 @@ def update_vacation_details(
     if not vacation:
         raise Exception("Solicitud no encontrada")
  
+    lock_user_for_write(db, vacation.user_id)
+    if vacation.status != 'draft':  # recargado tras el lock: pudo enviarse mientras tanto
+        db.rollback()
+        raise Exception(f"Error: {CONFLICT_MSG}")
     current_balance = get_user_vacation_balance(db, vacation.user)
     available_balance_for_edit = current_balance + vacation.days
     
     if type_period > available_balance_for_edit:
+        db.rollback()
         raise Exception(f"Error: El periodo ({type_period}) excede tu saldo disponible para editar ({available_balance_for_edit}).")
 
     calculator = VacationCalculator(db, vacation.user)
@@ -255,39 +498,63 @@ def update_vacation_details(
         if file_name:
             vacation.attached_file = file_name
         
+        create_vacation_log(db, vacation, actor, f"Solicitud editada. Nuevas fechas: {sd} por {type_period} días.", commit=False)
         db.commit()
         db.refresh(vacation)
-        create_vacation_log(db, vacation, actor, f"Solicitud editada. Nuevas fechas: {sd} por {type_period} días.")
         return vacation
 
     except ValueError as e:
+        db.rollback()
         raise Exception(f"Error: {str(e)}")
     except Exception as e:
+        db.rollback()
         raise Exception(f"Error inesperado: {str(e)}")
 
-def submit_area_to_hr(db: Session, area: str, file_name: str, actor: models.User):
-    vacations_to_update = db.query(models.VacationPeriod).join(models.User).filter(
+def submit_area_to_hr(db: Session, area: str, file_name: str, actor: models.User) -> List[Dict[str, Any]]:
+    """
+    Envía a RRHH todos los borradores del equipo del jefe en UNA transacción: UPDATE masivo
+    (estado + documento consolidado), INSERT masivo de logs y un solo commit. Si algo falla
+    no queda nada enviado a medias. Devuelve el resumen de lo que se envió (para el mensaje).
+    """
+    rows = db.query(
+        models.VacationPeriod.id, models.User.full_name,
+        models.VacationPeriod.start_date, models.VacationPeriod.end_date
+    ).join(models.User, models.VacationPeriod.user_id == models.User.id).filter(
         models.User.manager_id == actor.id,
         models.VacationPeriod.status == 'draft'
-    ).all()
+    ).order_by(models.User.full_name, models.VacationPeriod.start_date).with_for_update(of=models.VacationPeriod).all()
 
-    if not vacations_to_update:
-        return
+    if not rows:
+        return []
 
-    for v in vacations_to_update:
-        v.status = "pending_hr"
-        if file_name:
-            v.consolidated_doc_path = file_name
-        create_vacation_log(db, v, actor, f"Enviado a RRHH en lote por el jefe.")
-    
-    db.commit()
+    ids = [r.id for r in rows]
+    values = {models.VacationPeriod.status: "pending_hr"}
+    if file_name:
+        values[models.VacationPeriod.consolidated_doc_path] = file_name
+    try:
+        for i in range(0, len(ids), BULK_CHUNK_SIZE):
+            db.query(models.VacationPeriod).filter(
+                models.VacationPeriod.id.in_(ids[i:i + BULK_CHUNK_SIZE]),
+                models.VacationPeriod.status == 'draft'
+            ).update(values, synchronize_session=False)
+        db.execute(insert(models.VacationLog), [
+            {"vacation_period_id": v_id, "user_id": actor.id, "log_text": "Enviado a RRHH en lote por el jefe."}
+            for v_id in ids
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return [
+        {"id": r.id, "full_name": r.full_name, "start_date": r.start_date, "end_date": r.end_date}
+        for r in rows
+    ]
 
 def submit_individual_to_hr(db: Session, vacation: models.VacationPeriod, actor: models.User, file_name: str):
     if vacation.status == 'draft':
-        vacation.status = "pending_hr"
-        vacation.manager_individual_doc_path = file_name
+        transition_vacation(db, vacation, "pending_hr", {"manager_individual_doc_path": file_name})
+        create_vacation_log(db, vacation, actor, f"Enviado individualmente a RRHH (con sustento).", commit=False)
         db.commit()
-        create_vacation_log(db, vacation, actor, f"Enviado individualmente a RRHH (con sustento).")
 
 def delete_vacation_period(db: Session, vacation_id: int):
     db_vacation = get_vacation_by_id(db, vacation_id)
@@ -311,15 +578,25 @@ def get_holidays_by_year(db: Session, year: int, user_location: str = "CUSCO"):
         models.Holiday.location.in_(["GENERAL", user_location])
     ).order_by(models.Holiday.holiday_date).all()
 
-def create_holiday(db: Session, holiday_date: date, name: str, is_national: bool = True):
-    db_holiday = models.Holiday(holiday_date=holiday_date, name=name, is_national=is_national)
+def get_holiday_dates(db: Session, year: int, user_location: str = "CUSCO") -> frozenset:
+    """Fechas feriadas del año para una sede (cacheado; lo invalidan create/delete_holiday)."""
+    return cache.get_or_set(
+        f"holidays:{year}:{user_location}",
+        lambda: frozenset(h.holiday_date for h in get_holidays_by_year(db, year, user_location)),
+        tags=[CACHE_TAG_HOLIDAYS],
+    )
+
+def create_holiday(db: Session, holiday_date: date, name: str, is_national: bool = True, location: str = "GENERAL"):
+    db_holiday = models.Holiday(holiday_date=holiday_date, name=name, is_national=is_national, location=location)
     db.add(db_holiday); db.commit(); db.refresh(db_holiday)
+    cache.invalidate_tags(CACHE_TAG_HOLIDAYS)
     return db_holiday
 
 def delete_holiday(db: Session, holiday_id: int):
     db_holiday = get_holiday(db, holiday_id)
     if db_holiday:
         db.delete(db_holiday); db.commit()
+        cache.invalidate_tags(CACHE_TAG_HOLIDAYS)
     return db_holiday
 
 def seed_holidays(db: Session):
@@ -329,34 +606,52 @@ def get_setting(db: Session, key: str):
     return db.query(models.SystemConfig).filter(models.SystemConfig.key == key).first()
 def get_all_settings(db: Session):
     return db.query(models.SystemConfig).all()
+def get_settings_map(db: Session) -> dict:
+    """{clave: valor} de los ajustes (cacheado; lo invalidan las escrituras de ajustes)."""
+    return cache.get_or_set(
+        "settings",
+        lambda: {s.key: s.value for s in get_all_settings(db)},
+        tags=[CACHE_TAG_SETTINGS],
+    )
 def update_or_create_setting(db: Session, key: str, value: str, description: str = None):
     db_setting = get_setting(db, key)
     if db_setting: db_setting.value = value
     else: db_setting = models.SystemConfig(key=key, value=value, description=description); db.add(db_setting)
     db.commit(); db.refresh(db_setting)
+    cache.invalidate_tags(CACHE_TAG_SETTINGS)
     return db_setting
 
-def seed_settings(db: Session):
-    print("--- CHEQUEANDO AJUSTES DEL SISTEMA ---")
-    default_settings = [
-        {"key": "HOLIDAYS_COUNT", "value": "True", "desc": "¿Feriados cuentan contra balance?"},
-        {"key": "FRIDAY_EXTENDS", "value": "True", "desc": "¿Extender si termina viernes?"},
-        {"key": "ALLOW_START_ON_HOLIDAY", "value": "False", "desc": "¿Permitir iniciar en feriado?"},
-        {"key": "ALLOW_START_ON_WEEKEND", "value": "False", "desc": "¿Permitir iniciar en fin de semana?"},
-    ]
-    count = 0
-    for setting in default_settings:
-        if not get_setting(db, setting["key"]):
-            update_or_create_setting(db, setting["key"], setting["value"], setting["desc"]); count += 1
-    if count > 0: print(f"--- CREADOS {count} AJUSTES POR DEFECTO ---")
-    else: print("--- AJUSTES YA EXISTÍAN ---")
+DEFAULT_SETTINGS = [
+    {"key": "HOLIDAYS_COUNT", "value": "True", "desc": "¿Feriados cuentan contra balance?"},
+    {"key": "FRIDAY_EXTENDS", "value": "True", "desc": "¿Extender si termina viernes?"},
+    {"key": "ALLOW_START_ON_HOLIDAY", "value": "False", "desc": "¿Permitir iniciar en feriado?"},
+    {"key": "ALLOW_START_ON_WEEKEND", "value": "False", "desc": "¿Permitir iniciar en fin de semana?"},
+]
+
+def seed_settings(db: Session) -> int:
+    """Idempotente: una sola consulta para ver qué claves faltan y un solo commit para crearlas."""
+    keys = [s["key"] for s in DEFAULT_SETTINGS]
+    existing = {k for (k,) in db.query(models.SystemConfig.key).filter(models.SystemConfig.key.in_(keys))}
+    missing = [s for s in DEFAULT_SETTINGS if s["key"] not in existing]
+    if missing:
+        db.add_all([models.SystemConfig(key=s["key"], value=s["value"], description=s["desc"]) for s in missing])
+        db.commit()
+        cache.invalidate_tags(CACHE_TAG_SETTINGS)
+    return len(missing)
+
+def seed_initial_data(db: Session) -> int:
+    """Datos mínimos del sistema. Se ejecuta en el arranque (lifespan) o con 'python init_db.py'."""
+    seed_holidays(db)
+    return seed_settings(db)
 
 def create_modification_request(db: Session, vacation: models.VacationPeriod, user: models.User, reason: str, file_name: str, new_start_date_str: str, new_period_type: int):
+    lock_user_for_write(db, vacation.user_id)
     original_user = vacation.user
     user_balance = get_user_vacation_balance(db, original_user)
     available_balance = user_balance + vacation.days
     
     if new_period_type > available_balance:
+        db.rollback()
         raise Exception("Error: El nuevo periodo excede el balance disponible.")
 
     calculator = VacationCalculator(db, original_user)
@@ -373,6 +668,7 @@ def create_modification_request(db: Session, vacation: models.VacationPeriod, us
              raise ValueError(f"Saldo insuficiente. La modificación requiere {real_days} días, tienes {available_balance}.")
 
     except ValueError as e:
+        db.rollback()
         raise Exception(f"Error: {str(e)}")
 
     mod_req = models.ModificationRequest(
@@ -386,11 +682,13 @@ def create_modification_request(db: Session, vacation: models.VacationPeriod, us
         new_period_type=new_period_type,
         status="pending_review"
     )
+    old_status = vacation.status
+    transition_vacation(db, vacation, "pending_modification")
     db.add(mod_req)
-    update_vacation_status(db, vacation, "pending_modification", user)
+    create_vacation_log(db, vacation, user, f"Estado cambiado de '{old_status}' a 'pending_modification'.", commit=False)
+    create_vacation_log(db, vacation, user, f"Solicitó modificación. Nueva fecha tentativa: {sd} ({new_period_type} días).", commit=False)
     db.commit()
     db.refresh(mod_req)
-    create_vacation_log(db, vacation, user, f"Solicitó modificación. Nueva fecha tentativa: {sd} ({new_period_type} días).")
     return mod_req
 
 def get_modification_by_id(db: Session, mod_id: int):
@@ -401,15 +699,15 @@ def approve_modification(db: Session, mod_id: int, actor: models.User):
     if not mod_req or not mod_req.vacation_period: return None
         
     vacation = mod_req.vacation_period
-    vacation.start_date = mod_req.new_start_date
-    vacation.end_date = mod_req.new_end_date
-    vacation.days = mod_req.new_days
-    vacation.type_period = mod_req.new_period_type
+    claim_review_request(db, mod_req, "approved")
+    transition_vacation(db, vacation, "approved", {
+        "start_date": mod_req.new_start_date,
+        "end_date": mod_req.new_end_date,
+        "days": mod_req.new_days,
+        "type_period": mod_req.new_period_type,
+    })
     
-    mod_req.status = "approved"
-    vacation.status = "approved"
-    
-    create_vacation_log(db, vacation, actor, f"Modificación APROBADA. Nuevas fechas: {vacation.start_date} por {vacation.type_period} días.")
+    create_vacation_log(db, vacation, actor, f"Modificación APROBADA. Nuevas fechas: {vacation.start_date} por {vacation.type_period} días.", commit=False)
     db.commit()
     return mod_req
 
@@ -417,11 +715,11 @@ def reject_modification(db: Session, mod_id: int, actor: models.User):
     mod_req = get_modification_by_id(db, mod_id)
     if not mod_req: return None
         
-    mod_req.status = "rejected"
     vacation = mod_req.vacation_period
-    vacation.status = "rejected"
+    claim_review_request(db, mod_req, "rejected")
+    transition_vacation(db, vacation, "rejected")
     
-    create_vacation_log(db, vacation, actor, f"Modificación RECHAZADA.")
+    create_vacation_log(db, vacation, actor, f"Modificación RECHAZADA.", commit=False)
     db.commit()
     return mod_req
 
@@ -442,14 +740,16 @@ def create_suspension_request(db: Session, vacation: models.VacationPeriod, acto
         new_end_date_parcial=new_end_date,
         status="pending_review"
     )
+    old_status = vacation.status
+    transition_vacation(db, vacation, "pending_suspension")
     db.add(sus_req)
-    update_vacation_status(db, vacation, "pending_suspension", actor)
-    db.commit()
-    db.refresh(sus_req)
     
     log_msg = f"Solicitó suspensión '{suspension_type}'. Motivo: {reason}"
     if new_end_date: log_msg += f" Nuevo fin: {new_end_date}"
-    create_vacation_log(db, vacation, actor, log_msg)
+    create_vacation_log(db, vacation, actor, f"Estado cambiado de '{old_status}' a 'pending_suspension'.", commit=False)
+    create_vacation_log(db, vacation, actor, log_msg, commit=False)
+    db.commit()
+    db.refresh(sus_req)
     return sus_req
 
 def get_suspension_by_id(db: Session, sus_id: int):
@@ -462,20 +762,18 @@ def approve_suspension(db: Session, sus_id: int, actor: models.User):
     if not sus_req or not sus_req.vacation_period: return None
         
     vacation = sus_req.vacation_period
+    claim_review_request(db, sus_req, "approved")
     
     if sus_req.suspension_type == 'total':
-        vacation.status = 'suspended'
+        transition_vacation(db, vacation, "suspended")
         log_msg = f"Suspensión TOTAL aprobada."
     elif sus_req.suspension_type == 'parcial':
         new_end_date = sus_req.new_end_date_parcial
         days_consumed = (new_end_date - vacation.start_date).days + 1
-        vacation.end_date = new_end_date
-        vacation.days = days_consumed
-        vacation.status = 'approved'
+        transition_vacation(db, vacation, "approved", {"end_date": new_end_date, "days": days_consumed})
         log_msg = f"Suspensión PARCIAL aprobada. Nueva fecha de fin: {new_end_date}, Días gozados: {days_consumed}."
     
-    sus_req.status = "approved"
-    create_vacation_log(db, vacation, actor, log_msg)
+    create_vacation_log(db, vacation, actor, log_msg, commit=False)
     db.commit()
     return sus_req
 
@@ -483,11 +781,11 @@ def reject_suspension(db: Session, sus_id: int, actor: models.User):
     sus_req = get_suspension_by_id(db, sus_id)
     if not sus_req: return None
         
-    sus_req.status = "rejected"
     vacation = sus_req.vacation_period
-    vacation.status = "approved"
+    claim_review_request(db, sus_req, "rejected")
+    transition_vacation(db, vacation, "approved")
     
-    create_vacation_log(db, vacation, actor, f"Solicitud de suspensión RECHAZADA.")
+    create_vacation_log(db, vacation, actor, f"Solicitud de suspensión RECHAZADA.", commit=False)
     db.commit()
     return sus_req
 
@@ -516,6 +814,113 @@ def admin_update_user(db: Session, user: models.User, username: str, full_name:
     db.refresh(user)
     return user
 
+# --- Sincronización masiva de usuarios (import_data.py y carga de planilla en admin) ---
+
+USER_SYNC_PROTECTED_ROLES = ("admin", "hr")  # nunca se degradan ni desactivan desde un archivo
+
+def _free_username(base: str, taken: set) -> str:
+    username, n = base[:50], 2
+    while username in taken:
+        suffix = str(n)
+        username, n = f"{base[:50 - len(suffix)]}{suffix}", n + 1
+    taken.add(username)
+    return username
+
+def plan_user_sync(db: Session, rows: Dict[str, dict], special_roles: Dict[str, str] = None) -> Dict[str, list]:
+    """
+    Diferencia entre el archivo maestro de RRHH y la BD, por email. No escribe nada.
+    'rows': email -> {"full_name", "area", "manager_email", "is_boss", "phantom"}; un jefe 'phantom'
+    (sin fila propia en el archivo) solo usa nombre y área si hay que crearlo.
+    Devuelve {"new", "changed", "deactivated", "manager_changes"} con valores anteriores y nuevos
+    (para el dry-run). Reglas: un rol solo sube (employee -> manager o el de special_roles), nunca
+    se toca admin/hr; un jefe vacío en el archivo no quita el jefe actual; quien no está en el
+    archivo se desactiva (salvo admin/hr), sin borrar su historial.
+    """
+    special_roles = special_roles or {}
+    existing = {
+        u.email: u for u in db.query(
+            models.User.id, models.User.username, models.User.email, models.User.full_name,
+            models.User.area, models.User.role, models.User.is_active, models.User.manager_id
+        ).filter(models.User.email != None)
+    }
+    email_by_id = {u.id: u.email for u in existing.values()}
+    taken = {u for (u,) in db.query(models.User.username)}
+    plan = {"new": [], "changed": [], "deactivated": [], "manager_changes": []}
+
+    for email, row in rows.items():
+        role = special_roles.get(email) or ("manager" if row.get("is_boss") else "employee")
+        current = existing.get(email)
+        if current is None:
+            plan["new"].append({
+                "username": _free_username(email.split("@")[0], taken),
+                "full_name": row.get("full_name") or None,
+                "email": email,
+                "role": role,
+                "area": row.get("area") or None,
+                "vacation_days_total": 30,
+                "is_active": True,
+            })
+        else:
+            changes = {}
+            for field in (() if row.get("phantom") else ("full_name", "area")):
+                if row.get(field) and row[field] != getattr(current, field):
+                    changes[field] = (getattr(current, field), row[field])
+            if current.role not in USER_SYNC_PROTECTED_ROLES and role != "employee" and role != current.role:
+                changes["role"] = (current.role, role)
+            if not current.is_active:
+                changes["is_active"] = (False, True)
+            if changes:
+                plan["changed"].append({"id": current.id, "email": email, "changes": changes})
+
+        manager_email = row.get("manager_email")
+        old_manager_email = email_by_id.get(current.manager_id) if current else None
+        if manager_email and manager_email != email and manager_email != old_manager_email:
+            plan["manager_changes"].append({"email": email, "old": old_manager_email, "new": manager_email})
+
+    for email, current in existing.items():
+        if email not in rows and current.is_active and current.role not in USER_SYNC_PROTECTED_ROLES:
+            plan["deactivated"].append({"id": current.id, "email": email, "full_name": current.full_name})
+    return plan
+
+def bulk_apply_user_changes(db: Session, new_users: List[dict] = (), updates: List[dict] = (), manager_links: Dict[str, str] = None):
+    """
+    Escribe en UNA transacción: INSERT masivo de 'new_users', UPDATE masivo por id de 'updates'
+    ([{"id": ..., campo: valor}]) y luego los jefes ('manager_links': email -> email del jefe),
+    resueltos a ids cuando los usuarios nuevos ya existen. Si algo falla no queda nada aplicado.
+    """
+    try:
+        if new_users:
+            db.execute(insert(models.User), list(new_users))
+        if updates:
+            db.execute(update(models.User), list(updates))
+        if manager_links:
+            id_by_email = dict(db.query(models.User.email, models.User.id).filter(models.User.email != None))
+            links = [
+                {"id": id_by_email[email], "manager_id": id_by_email[manager_email]}
+                for email, manager_email in manager_links.items()
+                if email in id_by_email and manager_email in id_by_email
+            ]
+            if links:
+                db.execute(update(models.User), links)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def apply_user_sync(db: Session, plan: Dict[str, list]):
+    """Aplica el resultado de plan_user_sync (altas, cambios, bajas lógicas y jefes) en una transacción."""
+    updates = [
+        dict({"id": c["id"]}, **{field: new for field, (old, new) in c["changes"].items()})
+        for c in plan["changed"]
+    ]
+    updates += [{"id": d["id"], "is_active": False} for d in plan["deactivated"]]
+    bulk_apply_user_changes(
+        db,
+        new_users=plan["new"],
+        updates=updates,
+        manager_links={m["email"]: m["new"] for m in plan["manager_changes"]},
+    )
+
 def get_all_policies(db: Session):
     return db.query(models.VacationPolicy).all()
 
@@ -2,28 +2,247 @@
 # (VERSIÓN CORREGIDA - PARTE 7)
 
 import os
-from sqlalchemy import create_engine
+import time
+import atexit
+import tempfile
+import threading
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 from urllib.parse import quote_plus
 
 DB_HOST = os.getenv("DB_HOST","localhost")
+DB_PORT = os.getenv("DB_PORT","3306")
 DB_USER = os.getenv("DB_USER","admin")
 DB_PASSWORD = os.getenv("DB_PASSWORD","Redlabel@")
 DB_NAME = os.getenv("DB_NAME","vacation_system")
 
 ENCODED_PASSWORD = quote_plus(DB_PASSWORD)
 
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{ENCODED_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# --- DRIVER DE MYSQL ---
+# Síncronos: "mysqldb" (mysqlclient, en C, el más rápido), "pymysql", "mysqlconnector" (Python puro).
+# Asíncronos (para AsyncSession): "asyncmy" o "aiomysql".
+DB_DRIVER = os.getenv("DB_DRIVER", "mysqlconnector")
+DB_ASYNC_DRIVER = os.getenv("DB_ASYNC_DRIVER", "asyncmy")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 10))
+
+def build_database_url(driver: str) -> str:
+    return f"mysql+{driver}://{DB_USER}:{ENCODED_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+
+def connect_args_for(driver: str) -> dict:
+    """Timeout de conexión: mysql-connector usa otro nombre de parámetro que el resto."""
+    if driver == "mysqlconnector":
+        return {"connection_timeout": DB_CONNECT_TIMEOUT}
+    return {"connect_timeout": DB_CONNECT_TIMEOUT}
+
+def _is_sqlite_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _file_backed_sqlite(database_url: str) -> str:
+    """
+    sqlite:// (memoria) -> un archivo temporal por proceso, que se borra al salir. Una BD en
+    memoria obliga a compartir UNA conexión entre todas las sesiones del threadpool: el commit o
+    rollback de una petición confirmaría o descartaría lo que otra tiene a medio hacer, y los
+    bloqueos (with_for_update, lock_user_for_write) no separarían nada. Con un archivo cada
+    sesión tiene su conexión y SQLite serializa las escrituras.
+    """
+    url = make_url(database_url)
+    if not _is_sqlite_memory(url):
+        return database_url
+    fd, path = tempfile.mkstemp(prefix="vacaciones_", suffix=".db")
+    os.close(fd)
+    atexit.register(lambda: os.path.exists(path) and os.remove(path))
+    return url.set(database=path).render_as_string(hide_password=False)
+
+# DATABASE_URL / ASYNC_DATABASE_URL completos tienen prioridad sobre DB_DRIVER y DB_*
+DATABASE_URL = _file_backed_sqlite(os.getenv("DATABASE_URL") or build_database_url(DB_DRIVER))
+
+# --- BACKEND ---
+# MySQL en producción. Con DATABASE_URL=sqlite:// (BD temporal, vacía en cada arranque) o
+# sqlite:///archivo.db la app corre completa sin servidor externo: pruebas, pruebas de carga y
+# benchmarks locales.
+DB_BACKEND = make_url(DATABASE_URL).get_backend_name()
+IS_SQLITE = DB_BACKEND == "sqlite"
+
+def _default_async_url() -> str:
+    if IS_SQLITE:
+        return make_url(DATABASE_URL).set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return build_database_url(DB_ASYNC_DRIVER)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _default_async_url()
+
+# --- CONFIGURACIÓN DEL POOL ---
+# Por worker de uvicorn: pool_size conexiones permanentes + max_overflow temporales.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # segundos; menor que wait_timeout de MySQL
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))    # segundos esperando una conexión libre
+
+# Ruta (método + path) de la petición en curso, para saber quién retiene cada conexión.
+current_route: ContextVar[str] = ContextVar("current_route", default="-")
+
+class PoolStats:
+    """Métricas del pool: espera al obtener conexión y conexiones retenidas en este momento."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._held = {}
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def checkout(self, key: int):
+        with self._lock:
+            self._held[key] = (current_route.get(), time.monotonic())
+
+    def checkin(self, key: int):
+        with self._lock:
+            self._held.pop(key, None)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            held = sorted(
+                ({"route": route, "held_seconds": round(now - since, 3)} for route, since in self._held.values()),
+                key=lambda h: h["held_seconds"], reverse=True
+            )
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_seconds": round(self.wait_total, 4),
+                "wait_avg_seconds": round(self.wait_total / self.checkouts, 4) if self.checkouts else 0.0,
+                "wait_max_seconds": round(self.wait_max, 4),
+                "in_use": len(held),
+                "held": held,
+            }
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuánto se espera para obtener una conexión."""
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return conn
+
+def engine_options(database_url: str) -> dict:
+    """Argumentos de create_engine según el backend: el pool y sus límites solo aplican a QueuePool."""
+    url = make_url(database_url)
+    if _is_sqlite_memory(url):
+        # Una única conexión compartida: cada conexión nueva a ':memory:' sería otra BD vacía.
+        # Solo sirve para uso de un hilo (scripts): sesiones concurrentes compartirían la
+        # transacción. La app nunca llega aquí (DATABASE_URL pasa por _file_backed_sqlite).
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    if url.get_backend_name() == "sqlite":
+        connect_args = {"check_same_thread": False}
+    else:
+        connect_args = connect_args_for(url.get_driver_name())
+    return {
+        "connect_args": connect_args,
+        "poolclass": InstrumentedQueuePool,
+        "pool_pre_ping": True,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _sqlite_foreign_keys(dbapi_conn, connection_record):
+        # SQLite no valida claves foráneas por defecto; InnoDB sí. Mismo comportamiento en ambos.
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_conn, connection_record, connection_proxy):
+    pool_stats.checkout(id(connection_record))
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_conn, connection_record):
+    pool_stats.checkin(id(connection_record))
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# --- NUEVA FUNCIÓN (PARA DEPENDENCY INJECTION) ---
+def get_pool_stats() -> dict:
+    """Estado actual del pool (tamaño, ocupación, overflow) más las métricas de espera."""
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        stats = {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    else:
+        # Otros pools (p. ej. StaticPool/NullPool) no tienen tamaño ni overflow
+        stats = {"pool_size": 0, "checked_out": 0, "checked_in": 0, "overflow": 0,
+                 "max_overflow": 0, "pool_timeout": 0}
+    stats.update(pool_stats.snapshot())
+    return stats
+
+# --- PROVEEDOR ÚNICO DE SESIÓN (DEPENDENCY INJECTION) ---
+# Todas las rutas y dependencias (incluida la autenticación) comparten la misma
+# sesión por petición, porque FastAPI cachea Depends(get_db) dentro de un request.
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- RUTA ASÍNCRONA (AsyncSession) ---
+# Se crea bajo demanda: el driver asíncrono solo es necesario si algo usa get_async_db.
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        url = make_url(ASYNC_DATABASE_URL)
+        if _is_sqlite_memory(url):
+            options = {"poolclass": StaticPool}
+        elif url.get_backend_name() == "sqlite":
+            options = {}
+        else:
+            options = {
+                "connect_args": connect_args_for(url.get_driver_name()),
+                "pool_pre_ping": True,
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "pool_recycle": DB_POOL_RECYCLE,
+                "pool_timeout": DB_POOL_TIMEOUT,
+            }
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **options)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,90 @@
+# app/idempotency.py
+# Claves de idempotencia para los formularios POST (doble clic en "Enviar", reintentos del navegador).
+#
+# - Cada formulario lleva un token oculto nuevo por render: {{ idempotency_field() }}.
+# - El endpoint se decora con @idempotent y declara idempotency_key: Optional[str] = Form(None).
+#   El primer POST con un token lo reserva (store.add, atómico) y guarda la redirección que devolvió;
+#   los repetidos reciben esa misma redirección sin volver a ejecutar nada (ni BD, ni correos, ni archivos).
+#   Solo se recuerdan los éxitos: una redirección con ?error= libera el token, porque el usuario puede
+#   volver atrás al mismo formulario (mismo token), corregirlo y reenviarlo.
+# - Si llega un repetido mientras el primero sigue en curso, espera su resultado unos segundos.
+# - El almacén es propio (mismo CACHE_URL que app.cache, otro espacio de claves): en memoria no
+#   tiene límite de entradas, así el tráfico normal de la caché (ajustes, feriados, planillas) no
+#   puede desalojar una reserva o un resultado antes de su TTL. Con Redis lo comparten todos los
+#   workers. Si no responde, se procesa el POST normalmente (sin protección) en vez de rechazarlo.
+# - Un POST sin token (páginas viejas en caché, scripts) se procesa como siempre.
+
+import os
+import time
+import uuid
+import functools
+from urllib.parse import parse_qs, urlsplit
+from markupsafe import Markup
+from fastapi.responses import RedirectResponse
+
+from app.cache import CACHE_URL, CACHE_KEY_PREFIX, build_cache
+
+IDEMPOTENCY_FIELD = "idempotency_key"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))  # segundos que se recuerda un envío
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", 10))     # espera máxima a un envío en curso
+
+_PENDING = "pending"
+
+# Reservas y resultados: nunca se desalojan por tamaño, solo vencen (ver cabecera)
+store = build_cache(CACHE_URL, max_entries=None, prefix=f"{CACHE_KEY_PREFIX}-idem")
+
+def idempotency_field() -> Markup:
+    """Global de Jinja: campo oculto con un token nuevo para el formulario."""
+    return Markup(f'<input type="hidden" name="{IDEMPOTENCY_FIELD}" value="{uuid.uuid4().hex}">')
+
+def _cache_key(user_id, token: str) -> str:
+    return f"idem:{user_id}:{token}"
+
+def _wait_result(key: str):
+    """Resultado guardado de un envío previo, esperando si aún está en curso. None si no hay."""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while True:
+        stored = store.get(key)
+        if stored != _PENDING or time.monotonic() >= deadline:
+            return stored
+        time.sleep(0.1)
+
+def _is_error_redirect(url: str) -> bool:
+    """Las rutas informan los fallos redirigiendo con ?error=... (el envío no aplicó nada)."""
+    return "error" in parse_qs(urlsplit(url).query)
+
+def idempotent(handler):
+    """
+    Decorador para endpoints POST síncronos que responden con una redirección.
+    Usa los parámetros 'request', 'current' (usuario) e 'idempotency_key' del endpoint.
+    """
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        token = kwargs.get(IDEMPOTENCY_FIELD)
+        user = kwargs.get("current")
+        if not token or user is None:
+            return handler(*args, **kwargs)
+
+        key = _cache_key(user.id, token[:64])
+        if not store.add(key, _PENDING, ttl=IDEMPOTENCY_TTL):
+            stored = _wait_result(key)
+            if isinstance(stored, tuple):
+                url, status_code = stored
+                return RedirectResponse(url=url, status_code=status_code)
+            if stored == _PENDING:
+                request = kwargs["request"]
+                msg = "Tu envío anterior todavía se está procesando. Revisa el estado en unos segundos."
+                return RedirectResponse(url=str(request.url_for("dashboard")) + f"?error=duplicate&msg={msg}", status_code=303)
+            # Sin resultado: la caché no respondió o el registro venció. Se procesa normalmente.
+
+        try:
+            response = handler(*args, **kwargs)
+        except Exception:
+            store.delete(key)  # falló sin respuesta: el reintento debe poder ejecutarse
+            raise
+        if isinstance(response, RedirectResponse) and not _is_error_redirect(response.headers["location"]):
+            store.set(key, (response.headers["location"], response.status_code), ttl=IDEMPOTENCY_TTL)
+        else:
+            store.delete(key)
+        return response
+    return wrapper
@@ -0,0 +1,226 @@
+# app/logic/user_import.py
+# Carga masiva de cambios de usuarios desde una planilla (XLSX o CSV) para el panel de admin.
+#
+# Una fila por usuario EXISTENTE, identificado por CORREO. Columnas opcionales:
+#   AREA, CORREO_JEFE, SEDE, POLITICA (nombre), DIAS_TOTAL, ACTIVO (SI/NO)
+# Una celda vacía (o una columna ausente) deja ese dato como está.
+#
+# La validación se hace en bloque con pandas sobre toda la planilla y la tabla de usuarios
+# (correos duplicados, usuarios/jefes/políticas desconocidos, sedes y valores inválidos, ciclos de
+# jefatura) y produce un plan: la vista previa lo muestra y, si no hay errores, se aplica en una
+# sola transacción con crud.bulk_apply_user_changes.
+
+import io
+from sqlalchemy.orm import Session
+
+from app import models
+from app.constants import SEDES
+
+# Encabezado normalizado -> columna interna
+COLUMN_ALIASES = {
+    "CORREO": "email", "EMAIL": "email",
+    "AREA": "area", "ÁREA": "area",
+    "CORREO_JEFE": "manager_email", "JEFE": "manager_email",
+    "SEDE": "location", "UBICACION": "location", "UBICACIÓN": "location",
+    "POLITICA": "policy", "POLÍTICA": "policy",
+    "DIAS_TOTAL": "vacation_days_total", "DÍAS_TOTAL": "vacation_days_total", "DIAS": "vacation_days_total",
+    "ACTIVO": "is_active",
+}
+TRUE_VALUES = {"SI", "SÍ", "S", "1", "TRUE", "VERDADERO", "ACTIVO", "X"}
+FALSE_VALUES = {"NO", "N", "0", "FALSE", "FALSO", "INACTIVO"}
+MAX_ROWS = 5000
+PROTECTED_ROLES = ("admin", "hr")
+
+# Campos que se muestran en la vista previa, en orden
+FIELD_LABELS = {
+    "area": "Área", "manager_id": "Jefe", "location": "Sede", "vacation_policy_id": "Política",
+    "vacation_days_total": "Días totales", "is_active": "Activo", "role": "Rol",
+}
+
+class SheetError(ValueError):
+    """La planilla no se puede leer o no tiene la estructura esperada."""
+
+def read_sheet(content: bytes, filename: str):
+    """DataFrame de texto (sin conversiones de pandas) con las columnas internas."""
+    import pandas as pd  # solo al usar la carga masiva (igual que las descargas de reportes)
+    name = (filename or "").lower()
+    try:
+        if name.endswith((".xlsx", ".xlsm")):
+            df = pd.read_excel(io.BytesIO(content), dtype=str, engine="openpyxl")
+        elif name.endswith(".csv"):
+            text = content.decode("utf-8-sig", errors="replace")
+            first_line = text.split("\n", 1)[0]
+            df = pd.read_csv(io.StringIO(text), dtype=str, sep=";" if ";" in first_line else ",",
+                             skip_blank_lines=False)  # las filas vacías cuentan para numerar
+        else:
+            raise SheetError("Formato no soportado: suba un archivo .xlsx o .csv.")
+    except SheetError:
+        raise
+    except Exception as e:
+        raise SheetError(f"No se pudo leer el archivo: {e}")
+
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().upper().replace(" ", "_"), None))
+    df = df.loc[:, [c for c in df.columns if c is not None]]
+    df = df.loc[:, ~df.columns.duplicated()]
+    if "email" not in df.columns:
+        raise SheetError("Falta la columna CORREO.")
+    for col in COLUMN_ALIASES.values():
+        if col not in df.columns:
+            df[col] = None
+    df = df.apply(lambda s: s.str.strip()).replace("", None)
+    # Número de fila en la planilla (1 = encabezado), antes de quitar las filas vacías
+    df["row"] = df.index + 2
+    df = df[df.drop(columns="row").notna().any(axis=1)]
+    if len(df) > MAX_ROWS:
+        raise SheetError(f"El archivo tiene {len(df)} filas; el máximo es {MAX_ROWS}.")
+    return df
+
+def _manager_cycles(managers):
+    """
+    Ids que quedan en un ciclo de jefaturas (o debajo de uno) con el mapa final id -> jefe.
+    Salto de punteros: tras k duplicaciones cada id apunta a su ancestro 2^k; si después de
+    superar la profundidad posible todavía hay ancestro, la cadena no termina nunca.
+    """
+    ancestor = managers.dropna()
+    steps = max(1, int(len(managers)).bit_length() + 1)
+    for _ in range(steps):
+        ancestor = ancestor.map(ancestor).dropna()
+        if ancestor.empty:
+            break
+    return set(ancestor.index)
+
+def build_import_plan(db: Session, df) -> dict:
+    """
+    Valida la planilla contra la BD y calcula los cambios. No escribe nada.
+    Devuelve {"errors": [...], "changes": [...], "updates": [...], "rows": n}; 'updates' es la
+    entrada de crud.bulk_apply_user_changes (lista de {"id": ..., campo: valor}).
+    """
+    import pandas as pd
+
+    users = pd.DataFrame(
+        db.query(
+            models.User.id, models.User.email, models.User.full_name, models.User.role, models.User.area,
+            models.User.manager_id, models.User.location, models.User.vacation_policy_id,
+            models.User.vacation_days_total, models.User.is_active
+        ).all(),
+        columns=["id", "email", "full_name", "role", "area", "manager_id", "location",
+                 "vacation_policy_id", "vacation_days_total", "is_active"],
+    )
+    users["email_key"] = users["email"].str.strip().str.lower()
+    users = users[users["email_key"].notna()].drop_duplicates("email_key")
+    id_by_email = pd.Series(users["id"].values, index=users["email_key"])
+    policy_names = dict(db.query(models.VacationPolicy.id, models.VacationPolicy.name))
+    policies = {name.strip().upper(): pid for pid, name in policy_names.items()}
+
+    df = df.copy()
+    df["email_key"] = df["email"].str.lower()
+    errors = []
+
+    def flag(mask, message):
+        for row, email in df.loc[mask, ["row", "email"]].itertuples(index=False):
+            errors.append({"row": int(row), "email": email if isinstance(email, str) else "", "error": message})
+
+    # --- Validaciones, cada una sobre toda la columna ---
+    flag(df["email_key"].isna(), "Fila sin CORREO.")
+    flag(df["email_key"].notna() & df["email_key"].duplicated(keep=False), "Correo repetido en la planilla.")
+    flag(df["email_key"].notna() & ~df["email_key"].isin(id_by_email.index), "No existe un usuario con este correo.")
+
+    manager_key = df["manager_email"].str.lower()
+    has_manager = manager_key.notna()
+    flag(has_manager & ~manager_key.isin(id_by_email.index), "El jefe (CORREO_JEFE) no existe como usuario.")
+    flag(has_manager & (manager_key == df["email_key"]), "Un usuario no puede ser su propio jefe.")
+
+    location = df["location"].str.upper()
+    flag(location.notna() & ~location.isin(list(SEDES)), f"SEDE inválida (use: {', '.join(SEDES)}).")
+
+    policy_key = df["policy"].str.upper()
+    flag(policy_key.notna() & ~policy_key.isin(list(policies)), "La POLITICA no existe.")
+
+    days = pd.to_numeric(df["vacation_days_total"], errors="coerce")
+    flag(df["vacation_days_total"].notna() & ~((days >= 0) & (days <= 365) & (days == days.round())),
+         "DIAS_TOTAL debe ser un entero entre 0 y 365.")
+
+    active_key = df["is_active"].str.upper()
+    active = active_key.map(lambda v: True if v in TRUE_VALUES else (False if v in FALSE_VALUES else None))
+    flag(active_key.notna() & active.isna(), "ACTIVO debe ser SI o NO.")
+
+    # --- Valores nuevos por usuario (solo filas reconocibles; si hay errores el plan no se aplica) ---
+    valid = df["email_key"].isin(id_by_email.index) & ~df["email_key"].duplicated(keep=False)
+    new = pd.DataFrame({
+        "id": df.loc[valid, "email_key"].map(id_by_email),
+        "area": df.loc[valid, "area"],
+        "manager_id": manager_key[valid].map(id_by_email),
+        "location": location[valid],
+        "vacation_policy_id": policy_key[valid].map(policies),
+        "vacation_days_total": days[valid],
+        "is_active": active[valid],
+    })
+
+    # Admin y RRHH se administran a mano (igual que en la sincronización con el archivo de RRHH)
+    protected = new["id"].map(users.set_index("id")["role"]).isin(PROTECTED_ROLES)
+    flag(df.index.isin(new.index[protected & (new["is_active"] == False)]),
+         "No se puede desactivar a un usuario admin o RRHH desde la carga masiva.")
+
+    # Ciclos: el mapa final de jefaturas es el actual con los cambios de la planilla encima
+    final_managers = pd.Series(users["manager_id"].values, index=users["id"].values, dtype="float64")
+    overrides = new.dropna(subset=["manager_id"])
+    final_managers.loc[overrides["id"].values] = overrides["manager_id"].astype("float64").values
+    in_cycle = _manager_cycles(final_managers)
+    flag(df.index.isin(new.index[new["id"].isin(in_cycle) & new.index.isin(overrides.index)]),
+         "El cambio de jefe forma un ciclo de jefaturas.")
+
+    # --- Diferencias contra la BD ---
+    current = users.set_index("id")
+    changes, updates = {}, {}
+    for record in new.to_dict("records"):
+        uid = int(record["id"])
+        old = current.loc[uid]
+        for field in ("area", "manager_id", "location", "vacation_policy_id", "vacation_days_total", "is_active"):
+            value = record[field]
+            if value is None or pd.isna(value):
+                continue
+            if field in ("manager_id", "vacation_policy_id", "vacation_days_total"):
+                value = int(value)
+            old_value = None if pd.isna(old[field]) else old[field]
+            if field == "is_active":
+                value, old_value = bool(value), bool(old_value)
+            elif field in ("manager_id", "vacation_policy_id", "vacation_days_total") and old_value is not None:
+                old_value = int(old_value)
+            if value != old_value:
+                changes.setdefault(uid, {})[field] = (old_value, value)
+                updates.setdefault(uid, {"id": uid})[field] = value
+
+    # Quien pasa a tener subordinados necesita el rol de jefe para ver a su equipo
+    for uid in {v["manager_id"] for v in updates.values() if "manager_id" in v}:
+        if current.loc[uid, "role"] == "employee":
+            changes.setdefault(uid, {})["role"] = ("employee", "manager")
+            updates.setdefault(uid, {"id": uid})["role"] = "manager"
+
+    names = dict(zip(current.index, current["full_name"]))
+    emails = dict(zip(current.index, current["email"]))
+
+    def show(field, value):
+        if value is None:
+            return "—"
+        if field == "manager_id":
+            return emails.get(value, value)
+        if field == "vacation_policy_id":
+            return policy_names.get(value, value)
+        if field == "is_active":
+            return "SI" if value else "NO"
+        return value
+
+    preview = [
+        {
+            "email": emails[uid], "full_name": names[uid],
+            "fields": [(FIELD_LABELS[f], show(f, old), show(f, new_value))
+                       for f in FIELD_LABELS if f in diff for old, new_value in [diff[f]]],
+        }
+        for uid, diff in changes.items()
+    ]
+    return {
+        "rows": int(len(df)),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "changes": sorted(preview, key=lambda c: c["email"] or ""),
+        "updates": list(updates.values()),
+    }
@@ -1,5 +1,5 @@
 # app/logic/vacation_calculator.py
-from sqlalchemy import extract, and_
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
 from app import crud, models
@@ -14,8 +14,7 @@ class VacationCalculator:
         self.holidays = self.load_holidays(location)
 
     def load_settings(self):
-        settings_db = crud.get_all_settings(self.db)
-        settings_dict = {s.key: s.value for s in settings_db}
+        settings_dict = crud.get_settings_map(self.db)
         
         return {
             "HOLIDAYS_COUNT": settings_dict.get("HOLIDAYS_COUNT", "True") == "True",
@@ -42,8 +41,9 @@ class VacationCalculator:
         query = self.db.query(models.VacationPeriod).filter(
             models.VacationPeriod.user_id == self.user.id,
             models.VacationPeriod.type_period == period_type,
-            # Filtramos por el mismo año de la solicitud
-            extract('year', models.VacationPeriod.start_date) == year,
+            # Filtramos por el mismo año de la solicitud (rango de fechas, para usar el índice user_id+start_date)
+            models.VacationPeriod.start_date >= date(year, 1, 1),
+            models.VacationPeriod.start_date < date(year + 1, 1, 1),
             # Ignoramos las rechazadas (si te rechazaron una de 7, puedes volver a pedirla)
             models.VacationPeriod.status.in_(['draft', 'pending_hr', 'approved', 'pending_modification', 'pending_suspension', 'suspended'])
         )
@@ -62,9 +62,7 @@ class VacationCalculator:
     def load_holidays(self, location: str):
         current_year = date.today().year
         # Cargamos este año y el siguiente para tener margen
-        holidays_this_year = crud.get_holidays_by_year(self.db, current_year, location)
-        holidays_next_year = crud.get_holidays_by_year(self.db, current_year + 1, location)
-        return {h.holiday_date for h in holidays_this_year + holidays_next_year}
+        return crud.get_holiday_dates(self.db, current_year, location) | crud.get_holiday_dates(self.db, current_year + 1, location)
 
     def is_weekend(self, day: date):
         return day.weekday() >= 5
@@ -1,58 +1,156 @@
 # app/main.py
 import os
+import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import timedelta, datetime
 from typing import Optional
 
 # --- IMPORTS DE FASTAPI ---
-from fastapi import FastAPI, Request, Depends, Form, UploadFile, File, HTTPException, Header, Response
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Depends, Form, UploadFile, File, HTTPException, Header, Response, BackgroundTasks
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.concurrency import run_in_threadpool
 
 # --- IMPORTS DE BASE DE DATOS Y APP ---
 from sqlalchemy.orm import Session
 from app import crud, models, schemas
-from app.db import SessionLocal, engine, Base, get_db
+from app.db import SessionLocal, engine, Base, get_db, current_route, IS_SQLITE
 from app.auth import get_current_user, create_access_token, get_current_manager_user, oauth
 from app.utils.email import send_email_async
+from app.utils.files import UPLOADS_DIR, save_upload
+from app.idempotency import idempotent
+from app.templating import templates, warm_templates
+from app import metrics, query_stats, profiler
+from app.query_stats import query_budget
 
 # --- IMPORTS DE ROUTERS ---
 from app.routers import admin as admin_router
 from app.routers import actions as actions_router
 from app.routers import reports as reports_router
+from app.routers import documents as documents_router
 from app.api import api_router # Asegúrate de importar esto si lo usas abajo
 
 # --- IMPORTS DE RATE LIMITING (SLOWAPI) ---
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
-# 1. CONFIGURAR LIMITER CON REGLA GLOBAL
-# Esto asegura que NINGUNA IP pueda hacer más de 100 peticiones/minuto en general
-limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
-
-def seed_initial_data():
+# 1. LIMITER: por usuario (o IP sin sesión), límite global y almacenamiento en app/ratelimit.py
+from app.ratelimit import limiter
+
+
+# --- ARRANQUE ---
+# Importar app.main no toca la BD: la siembra corre una vez por worker al iniciar
+# (o con 'python init_db.py'). SEED_ON_STARTUP=false la omite por completo.
+SEED_ON_STARTUP = os.getenv("SEED_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compilar las plantillas ahora para que el primer dashboard tras un despliegue no lo pague
+    await run_in_threadpool(warm_templates)
+    stop_metrics = metrics.start_flusher()
+    if IS_SQLITE:
+        # Las migraciones de Alembic son de MySQL: en SQLite el esquema sale directo de los modelos
+        await run_in_threadpool(Base.metadata.create_all, engine)
+    if SEED_ON_STARTUP:
+        try:
+            created = await run_in_threadpool(run_seed)
+            if created:
+                logger.info("Creados %s ajustes por defecto", created)
+        except Exception as e:
+            # Sin BD el proceso igual arranca; las rutas fallarán hasta que vuelva
+            logger.warning("No se pudo sembrar la BD al iniciar: %s", e)
+    yield
+    stop_metrics.set()
+
+def run_seed() -> int:
     db = SessionLocal()
-    crud.seed_holidays(db)
-    crud.seed_settings(db)
-    db.close()
-
-seed_initial_data()
+    try:
+        return crud.seed_initial_data(db)
+    finally:
+        db.close()
 
-templates = Jinja2Templates(directory="app/templates")
+app = FastAPI(root_path="/gestion", lifespan=lifespan)
 
-app = FastAPI(root_path="/gestion")
+# --- MIDDLEWARE DE MÉTRICAS (latencia, códigos de estado, peticiones en curso) ---
+# Reemplaza los print por petición: el detalle queda en el logger 'app.access' (nivel DEBUG).
+access_logger = logging.getLogger("app.access")
 
-# --- MIDDLEWARE DE LOGGING (Añadido para ver actividad en consola) ---
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"DEBUG: {request.method} {request.url.path} - Host: {request.headers.get('host')}")
+async def record_request_metrics(request: Request, call_next):
+    metrics.registry.request_started()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        route = metrics.route_label(request)
+        metrics.registry.request_finished(request.method, route, status, elapsed)
+        if access_logger.isEnabledFor(logging.DEBUG):
+            access_logger.debug("method=%s route=%s path=%s status=%s ms=%.1f",
+                                request.method, route, request.url.path, status, elapsed * 1000)
+
+# --- CONSULTAS SQL POR PETICIÓN (ver app/query_stats.py) ---
+@app.middleware("http")
+async def track_queries(request: Request, call_next):
+    stats = query_stats.start_request()
     response = await call_next(request)
-    print(f"DEBUG: Status {response.status_code}")
+    # Server-Timing cubre lo consultado antes de enviar cabeceras; el presupuesto se valida
+    # al terminar el cuerpo, para incluir también las respuestas en streaming.
+    response.headers["Server-Timing"] = query_stats.server_timing(stats)
+    response.body_iterator = _check_budget_after_body(response.body_iterator, request, stats)
     return response
 
+async def _check_budget_after_body(body, request: Request, stats):
+    async for chunk in body:
+        yield chunk
+    query_stats.check_budget(request, stats)
+
+# --- ETIQUETA DE RUTA PARA EL POOL DE BD (ver app/db.py: get_pool_stats) ---
+@app.middleware("http")
+async def tag_db_route(request: Request, call_next):
+    token = current_route.set(f"{request.method} {request.url.path}")
+    try:
+        return await call_next(request)
+    finally:
+        current_route.reset(token)
+
+# --- PERFILADOR BAJO DEMANDA (?__profile=1 o 'X-Profile: 1', solo admin; ver app/profiler.py) ---
+# Declarado al final para envolver a los demás: su verificación de admin no cuenta en las consultas de la ruta.
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not profiler.wants_profile(request):
+        return await call_next(request)
+    admin = await run_in_threadpool(profiler.authorize_admin, request)
+    if admin is None:
+        # Para quien no es admin el parámetro se ignora
+        return await call_next(request)
+
+    session = profiler.ProfileSession(request, admin)
+    session.start()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        # El cuerpo (incluido el streaming) es parte de la petición perfilada
+        async for _ in response.body_iterator:
+            pass
+    finally:
+        profile = session.finish(status)
+
+    # Se responde con el informe (no con una redirección: otro worker no tendría el perfil)
+    return templates.TemplateResponse(
+        request, "admin_profile_detail.html", {"profile": profile},
+        headers={"X-Profile-Id": str(profile.id)}
+    )
+
 # 2. CONECTAR LIMITER A LA APP
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -62,19 +160,24 @@ app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY","secret"
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-uploads_dir = "uploads"
-os.makedirs(uploads_dir, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+# Los documentos NO se montan como estáticos: se sirven por 'vacation_document' con control de permisos
+os.makedirs(UPLOADS_DIR, exist_ok=True)
 
 app.state.oauth = oauth
 
+# --- MÉTRICAS PROMETHEUS ---
+# Si METRICS_TOKEN está definido, el scraper debe enviar 'Authorization: Bearer <token>'.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+@app.get("/metrics", include_in_schema=False, name="metrics")
+def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="No autorizado")
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- RUTAS DE AUTENTICACIÓN ---
 @app.get("/", response_class=HTMLResponse, name="home")
 def home(request: Request):
-    print("--- CABECERAS DE LA PETICIÓN ---")
-    print(f"IP Cliente (Directa): {request.client.host}")
-    print(f"X-Forwarded-For: {request.headers.get('x-forwarded-for')}")
-    print(f"User-Agent: {request.headers.get('user-agent')}")
     tmpl = templates.get_template("home.html")
     return tmpl.render({"request": request})
 
@@ -109,12 +212,17 @@ async def auth_google_callback(request: Request, db: Session = Depends(get_db)):
         error_url = str(request.url_for('login_page')) + "?error=domain"
         return RedirectResponse(url=error_url, status_code=302)
 
-    user_in_db = db.query(models.User).filter(models.User.email == user_email).first()
+    # Ruta async (OAuth): la consulta síncrona va al threadpool para no bloquear el event loop
+    user_in_db = await run_in_threadpool(crud.get_user_by_email, db, user_email)
 
     if not user_in_db:
         error_url = str(request.url_for('login_page')) + "?error=not_found"
         return RedirectResponse(url=error_url, status_code=302)
 
+    if not user_in_db.is_active:
+        error_url = str(request.url_for('login_page')) + "?error=inactive"
+        return RedirectResponse(url=error_url, status_code=302)
+
     access_token = create_access_token(data={"sub": user_in_db.email})
 
     response = RedirectResponse(url=request.url_for('dashboard'), status_code=302)
@@ -130,6 +238,7 @@ def logout(request: Request):
 # --- RUTAS PRINCIPALES ---
 
 @app.get("/app", response_class=HTMLResponse, name="dashboard")
+@query_budget(12)
 def dashboard(
     request: Request, 
     current=Depends(get_current_user), 
@@ -145,12 +254,12 @@ def dashboard(
     if user.role == 'manager':
         # USAMOS CONSULTA EXPLÍCITA PARA EVITAR PROBLEMAS DE LAZY LOADING
         subs = crud.get_users_by_manager(db, user.id)
+        balances = crud.get_balances_for_users(db, subs)  # un solo SUM agrupado para todo el equipo
         
         for sub in subs:
-            balance = crud.get_user_vacation_balance(db, sub)
             my_team_data.append({
                 "user": sub,
-                "balance": balance
+                "balance": balances[sub.id]
             })
     # ------------------------------------------------------------
 
@@ -192,12 +301,15 @@ def new_vacation_form(
     })
 
 @app.post("/vacations", name="vacation_create")
-async def create_vacation(
+@idempotent
+def create_vacation(
     request: Request, 
+    background_tasks: BackgroundTasks,
     start_date: str = Form(...), 
     period_type: int = Form(...), 
     target_user_id: Optional[int] = Form(None),
     file: UploadFile = File(None), 
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -229,14 +341,7 @@ async def create_vacation(
 
     file_path_in_db = None
     if file and file.filename: 
-        uploads_dir = "uploads"
-        # Aseguramos que el directorio exista
-        os.makedirs(uploads_dir, exist_ok=True)
-        file_path_in_db = f"{user_to_create_for.username}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-        file_disk_path = os.path.join(uploads_dir, file_path_in_db)
-        
-        with open(file_disk_path, "wb") as f:
-            f.write(await file.read())
+        file_path_in_db = save_upload(file, f"{user_to_create_for.username}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
             
     try:
         vp = crud.create_vacation(db, user_to_create_for, start_date, period_type, file_path_in_db)
@@ -251,7 +356,9 @@ async def create_vacation(
         if manager and manager.email and manager.id != current.id:
             approval_link = str(request.url_for('login_page'))
             
-            await send_email_async(
+            # El envío SMTP corre después de responder, fuera del request
+            background_tasks.add_task(
+                send_email_async,
                 subject=f"NUEVA SOLICITUD DE VACACIONES - {user_to_create_for.full_name}",
                 email_to=[manager.email],
                 body=f"""
@@ -352,12 +459,14 @@ def edit_vacation_form(
     })
 
 @app.post("/vacation/{vacation_id}/edit", name="vacation_edit_submit")
-async def edit_vacation_submit(
+@idempotent
+def edit_vacation_submit(
     request: Request,
     vacation_id: int,
     start_date: str = Form(...),
     period_type: int = Form(...),
     file: UploadFile = File(None),
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -369,12 +478,7 @@ async def edit_vacation_submit(
     
     file_path_in_db = vacation.attached_file
     if file and file.filename: 
-        uploads_dir = "uploads"
-        file_path_in_db = f"{current.username}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-        file_disk_path = os.path.join(uploads_dir, file_path_in_db)
-        
-        with open(file_disk_path, "wb") as f:
-            f.write(await file.read())
+        file_path_in_db = save_upload(file, f"{current.username}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
             
     try:
         crud.update_vacation_details(
@@ -410,12 +514,7 @@ def vacation_details(
     if not vacation:
         raise HTTPException(status_code=404, detail="Solicitud no encontrada")
 
-    can_view = False
-    if current.role in ['admin', 'hr']: can_view = True
-    elif current.role == 'manager' and vacation.user.manager_id == current.id: can_view = True
-    elif current.id == vacation.user_id: can_view = True
-
-    if not can_view:
+    if not crud.check_view_permission(vacation, current):
         raise HTTPException(status_code=403, detail="No autorizado")
 
     logs = crud.get_logs_for_vacation(db, vacation_id=vacation_id)
@@ -467,4 +566,5 @@ def suspend_vacation_form(
 app.include_router(api_router, prefix="/api")
 app.include_router(admin_router.router)
 app.include_router(actions_router.router)
-app.include_router(reports_router.router)
\ No newline at end of file
+app.include_router(reports_router.router)
+app.include_router(documents_router.router)
\ No newline at end of file
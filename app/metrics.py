@@ -0,0 +1,243 @@
+# app/metrics.py
+# Registro de métricas en memoria (por worker) y exportación en formato texto de Prometheus.
+#
+# Cada worker de uvicorn tiene su propio registro. Con METRICS_DIR definido, cada worker
+# vuelca su estado a METRICS_DIR/metrics_<pid>.json cada METRICS_FLUSH_SECONDS y /metrics
+# suma los archivos de todos los workers (sea cual sea el que atiende la petición).
+# Los archivos de workers muertos se funden en METRICS_DIR/totals.json y se borran, así el
+# directorio no crece con cada reinicio de workers.
+
+import os
+import json
+import fcntl
+import threading
+from app.db import get_pool_stats
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 5))
+
+# Segundos. Cubre desde rutas de JSON (ms) hasta exportaciones Excel (varios segundos).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}   # "METHOD route" -> [conteo por bucket..., +Inf, suma]
+        self.status = {}    # "METHOD route status" -> conteo
+        self.in_flight = 0
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float):
+        key = f"{method} {route}"
+        with self._lock:
+            self.in_flight -= 1
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[len(LATENCY_BUCKETS)] += 1
+            hist[-1] += seconds
+            status_key = f"{key} {status}"
+            self.status[status_key] = self.status.get(status_key, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = {
+                "latency": {k: list(v) for k, v in self.latency.items()},
+                "status": dict(self.status),
+                "in_flight": self.in_flight,
+            }
+        pool = get_pool_stats()
+        data["pool"] = {
+            "checked_out": pool["checked_out"],
+            "overflow": max(0, pool["overflow"]),  # QueuePool informa negativo mientras no hay overflow
+            "checkouts": pool["checkouts"],
+            "timeouts": pool["timeouts"],
+            "wait_seconds": pool["wait_total_seconds"],
+        }
+        return data
+
+registry = MetricsRegistry()
+
+# --- AGREGACIÓN ENTRE WORKERS ---
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"metrics_{pid}.json")
+
+def flush_snapshot():
+    """Escribe el estado de este worker de forma atómica (archivo temporal + replace)."""
+    path = _snapshot_path(os.getpid())
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _add_counters(totals: dict, snap: dict):
+    for key, hist in snap["latency"].items():
+        acc = totals["latency"].setdefault(key, [0] * len(hist))
+        for i, v in enumerate(hist):
+            acc[i] += v
+    for key, count in snap["status"].items():
+        totals["status"][key] = totals["status"].get(key, 0) + count
+    for k in ("checkouts", "timeouts", "wait_seconds"):
+        totals["pool"][k] = totals["pool"].get(k, 0) + snap["pool"][k]
+
+def _merge_dead_workers() -> dict:
+    """
+    Suma los contadores de los workers muertos en totals.json y borra sus archivos: los
+    contadores no deben retroceder, pero tampoco hace falta un archivo por cada pid que existió.
+    Devuelve los totales acumulados (sin gauges: un worker muerto no tiene nada en curso).
+    """
+    totals_path = os.path.join(METRICS_DIR, "totals.json")
+    totals = _read_json(totals_path) or {"latency": {}, "status": {}, "pool": {}}
+    dead = []
+    for name in os.listdir(METRICS_DIR):
+        if name.startswith("metrics_") and name.endswith(".json"):
+            pid = int(name[len("metrics_"):-len(".json")])
+            if not _pid_alive(pid):
+                dead.append(os.path.join(METRICS_DIR, name))
+    if dead:
+        for path in dead:
+            snap = _read_json(path)
+            if snap is not None:
+                _add_counters(totals, snap)
+        tmp = f"{totals_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(totals, f)
+        os.replace(tmp, totals_path)
+        for path in dead:
+            os.remove(path)
+    totals["in_flight"] = 0
+    return totals
+
+def _load_snapshots() -> list:
+    """Estado de cada worker vivo más los totales de los muertos (el último elemento)."""
+    if not METRICS_DIR:
+        return [registry.snapshot()]
+    flush_snapshot()
+    # El lock evita que dos workers fundan el mismo archivo (y lo cuenten dos veces) o que uno
+    # lea un archivo que otro ya sumó a los totales.
+    with open(os.path.join(METRICS_DIR, "metrics.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        totals = _merge_dead_workers()
+        snapshots = []
+        for name in os.listdir(METRICS_DIR):
+            if name.startswith("metrics_") and name.endswith(".json"):
+                snap = _read_json(os.path.join(METRICS_DIR, name))
+                if snap is not None:
+                    snapshots.append(snap)
+    return snapshots + [totals]
+
+def _flush_loop(stop: threading.Event):
+    while not stop.wait(METRICS_FLUSH_SECONDS):
+        try:
+            flush_snapshot()
+        except OSError:
+            pass
+
+def start_flusher() -> threading.Event:
+    """Hilo de fondo que vuelca el registro periódicamente (fuera del camino de cada petición)."""
+    stop = threading.Event()
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        threading.Thread(target=_flush_loop, args=(stop,), daemon=True, name="metrics-flush").start()
+    return stop
+
+# --- FORMATO PROMETHEUS ---
+
+def _labels(**labels) -> str:
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+def render_prometheus() -> str:
+    snapshots = _load_snapshots()
+    workers = len(snapshots) - 1 if METRICS_DIR else 1  # sin contar los totales de los muertos
+
+    latency, status = {}, {}
+    in_flight = 0
+    pool = {"checked_out": 0, "overflow": 0, "checkouts": 0, "timeouts": 0, "wait_seconds": 0.0}
+    for snap in snapshots:
+        for key, hist in snap["latency"].items():
+            acc = latency.setdefault(key, [0] * len(hist))
+            for i, v in enumerate(hist):
+                acc[i] += v
+        for key, count in snap["status"].items():
+            status[key] = status.get(key, 0) + count
+        in_flight += snap["in_flight"]
+        for k in pool:
+            pool[k] += snap["pool"].get(k, 0)
+
+    lines = [
+        "# HELP http_request_duration_seconds Latencia por ruta (hasta que la respuesta empieza a enviarse).",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for key in sorted(latency):
+        method, route = key.split(" ", 1)
+        hist = latency[key]
+        # Los buckets ya son acumulativos (request_finished suma en todos los 'le' >= duración)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {hist[i]}")
+        total = hist[len(LATENCY_BUCKETS)]
+        lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le='+Inf')} {total}")
+        lines.append(f"http_request_duration_seconds_sum{_labels(method=method, route=route)} {hist[-1]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{_labels(method=method, route=route)} {total}")
+
+    lines += ["# HELP http_requests_total Peticiones por ruta y código de estado.", "# TYPE http_requests_total counter"]
+    for key in sorted(status):
+        rest, code = key.rsplit(" ", 1)
+        method, route = rest.split(" ", 1)
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=code)} {status[key]}")
+
+    lines += [
+        "# HELP http_requests_in_flight Peticiones en curso (todos los workers).",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {in_flight}",
+        "# HELP db_pool_checked_out Conexiones del pool en uso.",
+        "# TYPE db_pool_checked_out gauge",
+        f"db_pool_checked_out {pool['checked_out']}",
+        "# HELP db_pool_overflow Conexiones de overflow abiertas.",
+        "# TYPE db_pool_overflow gauge",
+        f"db_pool_overflow {pool['overflow']}",
+        "# HELP db_pool_checkouts_total Conexiones entregadas por el pool.",
+        "# TYPE db_pool_checkouts_total counter",
+        f"db_pool_checkouts_total {pool['checkouts']}",
+        "# HELP db_pool_timeouts_total Esperas de conexión que agotaron DB_POOL_TIMEOUT.",
+        "# TYPE db_pool_timeouts_total counter",
+        f"db_pool_timeouts_total {pool['timeouts']}",
+        "# HELP db_pool_wait_seconds_total Tiempo total esperando una conexión libre.",
+        "# TYPE db_pool_wait_seconds_total counter",
+        f"db_pool_wait_seconds_total {pool['wait_seconds']:.6f}",
+        "# HELP metrics_workers Workers vivos con datos en este agregado.",
+        "# TYPE metrics_workers gauge",
+        f"metrics_workers {workers}",
+    ]
+    return "\n".join(lines) + "\n"
+
+def route_label(request) -> str:
+    """Plantilla de la ruta ('/vacation/{vacation_id}/details'), no la URL: evita una serie por ID."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -1,7 +1,7 @@
 # app/models.py
 # (VERSIÓN PARTE 10)
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Text, DateTime
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Text, DateTime, Index
 from sqlalchemy.orm import relationship, backref # <-- AÑADIR backref
 from datetime import datetime
 from .db import Base
@@ -56,6 +56,13 @@ class VacationPeriod(Base):
     consolidated_doc_path = Column(String(255), nullable=True)
     manager_individual_doc_path = Column(String(255), nullable=True)
 
+    # Índices para saldos, cruces y colas del dashboard (migración 94803891266c)
+    __table_args__ = (
+        Index("ix_vacation_periods_user_status", "user_id", "status"),
+        Index("ix_vacation_periods_user_start", "user_id", "start_date"),
+        Index("ix_vacation_periods_status_start", "status", "start_date"),
+    )
+
 class SystemConfig(Base):
     __tablename__ = "system_config"
     id = Column(Integer, primary_key=True, index=True)
@@ -83,6 +90,10 @@ class ModificationRequest(Base):
     new_end_date = Column(Date, nullable=True)
     new_days = Column(Integer, nullable=True)
 
+    __table_args__ = (
+        Index("ix_modification_requests_status_period", "status", "vacation_period_id"),
+    )
+
 class VacationLog(Base):
     __tablename__ = "vacation_logs"
     id = Column(Integer, primary_key=True, index=True)
@@ -96,6 +107,10 @@ class VacationLog(Base):
     log_text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_vacation_logs_period_created", "vacation_period_id", "created_at"),
+    )
+
 # --- NUEVO MODELO (PARTE 10) ---
 class SuspensionRequest(Base):
     """
@@ -119,6 +134,10 @@ class SuspensionRequest(Base):
     # Solo para suspensiones parciales
     new_end_date_parcial = Column(Date, nullable=True)
 
+    __table_args__ = (
+        Index("ix_suspension_requests_status_period", "status", "vacation_period_id"),
+    )
+
 # app/models.py
 # (AÑADIR AL FINAL, ANTES DE LA ULTIMA LÍNEA)
 
@@ -0,0 +1,255 @@
+# app/profiler.py
+# Perfilador por muestreo bajo demanda (solo administradores).
+#
+# Una petición con '?__profile=1' o la cabecera 'X-Profile: 1' hecha por un admin se ejecuta
+# normalmente mientras un hilo toma muestras de las pilas de Python cada PROFILER_INTERVAL_MS.
+# El resultado (flame graph, tiempo SQL por sentencia y tiempo de render de plantillas)
+# se guarda en un buffer circular en memoria, por worker, que se consulta en /admin/profiles.
+
+import os
+import sys
+import time
+import threading
+import itertools
+import sysconfig
+import contextvars
+from collections import deque, Counter
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.db import engine, SessionLocal
+
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", 60))  # corta el muestreo de peticiones colgadas
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", 50))
+PROFILE_PARAM = "__profile"
+PROFILE_HEADER = "x-profile"
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, user: str):
+        self.id = None
+        self.method = method
+        self.path = path
+        self.user = user
+        self.created_at = datetime.now()
+        self.status = None
+        self.wall_ms = 0.0
+        self.samples = 0
+        self.stacks = Counter()        # "raiz;...;hoja" -> muestras
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.sql_statements = {}       # sentencia -> [veces, segundos]
+        self.template_seconds = 0.0
+        self.templates = Counter()     # nombre -> segundos
+        self._lock = threading.Lock()
+
+    def add_sql(self, statement: str, seconds: float):
+        statement = " ".join(statement.split())
+        with self._lock:
+            self.sql_count += 1
+            self.sql_seconds += seconds
+            entry = self.sql_statements.setdefault(statement, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_template(self, name: str, seconds: float):
+        with self._lock:
+            self.template_seconds += seconds
+            self.templates[name] += seconds
+
+    # --- Vistas para el template ---
+
+    @property
+    def sample_ms(self) -> float:
+        return self.samples * PROFILER_INTERVAL_MS
+
+    def top_functions(self, limit: int = 25) -> list:
+        """(función, muestras propias, muestras inclusivas) ordenadas por tiempo propio."""
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        return [(name, count, inclusive[name]) for name, count in own.most_common(limit)]
+
+    def top_statements(self, limit: int = 15) -> list:
+        rows = sorted(self.sql_statements.items(), key=lambda kv: kv[1][1], reverse=True)
+        return [(stmt, n, secs * 1000) for stmt, (n, secs) in rows[:limit]]
+
+    def flame_tree(self, min_ratio: float = 0.005) -> dict:
+        """Árbol {name, value, children} de las pilas; se podan nodos por debajo de min_ratio del total."""
+        root = {"name": "total", "value": 0, "children": {}}
+        for stack, count in self.stacks.items():
+            root["value"] += count
+            node = root
+            for name in stack.split(";"):
+                child = node["children"].setdefault(name, {"name": name, "value": 0, "children": {}})
+                child["value"] += count
+                node = child
+        threshold = max(1, root["value"] * min_ratio)
+
+        def prune(node):
+            kids = [prune(c) for c in node["children"].values() if c["value"] >= threshold]
+            return {"name": node["name"], "value": node["value"],
+                    "children": sorted(kids, key=lambda c: c["value"], reverse=True)}
+        return prune(root)
+
+    def folded(self) -> str:
+        """Formato 'folded' (flamegraph.pl, speedscope): una pila por línea con su conteo."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+# Perfil activo de la petición en curso. Se copia a los hilos del threadpool con el contexto.
+_active_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("active_profile", default=None)
+
+def current_profile() -> Optional[RequestProfile]:
+    return _active_profile.get()
+
+# --- BUFFER CIRCULAR ---
+
+_profiles = deque(maxlen=PROFILER_MAX_PROFILES)
+_profiles_lock = threading.Lock()
+_ids = itertools.count(1)
+
+def store_profile(profile: RequestProfile):
+    with _profiles_lock:
+        profile.id = next(_ids)
+        _profiles.appendleft(profile)
+
+def list_profiles() -> list:
+    with _profiles_lock:
+        return list(_profiles)
+
+def get_profile(profile_id: int) -> Optional[RequestProfile]:
+    with _profiles_lock:
+        return next((p for p in _profiles if p.id == profile_id), None)
+
+# --- ACTIVACIÓN ---
+
+def wants_profile(request) -> bool:
+    return request.query_params.get(PROFILE_PARAM) == "1" or request.headers.get(PROFILE_HEADER) == "1"
+
+def authorize_admin(request):
+    """Las mismas dependencias que las rutas de admin, llamadas a mano (con su propia sesión)."""
+    # Import local: app.templating importa este módulo y app.auth arrastra crud/modelos
+    from fastapi import HTTPException
+    from app.auth import get_current_user, get_current_admin_user
+    db = SessionLocal()
+    try:
+        return get_current_admin_user(get_current_user(request, db))
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+# --- MUESTREO ---
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    elif filename.startswith(STDLIB_DIR) and "site-packages" not in filename:
+        filename = os.path.relpath(filename, STDLIB_DIR)
+    else:
+        # site-packages/fastapi/routing.py -> fastapi/routing.py
+        marker = "site-packages" + os.sep
+        idx = filename.rfind(marker)
+        if idx >= 0:
+            filename = filename[idx + len(marker):]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+def _worker_context(frame):
+    """Contexto que ejecuta un hilo del threadpool de anyio (WorkerThread.run lo tiene en 'context')."""
+    while frame is not None:
+        if frame.f_code.co_name == "run":
+            ctx = frame.f_locals.get("context")
+            if isinstance(ctx, contextvars.Context):
+                return ctx
+        frame = frame.f_back
+    return None
+
+def _stack(frame) -> list:
+    names = []
+    while frame is not None:
+        names.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+class Sampler(threading.Thread):
+    """
+    Toma muestras de los hilos que trabajan para la petición perfilada:
+    - hilos del threadpool cuyo contexto tiene este perfil activo (rutas 'def', dependencias, streaming);
+    - el hilo del event loop, solo cuando está ejecutando código del proyecto (middlewares, rutas async).
+    """
+    def __init__(self, profile: RequestProfile, loop_thread_id: int):
+        super().__init__(daemon=True, name="request-profiler")
+        self.profile = profile
+        self.loop_thread_id = loop_thread_id
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def run(self):
+        interval = PROFILER_INTERVAL_MS / 1000
+        deadline = time.monotonic() + PROFILER_MAX_SECONDS
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id == self.loop_thread_id:
+                    stack = _stack(frame)
+                    # En reposo el loop está en select(); solo cuenta si corre código de app/
+                    if not any("(app/" in name for name in stack):
+                        continue
+                    stack.insert(0, "[event loop]")
+                else:
+                    ctx = _worker_context(frame)
+                    if ctx is None or ctx.get(_active_profile) is not self.profile:
+                        continue
+                    stack = ["[threadpool]"] + _stack(frame)
+                self.profile.stacks[";".join(stack)] += 1
+                self.profile.samples += 1
+
+class ProfileSession:
+    """Activa el perfil en el contexto actual y arranca/detiene el muestreo."""
+    def __init__(self, request, user):
+        self.profile = RequestProfile(request.method, request.url.path, user.username)
+        self._token = None
+        self._sampler = None
+        self._start = 0.0
+
+    def start(self):
+        self._token = _active_profile.set(self.profile)
+        self._sampler = Sampler(self.profile, threading.get_ident())
+        self._start = time.perf_counter()
+        self._sampler.start()
+
+    def finish(self, status: int) -> RequestProfile:
+        self._sampler.stop()
+        self.profile.wall_ms = (time.perf_counter() - self._start) * 1000
+        self.profile.status = status
+        _active_profile.reset(self._token)
+        store_profile(self.profile)
+        return self.profile
+
+# --- SQL ---
+
+@event.listens_for(engine, "before_cursor_execute")
+def _profile_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _profile_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile.get()
+    if profile is not None and conn.info.get("profile_query_start"):
+        profile.add_sql(statement, time.perf_counter() - conn.info["profile_query_start"].pop())
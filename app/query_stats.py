@@ -0,0 +1,83 @@
+# app/query_stats.py
+# Conteo de consultas SQL y tiempo de BD por petición, log de consultas lentas
+# y presupuestos de consultas por ruta (para detectar N+1 sin leer código).
+
+import os
+import time
+import logging
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+from app.db import engine, current_route
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# En modo estricto (tests/CI) exceder el presupuesto lanza QueryBudgetExceeded en vez de solo avisar
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("app.sql")
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+class RequestQueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+# El objeto es mutable y compartido: las consultas hechas en el threadpool (rutas 'def')
+# suman sobre el mismo contador que creó el middleware.
+_request_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+def start_request() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    _request_stats.set(stats)
+    return stats
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Consulta lenta (%.1f ms) en %s: %s", elapsed * 1000, current_route.get(), " ".join(statement.split())[:1000])
+
+# --- PRESUPUESTOS POR RUTA ---
+
+def query_budget(max_queries: int):
+    """
+    Declara cuántas consultas puede hacer una ruta (incluida la autenticación).
+    Se usa debajo del decorador de la ruta:
+
+        @router.get("/...")
+        @query_budget(10)
+        def vista(...): ...
+    """
+    def decorator(func):
+        func.query_budget = max_queries
+        return func
+    return decorator
+
+def budget_for(request) -> Optional[int]:
+    route = request.scope.get("route")
+    return getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+def check_budget(request, stats: RequestQueryStats):
+    budget = budget_for(request)
+    if budget is None or stats.count <= budget:
+        return
+    msg = f"{request.method} {request.url.path} hizo {stats.count} consultas (presupuesto {budget})"
+    if QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(msg)
+    logger.warning(msg)
+
+def server_timing(stats: RequestQueryStats) -> str:
+    return f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} consultas"'
@@ -0,0 +1,43 @@
+# app/ratelimit.py
+# Límites de peticiones (slowapi) por usuario autenticado, con almacenamiento compartido entre workers.
+#
+# - Clave: el 'sub' (email) del JWT de la cookie; sin sesión válida, la IP del cliente.
+#   Detrás del NAT del campus cientos de personas comparten IP: limitar por IP las frenaba juntas.
+# - RATELIMIT_STORAGE_URI: "redis://host:6379/0" para que todos los workers compartan contadores.
+#   "memory://" (por defecto) es el sustituto local: un contador por proceso, válido con un solo worker.
+#   Si Redis no responde, se usa memoria temporalmente en vez de rechazar peticiones.
+
+import os
+import jwt
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from app.auth import SECRET_KEY, ALGORITHM
+
+# RATELIMIT_ENABLED=false lo desactiva (pruebas de carga desde una sola IP: benchmarks/loadtest.py)
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "100/minute")
+# La calculadora se consulta en cada cambio del formulario: necesita más margen que el resto
+RATELIMIT_CALCULATOR = os.getenv("RATELIMIT_CALCULATOR", "300/minute")
+
+def user_or_ip(request) -> str:
+    """Solo valida la firma del JWT (sin consultar la BD): corre en cada petición."""
+    token = request.cookies.get("access_token")
+    if token:
+        try:
+            email = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        except jwt.PyJWTError:
+            email = None
+        if email:
+            return f"user:{email}"
+    return f"ip:{get_remote_address(request)}"
+
+limiter = Limiter(
+    key_func=user_or_ip,
+    default_limits=[RATELIMIT_DEFAULT],
+    storage_uri=RATELIMIT_STORAGE_URI,
+    key_prefix="vacaciones",
+    in_memory_fallback_enabled=True,
+    enabled=RATELIMIT_ENABLED,
+)
@@ -1,17 +1,25 @@
-from fastapi import APIRouter, Depends, Request, Form, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, Request, Form, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
-import os
-from typing import Optional
+from typing import List, Optional
 from app import crud, models, schemas
 from app.auth import get_current_user, get_current_manager_user, get_current_hr_user
 from app.db import get_db
 from app.utils.email import send_email_async  # Importamos la utilidad
+from app.utils.files import save_upload
+from app.idempotency import idempotent
 
 def get_hr_emails(db: Session):
     hr_users = db.query(models.User).filter(models.User.role.in_(['hr', 'admin'])).all()
     return [u.email for u in hr_users if u.email]
+
+def conflict_redirect(request: Request, e: Exception):
+    """Otro usuario ya movió la solicitud: se vuelve al dashboard con el aviso en vez de pisar su cambio."""
+    return RedirectResponse(url=str(request.url_for('dashboard')) + f"?error=conflict&msg={str(e)}", status_code=302)
+
+SUBMIT_SUMMARY_LIMIT = 10  # periodos listados por nombre en el mensaje del envío en lote
+
 router = APIRouter(
     prefix="/gestion/actions",
     tags=["Actions"]
@@ -43,34 +51,46 @@ def delete_vacation(
 # En app/routers/actions.py
 
 @router.post("/submit_area_to_hr", name="action_submit_area_to_hr")
-async def submit_area_to_hr(
+@idempotent
+def submit_area_to_hr(
     request: Request,
     file: UploadFile = File(None),
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_manager_user),
     db: Session = Depends(get_db)
 ):
-    uploads_dir = "uploads"
     file_name = None 
 
     if file and file.filename:
         # (Aquí iría la validación de tipo sugerida arriba)
-        os.makedirs(uploads_dir, exist_ok=True)
-        file_name = f"CONSOLIDADO_{current.area}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-        file_disk_path = os.path.join(uploads_dir, file_name)
-        with open(file_disk_path, "wb") as f:
-            f.write(await file.read())
+        file_name = save_upload(file, f"CONSOLIDADO_{current.area}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
         
-    # Ejecutar la lógica de BD
-    crud.submit_area_to_hr(db, area=current.area, file_name=file_name, actor=current)
-    
-    
-    return RedirectResponse(url=request.url_for("dashboard"), status_code=303)
+    # Ejecutar la lógica de BD (todo o nada)
+    try:
+        submitted = crud.submit_area_to_hr(db, area=current.area, file_name=file_name, actor=current)
+    except Exception as e:
+        error_url = str(request.url_for('dashboard')) + f"?error=general&msg=No se pudo enviar el lote a RRHH: {str(e)}"
+        return RedirectResponse(url=error_url, status_code=302)
+
+    if not submitted:
+        return RedirectResponse(url=str(request.url_for("dashboard")) + "?success_msg=No había borradores pendientes de envío.", status_code=303)
+
+    resumen = ", ".join(
+        f"{s['full_name']} ({s['start_date'].strftime('%d/%m')}-{s['end_date'].strftime('%d/%m')})"
+        for s in submitted[:SUBMIT_SUMMARY_LIMIT]
+    )
+    if len(submitted) > SUBMIT_SUMMARY_LIMIT:
+        resumen += f" y {len(submitted) - SUBMIT_SUMMARY_LIMIT} más"
+    msg = f"Se enviaron {len(submitted)} solicitudes a RRHH: {resumen}."
+    return RedirectResponse(url=str(request.url_for("dashboard")) + f"?success_msg={msg}", status_code=303)
 
 @router.post("/vacation/{vacation_id}/submit_individual", name="action_submit_individual")
-async def submit_individual_vacation(
+@idempotent
+def submit_individual_vacation(
     request: Request,
     vacation_id: int,
     file: UploadFile = File(None), 
+    idempotency_key: Optional[str] = Form(None),
     current: models.User = Depends(get_current_manager_user),
     db: Session = Depends(get_db)
 ):
@@ -96,18 +116,12 @@ async def submit_individual_vacation(
 
     # Guardar archivo SOLO si existe
     if file and file.filename:
-        uploads_dir = "uploads"
-        os.makedirs(uploads_dir, exist_ok=True)
-        
         # Limpieza básica del nombre de archivo
         safe_filename = "".join(c for c in file.filename if c.isalnum() or c in (' ._-'))
         file_name = f"INDIVIDUAL_{current.area}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{safe_filename}"
-        file_disk_path = os.path.join(uploads_dir, file_name)
 
         try:
-            content = await file.read()
-            with open(file_disk_path, "wb") as f:
-                f.write(content)
+            save_upload(file, file_name)
         except Exception as e:
             print(f"Error guardando archivo: {e}")
             raise HTTPException(status_code=500, detail="Error al guardar el archivo")
@@ -115,17 +129,65 @@ async def submit_individual_vacation(
     # Actualizar estado en BD
     if vacation.status == 'draft':
         # Nota: Usamos 'submit_individual_to_hr' del CRUD que actualiza estado y adjunto
-        crud.submit_individual_to_hr(db, vacation=vacation, actor=current, file_name=file_name)
+        try:
+            crud.submit_individual_to_hr(db, vacation=vacation, actor=current, file_name=file_name)
+        except crud.VacationConflict as e:
+            return conflict_redirect(request, e)
         
         # Notificar a RRHH
         
         
     return RedirectResponse(url=str(request.url_for('dashboard')) + "?success_msg=Enviado a RRHH correctamente.", status_code=303)
 
+def vacation_approved_email(vacation: models.VacationPeriod) -> dict:
+    """Correo al empleado cuando RRHH aprueba (lo usan la acción individual y la masiva)."""
+    formatted_start = vacation.start_date.strftime('%d/%m/%Y')
+    formatted_end = vacation.end_date.strftime('%d/%m/%Y')
+    return dict(
+        subject="✅ Solicitud de Vacaciones APROBADA",
+        email_to=[vacation.user.email],
+        body=f"""
+        <div style="font-family: Arial, sans-serif; color: #333;">
+            <h2 style="color: #2ecc71;">¡Tu solicitud ha sido Aprobada!</h2>
+            <p>Hola <b>{vacation.user.full_name}</b>,</p>
+            <p>La Dirección de Recursos Humanos ha aprobado tus vacaciones.</p>
+            <hr>
+            <p><b>📅 Desde:</b> {formatted_start}</p>
+            <p><b>📅 Hasta:</b> {formatted_end}</p>
+            
+            <p><b>🗓️ Días:</b> {vacation.days}</p> 
+            
+            <hr>
+            <p>Disfruta de tu descanso.</p>
+            <p style="font-size: 12px; color: #777;">Sistema de Gestión de Vacaciones - UAndina</p>
+            <p style="font-size: 12px; color: #777;">NO CONTESTAR A ESTE CORREO ELECTRÓNICO - SOLO ES INFORMATIVO</p>
+        </div>
+        """
+    )
+
+def vacation_rejected_email(vacation: models.VacationPeriod) -> dict:
+    """Correo al empleado cuando RRHH rechaza."""
+    return dict(
+        subject="❌ Solicitud de Vacaciones RECHAZADA",
+        email_to=[vacation.user.email],
+        body=f"""
+        <div style="font-family: Arial, sans-serif; color: #333;">
+            <h2 style="color: #e74c3c;">Solicitud Rechazada</h2>
+            <p>Hola <b>{vacation.user.full_name}</b>,</p>
+            <p>Tu solicitud de vacaciones para las fechas {vacation.start_date} al {vacation.end_date} ha sido observada o rechazada por RRHH.</p>
+            <p>Por favor, comunícate con tu jefe directo o con la oficina de RRHH para más detalles.</p>
+            <p style="font-size: 12px; color: #777;">NO CONTESTAR A ESTE CORREO ELECTRÓNICO - SOLO ES INFORMATIVO</p>
+        </div>
+        """
+    )
+
 @router.post("/vacation/{vacation_id}/approve", name="action_approve_vacation")
-async def approve_vacation(
+@idempotent
+def approve_vacation(
     request: Request,
+    background_tasks: BackgroundTasks,
     vacation_id: int,
+    idempotency_key: Optional[str] = Form(None),
     current: models.User = Depends(get_current_hr_user),
     db: Session = Depends(get_db)
 ):
@@ -136,43 +198,26 @@ async def approve_vacation(
     if not vacation:
         raise HTTPException(status_code=404, detail="Solicitud no encontrada")
 
-    crud.update_vacation_status(db, vacation=vacation, new_status="approved", actor=current)
+    try:
+        crud.update_vacation_status(db, vacation=vacation, new_status="approved", actor=current)
+    except crud.VacationConflict as e:
+        return conflict_redirect(request, e)
     
     # --- NOTIFICACIÓN AL EMPLEADO ---
     if vacation.user.email:
-        formatted_start = vacation.start_date.strftime('%d/%m/%Y')
-        formatted_end = vacation.end_date.strftime('%d/%m/%Y')
-        
-        await send_email_async(
-            subject="✅ Solicitud de Vacaciones APROBADA",
-            email_to=[vacation.user.email],
-            body=f"""
-            <div style="font-family: Arial, sans-serif; color: #333;">
-                <h2 style="color: #2ecc71;">¡Tu solicitud ha sido Aprobada!</h2>
-                <p>Hola <b>{vacation.user.full_name}</b>,</p>
-                <p>La Dirección de Recursos Humanos ha aprobado tus vacaciones.</p>
-                <hr>
-                <p><b>📅 Desde:</b> {formatted_start}</p>
-                <p><b>📅 Hasta:</b> {formatted_end}</p>
-                
-                <p><b>🗓️ Días:</b> {vacation.days}</p> 
-                
-                <hr>
-                <p>Disfruta de tu descanso.</p>
-                <p style="font-size: 12px; color: #777;">Sistema de Gestión de Vacaciones - UAndina</p>
-                <p style="font-size: 12px; color: #777;">NO CONTESTAR A ESTE CORREO ELECTRÓNICO - SOLO ES INFORMATIVO</p>
-            </div>
-            """
-        )
+        background_tasks.add_task(send_email_async, **vacation_approved_email(vacation))
 
     return RedirectResponse(url=str(request.url_for("dashboard")) + "?success_msg=Solicitud Aprobada y notificada.", status_code=303)
 
 
 
 @router.post("/vacation/{vacation_id}/reject", name="action_reject_vacation")
-async def reject_vacation(
+@idempotent
+def reject_vacation(
     request: Request,
+    background_tasks: BackgroundTasks,
     vacation_id: int,
+    idempotency_key: Optional[str] = Form(None),
     current: models.User = Depends(get_current_hr_user),
     db: Session = Depends(get_db)
 ):
@@ -183,34 +228,68 @@ async def reject_vacation(
     if not vacation:
         raise HTTPException(status_code=404, detail="Solicitud no encontrada")
 
-    crud.update_vacation_status(db, vacation=vacation, new_status="rejected", actor=current)
+    try:
+        crud.update_vacation_status(db, vacation=vacation, new_status="rejected", actor=current)
+    except crud.VacationConflict as e:
+        return conflict_redirect(request, e)
 
     # --- NOTIFICACIÓN AL EMPLEADO ---
     if vacation.user.email:
-        await send_email_async(
-            subject="❌ Solicitud de Vacaciones RECHAZADA",
-            email_to=[vacation.user.email],
-            body=f"""
-            <div style="font-family: Arial, sans-serif; color: #333;">
-                <h2 style="color: #e74c3c;">Solicitud Rechazada</h2>
-                <p>Hola <b>{vacation.user.full_name}</b>,</p>
-                <p>Tu solicitud de vacaciones para las fechas {vacation.start_date} al {vacation.end_date} ha sido observada o rechazada por RRHH.</p>
-                <p>Por favor, comunícate con tu jefe directo o con la oficina de RRHH para más detalles.</p>
-                <p style="font-size: 12px; color: #777;">NO CONTESTAR A ESTE CORREO ELECTRÓNICO - SOLO ES INFORMATIVO</p>
-            </div>
-            """
-        )
+        background_tasks.add_task(send_email_async, **vacation_rejected_email(vacation))
 
     return RedirectResponse(url=str(request.url_for("dashboard")) + "?success_msg=Solicitud Rechazada.", status_code=303)
 
+@router.post("/vacations/bulk", name="action_bulk_vacations")
+@idempotent
+def bulk_vacations(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    decision: str = Form(...),
+    vacation_ids: List[int] = Form([]),
+    area: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Form(None),
+    current: models.User = Depends(get_current_hr_user),
+    db: Session = Depends(get_db)
+):
+    """
+    RRHH aprueba o rechaza varias solicitudes 'pending_hr' de una vez: las marcadas en la
+    bandeja, todas las pendientes de un área o, con ambas cosas, las marcadas de esa área.
+    Todo en una transacción; los correos se envían después de responder.
+    """
+    if decision not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="Acción no válida")
+    new_status, build_email = (
+        ("approved", vacation_approved_email) if decision == "approve" else ("rejected", vacation_rejected_email)
+    )
+
+    vacations = crud.bulk_update_vacation_status(
+        db, actor=current, new_status=new_status, vacation_ids=vacation_ids, area=area or None
+    )
+
+    # --- NOTIFICACIONES (en segundo plano, tras la respuesta) ---
+    for vacation in vacations:
+        if vacation.user.email:
+            background_tasks.add_task(send_email_async, **build_email(vacation))
+
+    verb = "aprobadas" if decision == "approve" else "rechazadas"
+    msg = f"{len(vacations)} solicitudes {verb}."
+    if vacation_ids:
+        skipped = len(set(vacation_ids)) - len(vacations)
+        if skipped > 0:
+            reason = "ya no estaban pendientes en RRHH o no son del área elegida" if area else "ya no estaban pendientes en RRHH"
+            msg += f" {skipped} {reason} y se omitieron."
+    return RedirectResponse(url=str(request.url_for("dashboard")) + f"?success_msg={msg}", status_code=303)
+
 @router.post("/vacation/{vacation_id}/modify", name="action_request_modification")
-async def request_modification(
+@idempotent
+def request_modification(
     request: Request,
     vacation_id: int,
     start_date: str = Form(...),
     period_type: int = Form(...),
     reason_text: str = Form(...),
     file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_manager_user),
     db: Session = Depends(get_db)
 ):
@@ -223,12 +302,7 @@ async def request_modification(
     if current.role != 'admin' and vacation.user.manager_id != current.id:
         raise HTTPException(status_code=403, detail="No autorizado: No es tu subordinado")
 
-    uploads_dir = "uploads"
-    file_name = f"MODIFICACION_{current.area}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-    file_disk_path = os.path.join(uploads_dir, file_name)
-    
-    with open(file_disk_path, "wb") as f:
-        f.write(await file.read())
+    file_name = save_upload(file, f"MODIFICACION_{current.area}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
         
     try:
         crud.create_modification_request(
@@ -249,14 +323,20 @@ async def request_modification(
 
 
 @router.post("/modification/{mod_id}/approve", name="action_approve_modification")
-async def approve_modification(
+@idempotent
+def approve_modification(
     request: Request,
+    background_tasks: BackgroundTasks,
     mod_id: int,
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_hr_user),
     db: Session = Depends(get_db)
 ):
     # crud.approve_modification devuelve el objeto mod_req actualizado
-    mod_req = crud.approve_modification(db, mod_id=mod_id, actor=current)
+    try:
+        mod_req = crud.approve_modification(db, mod_id=mod_id, actor=current)
+    except crud.VacationConflict as e:
+        return conflict_redirect(request, e)
     
     if mod_req:
         # Datos para el correo
@@ -271,7 +351,8 @@ async def approve_modification(
         if manager.email and manager.email != employee.email: recipients.append(manager.email)
         
         if recipients:
-            await send_email_async(
+            background_tasks.add_task(
+                send_email_async,
                 subject="✅ Modificación de Vacaciones APROBADA",
                 email_to=recipients,
                 body=f"""
@@ -294,13 +375,19 @@ async def approve_modification(
 
 
 @router.post("/modification/{mod_id}/reject", name="action_reject_modification")
-async def reject_modification(
+@idempotent
+def reject_modification(
     request: Request,
+    background_tasks: BackgroundTasks,
     mod_id: int,
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_hr_user),
     db: Session = Depends(get_db)
 ):
-    mod_req = crud.reject_modification(db, mod_id=mod_id, actor=current)
+    try:
+        mod_req = crud.reject_modification(db, mod_id=mod_id, actor=current)
+    except crud.VacationConflict as e:
+        return conflict_redirect(request, e)
     
     if mod_req:
         employee = mod_req.vacation_period.user
@@ -311,7 +398,8 @@ async def reject_modification(
         if manager.email and manager.email != employee.email: recipients.append(manager.email)
         
         if recipients:
-            await send_email_async(
+            background_tasks.add_task(
+                send_email_async,
                 subject="❌ Modificación de Vacaciones RECHAZADA",
                 email_to=recipients,
                 body=f"""
@@ -355,13 +443,15 @@ def add_comment(
 # --- NUEVAS RUTAS (PARTE 10) ---
 
 @router.post("/vacation/{vacation_id}/suspend", name="action_request_suspension")
-async def request_suspension(
+@idempotent
+def request_suspension(
     request: Request,
     vacation_id: int,
     suspension_type: str = Form(...),
     reason_text: str = Form(...),
     file: UploadFile = File(...),
     new_end_date: Optional[str] = Form(None), # Campo opcional
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_manager_user),
     db: Session = Depends(get_db)
 ):
@@ -374,12 +464,7 @@ async def request_suspension(
     if current.role != 'admin' and vacation.user.manager_id != current.id:
         raise HTTPException(status_code=403, detail="No autorizado")
 
-    uploads_dir = "uploads"
-    file_name = f"SUSPENSION_{current.area}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-    file_disk_path = os.path.join(uploads_dir, file_name)
-    
-    with open(file_disk_path, "wb") as f:
-        f.write(await file.read())
+    file_name = save_upload(file, f"SUSPENSION_{current.area}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
         
     try:
         crud.create_suspension_request(
@@ -400,14 +485,20 @@ async def request_suspension(
 
 
 @router.post("/suspension/{sus_id}/approve", name="action_approve_suspension")
-async def approve_suspension(
+@idempotent
+def approve_suspension(
     request: Request,
+    background_tasks: BackgroundTasks,
     sus_id: int,
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_hr_user),
     db: Session = Depends(get_db)
 ):
     """Aprueba la solicitud de suspensión."""
-    sus_req = crud.approve_suspension(db, sus_id=sus_id, actor=current)
+    try:
+        sus_req = crud.approve_suspension(db, sus_id=sus_id, actor=current)
+    except crud.VacationConflict as e:
+        return conflict_redirect(request, e)
     
     if sus_req:
         employee = sus_req.vacation_period.user
@@ -425,7 +516,8 @@ async def approve_suspension(
             detalle_extra = "<p>El periodo ha quedado suspendido y los días retornaron al saldo.</p>"
 
         if recipients:
-            await send_email_async(
+            background_tasks.add_task(
+                send_email_async,
                 subject=f"✅ Suspensión de Vacaciones APROBADA ({tipo})",
                 email_to=recipients,
                 body=f"""
@@ -443,14 +535,20 @@ async def approve_suspension(
 
 
 @router.post("/suspension/{sus_id}/reject", name="action_reject_suspension")
-async def reject_suspension(
+@idempotent
+def reject_suspension(
     request: Request,
+    background_tasks: BackgroundTasks,
     sus_id: int,
+    idempotency_key: Optional[str] = Form(None),
     current=Depends(get_current_hr_user),
     db: Session = Depends(get_db)
 ):
     """Rechaza la solicitud de suspensión."""
-    sus_req = crud.reject_suspension(db, sus_id=sus_id, actor=current)
+    try:
+        sus_req = crud.reject_suspension(db, sus_id=sus_id, actor=current)
+    except crud.VacationConflict as e:
+        return conflict_redirect(request, e)
     
     if sus_req:
         employee = sus_req.vacation_period.user
@@ -461,7 +559,8 @@ async def reject_suspension(
         if manager.email and manager.email != employee.email: recipients.append(manager.email)
         
         if recipients:
-            await send_email_async(
+            background_tasks.add_task(
+                send_email_async,
                 subject="❌ Suspensión de Vacaciones RECHAZADA",
                 email_to=recipients,
                 body=f"""
@@ -477,8 +576,9 @@ async def reject_suspension(
     return RedirectResponse(url=request.url_for("dashboard"), status_code=303)
 
 @router.post("/vacation/request", name="action_request_vacation")
-async def request_vacation_create(
+def request_vacation_create(
     request: Request,
+    background_tasks: BackgroundTasks,
     start_date: str = Form(...),
     end_date: str = Form(...),
     current: models.User = Depends(get_current_user),
@@ -508,7 +608,8 @@ async def request_vacation_create(
     if current.manager and current.manager.email:
         approval_link = f"http://dataepis.uandina.pe:49262/gestion/" # Ajusta esta URL a tu IP real
         
-        await send_email_async(
+        background_tasks.add_task(
+            send_email_async,
             subject=f"📩 Nueva Solicitud: {current.full_name}",
             email_to=[current.manager.email],
             body=f"""
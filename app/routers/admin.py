@@ -1,17 +1,22 @@
 # app/routers/admin.py
 
-from fastapi import APIRouter, Depends, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+import uuid
+from fastapi import APIRouter, Depends, Request, Form, HTTPException, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import date, datetime
 from typing import Dict, Any, Optional, List
 
 from app import crud, models, schemas
 from app.auth import get_current_admin_user
-from app.db import SessionLocal
+from app.db import get_db, get_pool_stats
+from app import profiler
+from app.cache import build_cache, CACHE_URL, CACHE_KEY_PREFIX
+from app.logic import user_import
+from app.templating import templates, stream_template
 # Importamos el COP oficial para el listado jerárquico
-from app.routers.reports import COP_ORDENADO 
+from app.constants import COP_ORDENADO, SEDES
 
 # Configuración del router
 router = APIRouter(
@@ -20,14 +25,6 @@ router = APIRouter(
     dependencies=[Depends(get_current_admin_user)]
 )
 
-templates = Jinja2Templates(directory="app/templates")
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 @router.get("/", response_class=HTMLResponse, name="admin_dashboard")
 def admin_dashboard(request: Request):
@@ -62,15 +59,9 @@ def admin_create_holiday(
     except ValueError:
         return RedirectResponse(url=request.url_for("admin_feriados"), status_code=303)
 
-    new_holiday = models.Holiday(
-        holiday_date=holiday_date, 
-        name=name, 
-        location=location,
-        is_national=(location == "GENERAL")
-    )
-    db.add(new_holiday)
-    db.commit()
-    
+    # Vía crud para que se invalide la caché de feriados
+    crud.create_holiday(db, holiday_date=holiday_date, name=name, is_national=(location == "GENERAL"), location=location)
+
     return RedirectResponse(url=request.url_for("admin_feriados"), status_code=303)
 
 @router.post("/feriados/{holiday_id}/delete", name="admin_delete_holiday")
@@ -96,12 +87,13 @@ def admin_ajustes_page(request: Request, db: Session = Depends(get_db)):
 @router.post("/ajustes", name="admin_update_settings")
 async def admin_update_settings(request: Request, db: Session = Depends(get_db)):
     form_data = await request.form()
+    # Las escrituras síncronas van al threadpool: en una ruta async bloquearían el event loop
     for key, value in form_data.items():
-        crud.update_or_create_setting(db, key=key, value=value)
+        await run_in_threadpool(crud.update_or_create_setting, db, key=key, value=value)
     return RedirectResponse(url=request.url_for("admin_ajustes"), status_code=303)
 
 @router.post("/ajustes/policy", name="admin_create_policy")
-async def admin_create_policy(
+def admin_create_policy(
     request: Request, 
     name: str = Form(...), 
     months: list[int] = Form(...), 
@@ -127,45 +119,40 @@ def admin_user_new_form(request: Request, db: Session = Depends(get_db)):
         "action_url": request.url_for("admin_user_create"), "error_msg": None
     })
     
-@router.get("/users", response_class=HTMLResponse, name="admin_user_list")
-def admin_user_list(request: Request, db: Session = Depends(get_db), success_msg: Optional[str] = None):
-    all_users = db.query(models.User).all()
-    
-    users_by_area = {}
-    for u in all_users:
-        a = (u.area or "SIN ÁREA").strip().upper()
-        if a not in users_by_area: users_by_area[a] = []
-        users_by_area[a].append(u)
+def iter_user_sections(db: Session):
+    """
+    Listado jerárquico por COP, una sección a la vez: primero solo (id, área) de todos,
+    y los usuarios de cada sección se cargan cuando el template llega a ella.
+    """
+    ids_by_area = {}
+    for user_id, area in db.query(models.User.id, models.User.area):
+        ids_by_area.setdefault((area or "SIN ÁREA").strip().upper(), []).append(user_id)
+
+    def load(ids):
+        users = db.query(models.User).filter(models.User.id.in_(ids)).all()
+        return sorted(users, key=lambda x: (x.full_name or "").lower())
 
-    hierarchical_list = []
     procesados = set()
 
     # 1. Áreas que coinciden con el COP
     for nivel, nombre_cop in COP_ORDENADO:
         n_up = nombre_cop.upper()
-        miembros = users_by_area.get(n_up, [])
-        if miembros:
+        ids = ids_by_area.get(n_up, [])
+        if ids:
             procesados.add(n_up)
-            hierarchical_list.append({
-                "nivel": nivel, "nombre": nombre_cop, 
-                "miembros": sorted(miembros, key=lambda x: (x.full_name or "").lower())
-            })
+            yield {"nivel": nivel, "nombre": nombre_cop, "miembros": load(ids)}
 
     # 2. Áreas por corregir (sobrantes) - CORREGIDO PARA QUE TODOS APAREZCAN
-    sobrantes = []
-    for a_db, pers in users_by_area.items():
-        if a_db not in procesados:
-            for p in pers: p.area_erronea = a_db
-            sobrantes.extend(pers)
-    
-    if sobrantes:
-        hierarchical_list.append({
-            "nivel": 99, "nombre": "OTRAS ÁREAS / POR REVISAR", 
-            "miembros": sorted(sobrantes, key=lambda x: (x.full_name or "").lower())
-        })
-
-    return templates.TemplateResponse("admin_user_list.html", {
-        "request": request, "hierarchy": hierarchical_list, "success_msg": success_msg
+    area_by_id = {uid: a_db for a_db, ids in ids_by_area.items() if a_db not in procesados for uid in ids}
+    if area_by_id:
+        sobrantes = load(list(area_by_id))
+        for p in sobrantes: p.area_erronea = area_by_id[p.id]
+        yield {"nivel": 99, "nombre": "OTRAS ÁREAS / POR REVISAR", "miembros": sobrantes}
+
+@router.get("/users", response_class=HTMLResponse, name="admin_user_list")
+def admin_user_list(request: Request, db: Session = Depends(get_db), success_msg: Optional[str] = None):
+    return stream_template(request, "admin_user_list.html", {
+        "hierarchy": iter_user_sections(db), "success_msg": success_msg
     })
 
 @router.post("/users/new", name="admin_user_create")
@@ -182,9 +169,9 @@ async def admin_user_create(request: Request, db: Session = Depends(get_db)):
     manager_id = int(form.get("manager_id")) if form.get("manager_id") else None
     vacation_policy_id = int(form.get("vacation_policy_id")) if form.get("vacation_policy_id") else None
 
-    if crud.get_user_by_username(db, username):
-        managers = crud.get_all_managers(db)
-        policies = crud.get_all_policies(db)
+    if await run_in_threadpool(crud.get_user_by_username, db, username):
+        managers = await run_in_threadpool(crud.get_all_managers, db)
+        policies = await run_in_threadpool(crud.get_all_policies, db)
         tmpl = templates.get_template("admin_user_form.html")
         return tmpl.render({
             "request": request, "user": None, "managers": managers, "policies": policies,
@@ -193,19 +180,18 @@ async def admin_user_create(request: Request, db: Session = Depends(get_db)):
         }, status_code=400)
     
     try:
-        user = crud.create_user(
-            username=username, full_name=full_name, email=email,
+        await run_in_threadpool(
+            crud.create_user,
+            db, username=username, full_name=full_name, email=email,
             role=role, area=area, vacation_days_total=vacation_days_total, manager_id=manager_id,
             location=location,
-            can_request_own_vacation=can_request_own_vacation
+            can_request_own_vacation=can_request_own_vacation,
+            vacation_policy_id=vacation_policy_id
         )
-        if vacation_policy_id:
-            user.vacation_policy_id = vacation_policy_id
-            db.commit()
 
     except ValueError as e:
-        managers = crud.get_all_managers(db)
-        policies = crud.get_all_policies(db)
+        managers = await run_in_threadpool(crud.get_all_managers, db)
+        policies = await run_in_threadpool(crud.get_all_policies, db)
         tmpl = templates.get_template("admin_user_form.html")
         return tmpl.render({
             "request": request, "user": None, "managers": managers, "policies": policies,
@@ -229,7 +215,7 @@ def admin_user_edit_form(request: Request, user_id: int, db: Session = Depends(g
 
 @router.post("/users/{user_id}/edit", name="admin_user_update")
 async def admin_user_update(request: Request, user_id: int, db: Session = Depends(get_db)):
-    user = crud.get_user_by_id(db, user_id)
+    user = await run_in_threadpool(crud.get_user_by_id, db, user_id)
     if not user: raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     form = await request.form()
@@ -245,9 +231,9 @@ async def admin_user_update(request: Request, user_id: int, db: Session = Depend
     manager_id = int(form.get("manager_id")) if form.get("manager_id") else None
     vacation_policy_id = int(form.get("vacation_policy_id")) if form.get("vacation_policy_id") else None
 
-    if user.username != username and crud.get_user_by_username(db, username):
-        managers = crud.get_all_managers(db)
-        policies = crud.get_all_policies(db)
+    if user.username != username and await run_in_threadpool(crud.get_user_by_username, db, username):
+        managers = await run_in_threadpool(crud.get_all_managers, db)
+        policies = await run_in_threadpool(crud.get_all_policies, db)
         tmpl = templates.get_template("admin_user_form.html")
         return tmpl.render({
             "request": request, "user": user, "managers": managers, "policies": policies,
@@ -255,7 +241,8 @@ async def admin_user_update(request: Request, user_id: int, db: Session = Depend
             "error_msg": f"El usuario '{username}' ya existe."
         }, status_code=400)
 
-    crud.admin_update_user(
+    await run_in_threadpool(
+        crud.admin_update_user,
         db=db, user=user, username=username, full_name=full_name, email=email,
         role=role, area=area, vacation_days_total=vacation_days_total,
         manager_id=manager_id, vacation_policy_id=vacation_policy_id,
@@ -272,6 +259,89 @@ def admin_user_reset_password(request: Request, user_id: int, db: Session = Depe
     crud.admin_reset_password(db, user)
     return RedirectResponse(url=str(request.url_for('admin_user_list')) + "?success_msg=Password reseteado.", status_code=303)
 
+# --- CARGA MASIVA DE USUARIOS (planilla XLSX/CSV) ---
+IMPORT_PLAN_TTL = 1800  # segundos que la vista previa queda disponible para aplicarse
+
+# Planillas en vista previa y reclamos de "Aplicar": almacén propio que nunca desaloja por tamaño
+# (como idempotency.store), así el tráfico de la caché general no vence una vista previa antes de
+# su TTL. Con varios workers, CACHE_URL debe ser Redis para que "Aplicar" la encuentre en cualquiera.
+import_store = build_cache(CACHE_URL, max_entries=None, prefix=f"{CACHE_KEY_PREFIX}-import")
+
+def _import_plan_key(token: str) -> str:
+    return f"user_import:{token}"
+
+def _same_updates(a: List[dict], b: List[dict]) -> bool:
+    return {u["id"]: u for u in a} == {u["id"]: u for u in b}
+
+def _render_import_preview(request: Request, db: Session, content: bytes, filename: str, error_msg: str = None, status_code: int = 200):
+    """
+    Valida la planilla y muestra los cambios. Si no hay errores, guarda el archivo (no el plan) con
+    un token: al confirmar se vuelve a validar contra la BD de ese momento.
+    """
+    tmpl = templates.get_template("admin_user_import.html")
+    try:
+        df = user_import.read_sheet(content, filename)
+    except user_import.SheetError as e:
+        return HTMLResponse(tmpl.render({"request": request, "plan": None, "sedes": SEDES, "error_msg": str(e)}), status_code=400)
+
+    plan = user_import.build_import_plan(db, df)
+    token = None
+    if not plan["errors"] and plan["updates"]:
+        token = uuid.uuid4().hex
+        import_store.set(_import_plan_key(token), {"content": content, "filename": filename, "updates": plan["updates"]}, ttl=IMPORT_PLAN_TTL)
+    return HTMLResponse(tmpl.render({
+        "request": request, "plan": plan, "token": token, "filename": filename, "sedes": SEDES, "error_msg": error_msg
+    }), status_code=status_code)
+
+@router.get("/users/import", response_class=HTMLResponse, name="admin_user_import")
+def admin_user_import(request: Request):
+    tmpl = templates.get_template("admin_user_import.html")
+    return tmpl.render({"request": request, "plan": None, "sedes": SEDES})
+
+@router.post("/users/import", response_class=HTMLResponse, name="admin_user_import_preview")
+def admin_user_import_preview(request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Valida la planilla y muestra los cambios; no escribe nada hasta confirmar."""
+    return _render_import_preview(request, db, file.file.read(), file.filename)
+
+@router.post("/users/import/apply", name="admin_user_import_apply")
+def admin_user_import_apply(request: Request, token: str = Form(...), db: Session = Depends(get_db)):
+    """
+    Aplica la vista previa confirmada en una sola transacción (todo o nada).
+    Con la tabla de usuarios bloqueada se vuelve a calcular el plan: si la BD cambió desde la
+    vista previa (otro jefe, un usuario desactivado, un rol nuevo) y el plan ya no es el mismo,
+    no se aplica nada y se muestra la vista previa actualizada.
+    """
+    key = _import_plan_key(token[:64])
+    # Reclamo atómico del token: un doble clic o dos pestañas no aplican dos veces
+    claimed = import_store.add(f"{key}:apply", True, ttl=IMPORT_PLAN_TTL)
+    entry = import_store.get(key) if claimed else None
+    if entry is None:
+        tmpl = templates.get_template("admin_user_import.html")
+        return HTMLResponse(tmpl.render({
+            "request": request, "plan": None, "sedes": SEDES,
+            "error_msg": "La vista previa venció o ya se aplicó. Vuelva a subir la planilla."
+        }), status_code=400)
+    import_store.delete(key)
+
+    try:
+        crud.lock_users_for_write(db)
+        plan = user_import.build_import_plan(db, user_import.read_sheet(entry["content"], entry["filename"]))
+        unchanged = not plan["errors"] and _same_updates(plan["updates"], entry["updates"])
+        if unchanged:
+            crud.bulk_apply_user_changes(db, updates=plan["updates"])  # confirma y suelta el bloqueo
+    finally:
+        db.rollback()  # sin efecto tras el commit; si no se aplicó, suelta el bloqueo
+
+    if not unchanged:
+        return _render_import_preview(
+            request, db, entry["content"], entry["filename"], status_code=409,
+            error_msg="Los datos cambiaron desde la vista previa: no se aplicó nada. Revise la vista previa actualizada."
+        )
+    return RedirectResponse(
+        url=str(request.url_for('admin_user_list')) + f"?success_msg=Carga masiva aplicada: {len(plan['updates'])} usuarios actualizados.",
+        status_code=303
+    )
+
 @router.get("/reports", name="admin_reports_view")
 def admin_reports_view(request: Request):
     """
@@ -299,4 +369,34 @@ def admin_org_chart(request: Request, db: Session = Depends(get_db)):
         org_data.append([{"v": str(u.id), "f": node_html}, str(u.manager_id) if u.manager_id else "", u.username])
 
     tmpl = templates.get_template("admin_org_chart.html")
-    return tmpl.render({"request": request, "org_data": org_data})
\ No newline at end of file
+    return tmpl.render({"request": request, "org_data": org_data})
+
+@router.get("/db-pool", name="admin_db_pool")
+def admin_db_pool():
+    """Estado del pool de conexiones de este worker: ocupación, esperas y quién retiene conexiones."""
+    return JSONResponse(get_pool_stats())
+
+# --- PERFILES DE PETICIONES (ver app/profiler.py) ---
+
+@router.get("/profiles", response_class=HTMLResponse, name="admin_profiles")
+def admin_profiles(request: Request):
+    """Últimos perfiles tomados con ?__profile=1 en este worker."""
+    tmpl = templates.get_template("admin_profiles.html")
+    return tmpl.render({"request": request, "profiles": profiler.list_profiles(),
+                        "max_profiles": profiler.PROFILER_MAX_PROFILES})
+
+@router.get("/profiles/{profile_id}", response_class=HTMLResponse, name="admin_profile_detail")
+def admin_profile_detail(request: Request, profile_id: int):
+    profile = profiler.get_profile(profile_id)
+    if not profile: raise HTTPException(status_code=404, detail="Perfil no encontrado (el buffer es por worker y circular)")
+    tmpl = templates.get_template("admin_profile_detail.html")
+    return tmpl.render({"request": request, "profile": profile})
+
+@router.get("/profiles/{profile_id}/folded", name="admin_profile_folded")
+def admin_profile_folded(profile_id: int):
+    """Pilas en formato 'folded' para flamegraph.pl o speedscope."""
+    profile = profiler.get_profile(profile_id)
+    if not profile: raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return PlainTextResponse(profile.folded(), headers={
+        "Content-Disposition": f"attachment; filename=perfil_{profile_id}.folded.txt"
+    })
@@ -0,0 +1,164 @@
+# app/routers/documents.py
+
+import os
+import io
+import csv
+import zipfile
+from datetime import datetime
+from typing import Optional
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.auth import get_current_user, get_current_hr_user
+from app.db import get_db
+from app.utils.files import resolve_upload_path, get_file_etag, etag_matches, ZipStreamBuffer
+
+router = APIRouter(
+    prefix="/documents",
+    tags=["Documents"]
+)
+
+# Los nombres llevan timestamp, así que el contenido de una URL no cambia:
+# el navegador puede reutilizarlo y revalidar con el ETag.
+DOCUMENT_CACHE_CONTROL = "private, max-age=86400"
+
+@router.get("/vacation/{vacation_id}/{file_name:path}", name="vacation_document")
+def download_vacation_document(
+    request: Request,
+    vacation_id: int,
+    file_name: str,
+    current=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Sirve un documento de sustento con los mismos permisos que 'vacation_details'.
+    Soporta Range (FileResponse), ETag fuerte por hash de contenido y 304.
+    """
+    vacation = crud.get_vacation_by_id(db, vacation_id)
+    if not vacation:
+        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+
+    if not crud.check_view_permission(vacation, current):
+        raise HTTPException(status_code=403, detail="No autorizado")
+
+    # El documento debe pertenecer a esta vacación (evita pedir archivos ajenos con un ID propio)
+    if file_name not in crud.get_vacation_document_names(db, vacation):
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+
+    full_path = resolve_upload_path(file_name)
+    if not full_path:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+
+    stat_result = os.stat(full_path)
+    etag = get_file_etag(full_path, stat_result)
+    headers = {"ETag": etag, "Cache-Control": DOCUMENT_CACHE_CONTROL}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse usa 'http.response.pathsend' (sendfile) si el servidor lo soporta
+    return FileResponse(
+        full_path,
+        headers=headers,
+        filename=file_name,
+        stat_result=stat_result,
+        content_disposition_type="inline"
+    )
+
+# --- DESCARGA MASIVA (ZIP EN STREAMING) ---
+
+BUNDLE_CHUNK_SIZE = 1024 * 1024
+
+BUNDLE_INDEX_COLUMNS = [
+    "ID Vacación", "DNI", "Empleado", "Área", "Inicio", "Fin", "Días", "Estado",
+    "Tipo Documento", "Estado Solicitud", "Archivo", "Incluido"
+]
+
+def build_bundle_entries(vacations, request_docs):
+    """
+    Arma las filas del índice y la lista de archivos únicos a empaquetar.
+    Un mismo consolidado suele compartirse entre muchas vacaciones: se incluye una sola vez.
+    """
+    rows = []
+    files = {}
+    for v in vacations:
+        docs = [
+            ("adjunto", v.attached_file, ""),
+            ("consolidado", v.consolidated_doc_path, ""),
+            ("individual", v.manager_individual_doc_path, ""),
+        ] + request_docs.get(v.id, [])
+
+        for doc_type, file_name, req_status in docs:
+            if not file_name:
+                continue
+            arcname = f"{doc_type}/{file_name}"
+            full_path = resolve_upload_path(file_name)
+            if full_path:
+                files.setdefault(arcname, full_path)
+            rows.append([
+                v.id, v.user.username, v.user.full_name, v.user.area,
+                v.start_date, v.end_date, v.days, v.status,
+                doc_type, req_status, arcname, "Sí" if full_path else "No (archivo no encontrado)"
+            ])
+    return rows, files
+
+def stream_bundle(rows, files):
+    """
+    Genera el ZIP por partes: nunca se arma completo en memoria ni en disco.
+    Los documentos (PDF/imagenes) ya vienen comprimidos, así que se guardan sin deflate.
+    """
+    buffer = ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w") as zf:
+        index = io.StringIO()
+        writer = csv.writer(index)
+        writer.writerow(BUNDLE_INDEX_COLUMNS)
+        writer.writerows(rows)
+        zf.writestr("indice.csv", index.getvalue().encode("utf-8-sig"), compress_type=zipfile.ZIP_DEFLATED)
+        yield buffer.pop()
+
+        for arcname, full_path in files.items():
+            zinfo = zipfile.ZipInfo.from_file(full_path, arcname)
+            zinfo.compress_type = zipfile.ZIP_STORED
+            with open(full_path, "rb") as src, zf.open(zinfo, mode="w") as dest:
+                for chunk in iter(lambda: src.read(BUNDLE_CHUNK_SIZE), b""):
+                    dest.write(chunk)
+                    yield buffer.pop()
+            yield buffer.pop()
+    yield buffer.pop()
+
+@router.get("/bundle", name="documents_bundle")
+def download_documents_bundle(
+    area: Optional[str] = None,
+    manager_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current=Depends(get_current_hr_user),
+    db: Session = Depends(get_db)
+):
+    """
+    RRHH descarga en un solo ZIP todos los sustentos de un área, un jefe o un rango de fechas,
+    con un 'indice.csv' que relaciona cada archivo con su solicitud.
+    """
+    if not (area or manager_id or date_from or date_to):
+        raise HTTPException(status_code=400, detail="Indique al menos un filtro: área, jefe o rango de fechas.")
+
+    try:
+        dt_from = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else None
+        dt_to = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Fechas inválidas.")
+
+    vacations = crud.get_vacations_for_bundle(db, area=area, manager_id=manager_id, date_from=dt_from, date_to=dt_to)
+    request_docs = crud.get_request_docs_for_vacations(db, [v.id for v in vacations])
+    rows, files = build_bundle_entries(vacations, request_docs)
+
+    label = (area or (f"JEFE_{manager_id}" if manager_id else "PERIODO")).replace(" ", "_")
+    filename = f"SUSTENTOS_{label}_{datetime.now().strftime('%Y%m%d%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_bundle(rows, files),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"}
+    )
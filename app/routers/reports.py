@@ -2,18 +2,19 @@
 
 from fastapi import APIRouter, Depends, Request, BackgroundTasks, Form, Query
 from fastapi.responses import StreamingResponse, HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 from datetime import datetime, date
 from typing import Optional, List
-import pandas as pd
 import io
 
 from app import crud, models
 from app.db import get_db
+from app.templating import templates, stream_template
 from app.auth import get_current_admin_user
 from app.utils.email import send_email_async
+from app.constants import COP_ORDENADO
+from app.query_stats import query_budget
 
 # CORRECCIÓN: El prefix debe ser solo /reports. 
 # Con root_path="/gestion", la ruta final es /gestion/reports/
@@ -23,7 +24,6 @@ router = APIRouter(
     dependencies=[Depends(get_current_admin_user)]
 )
 
-templates = Jinja2Templates(directory="app/templates")
 
 # --- FUNCIONES AUXILIARES ---
 
@@ -45,6 +45,7 @@ def get_base_query(db: Session):
 # --- VISTA PRINCIPAL (TABLERO DE CONTROL) ---
 
 @router.get("/", response_class=HTMLResponse, name="admin_reports_panel")
+@query_budget(10)
 def reports_panel(
     request: Request, 
     search: Optional[str] = None,
@@ -89,8 +90,9 @@ def reports_panel(
 
     # 4. Procesamiento de saldos y verificaciones
     users_view = []
+    balances = crud.get_balances_for_users(db, users_orm)
     for u in users_orm:
-        balance = crud.get_user_vacation_balance(db, u)
+        balance = balances[u.id]
         
         # Estas variables activan los botones de alerta en el template admin_reports.html
         is_stuck = (u.id in users_with_drafts)         # El jefe no ha enviado a RRHH
@@ -123,7 +125,7 @@ def reports_panel(
     elif sort_by == "name":
         users_view.sort(key=lambda x: x["user_obj"].full_name or "")
 
-    return templates.TemplateResponse("admin_reports.html", {
+    return templates.TemplateResponse(request, "admin_reports.html", {
         "request": request,
         "users": users_view,
         "areas": areas_list,
@@ -136,7 +138,7 @@ def reports_panel(
 # --- ACCIONES ---
 
 @router.post("/remind/manager/{manager_id}/for/{employee_id}", name="remind_manager_context")
-async def remind_manager_context(
+def remind_manager_context(
     request: Request, manager_id: int, employee_id: int,
     background_tasks: BackgroundTasks, db: Session = Depends(get_db)
 ):
@@ -153,7 +155,7 @@ async def remind_manager_context(
     return RedirectResponse(url=request.headers.get("referer", "../"), status_code=303)
 
 @router.post("/remind/employee/{user_id}", name="remind_employee_balance")
-async def remind_employee_balance(
+def remind_employee_balance(
     request: Request, user_id: int, 
     background_tasks: BackgroundTasks, db: Session = Depends(get_db)
 ):
@@ -196,6 +198,8 @@ def download_balances(db: Session = Depends(get_db)):
     return generate_excel_response(data, "Reporte_Saldos")
 
 def generate_excel_response(data: list, file_prefix: str):
+    # pandas/openpyxl se cargan en la primera descarga, no al importar el router (cada worker)
+    import pandas as pd
     df = pd.DataFrame(data) if data else pd.DataFrame([{"Mensaje": "Sin datos"}])
     stream = io.BytesIO()
     with pd.ExcelWriter(stream, engine='openpyxl') as writer:
@@ -204,85 +208,34 @@ def generate_excel_response(data: list, file_prefix: str):
     filename = f"{file_prefix}_{datetime.now().strftime('%Y%m%d')}.xlsx"
     return StreamingResponse(stream, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": f"attachment; filename={filename}"})
 
-# --- REPORTE MAESTRO (Respetando el COP Oficial) ---
+# --- REPORTE MAESTRO (Respetando el COP Oficial: app/constants.py) ---
 
-COP_ORDENADO = [
-    (1, "OFICINA DE AUDITORÍA"), (1, "DEFENSORÍA UNIVERSITARIA"), (1, "OFICINA DE AUDITORÍA ACADÉMICA"),
-    (1, "RECTORADO"), (2, "OFICINA DE SECRETARÍA GENERAL"), (2, "DIRECCIÓN DE PLANIFICACIÓN Y DESARROLLO UNIVERSITARIO"),(3, "UNIDAD DE TRANSFORMACION DIGITAL"),
-    (3, "UNIDAD DE PLANEAMIENTO Y PRESUPUESTO"), (3, "UNIDAD DE ORGANIZACION Y METODOS DE TRABAJO"), (3, "UNIDAD DE ESTADISTICA"),
-    (2, "OFICINA DE ASESORÍA JURÍDICA"), (2, "DIRECCIÓN DE TECNOLOGÍAS DE INFORMACIÓN"), (3, "UNIDAD DE DESARROLLO DE PROYECTOS INFORMÁTICOS"),
-    (3, "UNIDAD DE DISEÑO Y PROGRAMACIÓN"), (3, "UNIDAD DE PRODUCCIÓN Y SOPORTE INFORMÁTICO"), (2, "OFICINA DE MARKETING, PROMOCIÓN E IMAGEN INSTITUCIONAL"),
-    (3, "UNIDAD DE MARKETING DIGITAL"), (3, "UNIDAD DE IMAGEN INSTITUCIONAL"), (1, "VICERRECTORADO ADMINISTRATIVO"),
-    (2, "CENTROS DE PRODUCCIÓN DE BIENES Y SERVICIOS"), (3, "CENTRO DE IDIOMAS"), (3, "CENTRO DE FORMACIÓN EN TECNOLOGÍAS DE INFORMACIÓN"),
-    (2, "DIRECCIÓN DE ADMINISTRACIÓN"), (3, "UNIDAD DE CONTABILIDAD"), (3, "UNIDAD DE TESORERÍA"), (3, "UNIDAD DE PATRIMONIO"),
-    (3, "UNIDAD DE ABASTECIMIENTOS"), (3, "UNIDAD DE SERVICIOS GENERALES"), (2, "DIRECCIÓN DE RECURSOS HUMANOS"),
-    (3, "UNIDAD DE CONTROL, DESARROLLO HUMANO Y ESCALAFÓN"), (3, "UNIDAD DE REMUNERACIONES"), (3, "UNIDAD DE SEGURIDAD Y SALUD EN EL TRABAJO"),
-    (2, "DIRECCIÓN DE BIENESTAR UNIVERSITARIO"), (3, "UNIDAD DE SALUD"), (3, "UNIDAD DE SERVICIO SOCIAL"),
-    (2, "OFICINA DE INFRAESTRUCTURA Y OBRAS"), (3, "UNIDAD DE PROYECTOS Y OBRAS"), (3, "UNIDAD DE MANTENIMIENTO"),
-    (2, "DIRECCIÓN DE PROMOCIÓN DEL DEPORTE"), (3, "UNIDAD DE DEPORTE EN GENERAL Y RECREACIÓN"), (3, "UNIDAD DE DEPORTE DE ALTA COMPETENCIA"),
-    (1, "VICERRECTORADO DE INVESTIGACIÓN"), (2, "OFICINA DE ASESORÍA EN GESTIÓN DE LA INVESTIGACIÓN"),
-    (2, "COORDINACIÓN DE TRANSFERENCIA TECNOLÓGICA Y PATENTES"), (2, "INSTITUTO CIENTÍFICO DE INVESTIGACIÓN"),
-    (3, "COORDINACIÓN CIENTÍFICA"), (3, "COORDINACIÓN DE INVESTIGACIÓN EN RESPONSABILIDAD SOCIAL UNIVERSITARIA"),
-    (3, "CENTRO DE INVESTIGACIÓN ALTAMENTE ESPECIALIZADO DE BIOMÉDICAS"), (3, "BIOTERIO AUTOMATIZADO."),
-    (2, "DIRECCIÓN DE GESTIÓN DE LA INVESTIGACIÓN Y DE LA PRODUCCIÓN INTELECTUAL"), (3, "COORDINACIÓN DE FOMENTO DE LA INVESTIGACIÓN"),
-    (3, "COORDINACIÓN DE ADMINISTRACIÓN DE PROYECTOS DE INVESTIGACIÓN."), (3, "COORDINACIÓN EN PRODUCCIÓN INTELECTUAL."),
-    (2, "DIRECCIÓN DE BIBLIOTECAS Y EDITORIAL UNIVERSITARIA"), (3, "COORDINACIÓN DE BIBLIOTECA"),
-    (3, "BIBLIOTECA - FACULTAD DE DERECHO Y CIENCIA POLÍTICA"), (3, "BIBLIOTECA - FACULTAD DE INGENIERÍA"),
-    (3, "BIBLIOTECA - FACULTAD DE CIENCIAS ECONÓMICAS, ADMINISTRATIVAS Y CONTABLES."),
-    (3, "BIBLIOTECA - FACULTAD DE CIENCIAS SOCIALES Y EDUCACIÓN"), (3, "BIBLIOTECA - FACULTAD DE CIENCIAS DE LA SALUD"),
-    (3, "BIBLIOTECA – ESCUELA DE POSGRADO"), (3, "COORDINACIÓN DE EDITORIAL UNIVERSITARIA."),
-    (2, "DIRECCIÓN DE INNOVACIÓN Y EMPRENDIMIENTO."), (3, "COORDINACIÓN EN INNOVACIÓN Y EMPRENDIMIENTO."),
-    (3, "COORDINACIÓN EN INCUBADORAS Y DESARROLLO DE CAPACIDADES EMPRESARIALES"), (1, "VICERRECTORADO ACADÉMICO"),
-    (2, "COORDINACIÓN DE GESTIÓN CON LA SUNEDU"), (2, "DIRECCIÓN DE SERVICIOS ACADÉMICOS"), (3, "UNIDAD DE PROCESOS TÉCNICOS ACADÉMICOS"),
-    (3, "UNIDAD DE REGISTRO CENTRAL Y ESTADÍSTICA ACADÉMICA"), (2, "DIRECCIÓN DE ADMISIÓN Y CENTRO PREUNIVERSITARIO"),
-    (3, "UNIDAD DE ADMISIÓN Y PROCESOS TÉCNICOS"), (3, "COORDINACIÓN DEL CENTRO PREUNIVERSITARIO DE CONSOLIDACIÓN DEL PERFIL DEL INGRESANTE"),
-    (2, "DIRECCIÓN DE DESARROLLO ACADÉMICO"), (3, "COORDINACIÓN DE DESARROLLO CURRICULAR Y FORMACIÓN CONTINUA"),
-    (3, "COORDINACIÓN de TUTORÍA ACADÉMICA Y ATENCIÓN PSICOPEDAGÓGICA"), (3, "UNIDAD DE EDUCACIÓN VIRTUAL Y A DISTANCIA"),
-    (2, "DIRECCIÓN DE CALIDAD ACADÉMICA Y ACREDITACIÓN UNIVERSITARIA"), (3, "COORDINACIÓN DE CALIDAD ACADÉMICA DE PRE Y POSGRADO"),
-    (3, "COORDINACIÓN DE ACREDITACIÓN DE PRE Y POSGRADO"), (2, "DIRECCIÓN DE RESPONSABILIDAD SOCIAL Y EXTENSIÓN UNIVERSITARIA"),
-    (3, "UNIDAD DE ATENCIÓN AL DESARROLLO FORMATIVO: ARTE Y CULTURA"), (3, "UNIDAD DE COOPERACIÓN PARA EL DESARROLLO SOSTENIBLE"),
-    (3, "UNIDAD DE EXTENSIÓN UNIVERSITARIA"), (3, "COORDINACIÓN DEL SISTEMA DE SEGUIMIENTO AL EGRESADO Y GRADUADO DE LA UAC"),
-    (2, "DIRECCIÓN DE COOPERACIÓN NACIONAL E INTERNACIONAL"), (3, "UNIDAD DE CONVENIOS Y BECAS DE ESTUDIO"),
-    (3, "UNIDAD DE MOVILIDAD ACADÉMICA Y ADMINISTRATIVA"), (3, "COORDINACIÓN DE BECAS Y CRÉDITO INTERINSTITUCIONAL"),
-    (2, "FACULTAD DE CIENCIAS Y HUMANIDADES"), (3, "LABORATORIO DE QUÍMICA"), (3, "LABORATORIO DE FÍSICA"),
-    (3, "HUMANIDADES Y EDUCACIÓN"), (3, "TURISMO"), (3, "DEPARTAMENTO ACADÉMICO DE MATEMÁTICA, FÍSICA, QUÍMICA Y ESTADÍSTICA"),
-    (3, "ESCUELA PROFESIONAL DE EDUCACIÓN"), (3, "ESCUELA PROFESIONAL DE TURISMO"), (3, "ESCUELA DE ESTUDIOS DE FORMACIÓN GENERAL"),
-    (3, "UNIDAD DE INVESTIGACIÓN"), (2, "FACULTAD DE CIENCIAS DE LA SALUD"), (3, "CENTRO ESTOMATOLÓGICO"),
-    (3, "CENTRO DE SALUD INTEGRAL"), (3, "LABORATORIO DE CIENCIAS BÁSICAS"), (3, "LABORATORIO DE SIMULACIÓN CLÍNICA"),
-    (3, "LABORATORIO DE CIRUGÍA EXPERIMENTAL"), (3, "MEDICINA HUMANA"), (3, "ESTOMATOLOGÍA"),
-    (3, "OBSTETRICIA Y ENFERMERÍA"), (3, "PSICOLOGÍA"), (3, "ESCUELA PROFESIONAL DE MEDICINA HUMANA"),
-    (3, "ESCUELA PROFESIONAL DE ESTOMATOLOGÍA"), (3, "ESCUELA PROFESIONAL DE OBSTETRICIA"), (3, "ESCUELA PROFESIONAL DE PSICOLOGÍA"),
-    (3, "ESCUELA PROFESIONAL DE ENFERMERÍA"), (3, "ESCUELA PROFESIONAL DE TECNOLOGÍA MÉDICA"), (2, "FACULTAD DE DERECHO Y CIENCIA POLÍTICA"),
-    (3, "DERECHO"), (3, "ESCUELA PROFESIONAL DE DERECHO"), (2, "FACULTAD DE CIENCIAS ECONÓMICAS, ADMINISTRATIVAS Y CONTABLES"),
-    (3, "ECONOMÍA"), (3, "ADMINISTRACIÓN"), (3, "CONTABILIDAD"), (3, "ESCUELA PROFESIONAL DE ECONOMÍA"),
-    (3, "ESCUELA PROFESIONAL DE ADMINISTRACIÓN"), (3, "ESCUELA PROFESIONAL DE CONTABILIDAD"), (3, "ESCUELA PROFESIONAL DE ADMINISTRACIÓN DE NEGOCIOS INTERNACIONALES"),
-    (3, "ESCUELA PROFESIONAL DE FINANZAS"), (3, "ESCUELA PROFESIONAL DE MARKETING"), (2, "FACULTAD DE INGENIERÍA Y ARQUITECTURA"),
-    (3, "LABORATORIOS DE INGENIERÍA INDUSTRIAL"), (3, "LABORATORIOS DE INGENIERÍA CIVIL"), (3, "LABORATORIO DE INGENIERÍA DE SISTEMAS"),
-    (3, "INGENIERÍA INDUSTRIAL"), (3, "INGENIERÍA DE SISTEMAS"), (3, "INGENIERÍA CIVIL"), (3, "ARQUITECTURA"), (3, "INGENIERÍA AMBIENTAL"),
-    (3, "ESCUELA PROFESIONAL DE INGENIERÍA INDUSTRIAL"), (3, "ESCUELA PROFESIONAL DE INGENIERÍA DE SISTEMAS"), (3, "ESCUELA PROFESIONAL DE INGENIERÍA CIVIL"),
-    (3, "ESCUELA PROFESIONAL DE ARQUITECTURA"), (3, "ESCUELA PROFESIONAL DE INGENIERÍA AMBIENTAL"), (2, "ESCUELA DE POSGRADO"),
-    (3, "COORDINACIÓN GENERAL DE LOS PROGRAMAS DE POSGRADO"), (3, "UNIDAD DE POSGRADO"), (3, "UNIDAD DE INVESTIGACIÓN"),
-    (1, "FILIAL PUERTO MALDONADO"), (1, "FILIAL QUILLABAMBA"), (1, "FILIAL SICUANI")
-]
+def iter_master_sections(db: Session):
+    """
+    Produce el reporte maestro una sección del COP a la vez.
+    Primero solo (id, área) de todo el personal; usuarios, saldos y vacaciones
+    se consultan por sección, cuando el template llega a ella.
+    """
+    ids_by_area = {}
+    for user_id, area in get_base_query(db).with_entities(models.User.id, models.User.area):
+        ids_by_area.setdefault((area or "SIN ÁREA").strip().upper(), []).append(user_id)
 
-@router.get("/master", response_class=HTMLResponse, name="admin_master_report")
-def master_report(request: Request, db: Session = Depends(get_db)):
-    all_users = get_base_query(db).all()
-    users_by_area = {}
-    for u in all_users:
-        area_key = (u.area or "SIN ÁREA").strip().upper()
-        if area_key not in users_by_area: users_by_area[area_key] = []
-        balance = crud.get_user_vacation_balance(db, u)
-        vacations = db.query(models.VacationPeriod).filter(models.VacationPeriod.user_id == u.id).order_by(models.VacationPeriod.start_date.asc()).all()
-        users_by_area[area_key].append({"user": u, "balance": balance, "vacations": vacations})
-
-    # CORRECCIÓN: Itera sobre el COP oficial. Si no hay personal, igual añade la sección (miembros vacíos).
-    reporte_final = []
+    # Itera sobre el COP oficial. Si no hay personal, igual produce la sección (miembros vacíos).
     for nivel, nombre_cop in COP_ORDENADO:
-        miembros = users_by_area.get(nombre_cop.upper(), [])
-        reporte_final.append({
+        ids = ids_by_area.get(nombre_cop.upper(), [])
+        miembros = []
+        if ids:
+            users = db.query(models.User).filter(models.User.id.in_(ids)).order_by(models.User.id).all()
+            balances = crud.get_balances_for_users(db, users)
+            vacations = crud.get_vacations_by_user(db, ids)
+            miembros = [{"user": u, "balance": balances[u.id], "vacations": vacations.get(u.id, [])} for u in users]
+        yield {
             "nivel": nivel,
             "nombre": nombre_cop,
             "miembros": miembros # Si está vacío, el template mostrará "Sin personal"
-        })
-    return templates.TemplateResponse("admin_master_report.html", {"request": request, "report": reporte_final})
\ No newline at end of file
+        }
+
+@router.get("/master", response_class=HTMLResponse, name="admin_master_report")
+@query_budget(2 + 3 * len(COP_ORDENADO))  # acotado por secciones del COP, no por número de empleados
+def master_report(request: Request, db: Session = Depends(get_db)):
+    return stream_template(request, "admin_master_report.html", {"report": iter_master_sections(db)})
\ No newline at end of file
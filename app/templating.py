@@ -0,0 +1,94 @@
+# app/templating.py
+# Entorno Jinja2 único para toda la app (main y routers).
+# - Un solo Environment: cada plantilla se compila una vez por worker, no una vez por router.
+# - FileSystemBytecodeCache: el bytecode compilado sobrevive reinicios y lo comparten los workers.
+# - auto_reload desactivado en producción: no se hace stat() de cada plantilla en cada render.
+
+import os
+import time
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template
+from fastapi.templating import Jinja2Templates
+from fastapi.responses import StreamingResponse
+from app.profiler import current_profile
+from app.idempotency import idempotency_field
+
+TEMPLATES_DIR = "app/templates"
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").lower() in ("1", "true", "yes")
+# Vacío = carpeta temporal del sistema (comportamiento por defecto de Jinja)
+TEMPLATES_CACHE_DIR = os.getenv("TEMPLATES_CACHE_DIR", "")
+
+def _bytecode_cache():
+    if TEMPLATES_CACHE_DIR:
+        os.makedirs(TEMPLATES_CACHE_DIR, exist_ok=True)
+        return FileSystemBytecodeCache(TEMPLATES_CACHE_DIR)
+    return FileSystemBytecodeCache()
+
+class TimedTemplate(Template):
+    """Suma el tiempo de render al perfil activo (ver app/profiler.py). Sin perfil no hace nada extra."""
+    def render(self, *args, **kwargs):
+        profile = current_profile()
+        if profile is None:
+            return super().render(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            profile.add_template(self.name, time.perf_counter() - start)
+
+    def generate(self, *args, **kwargs):
+        profile = current_profile()
+        if profile is None:
+            yield from super().generate(*args, **kwargs)
+            return
+        # En streaming el render se intercala con el envío: se mide solo el tiempo dentro del template
+        fragments = super().generate(*args, **kwargs)
+        while True:
+            start = time.perf_counter()
+            try:
+                fragment = next(fragments)
+            except StopIteration:
+                profile.add_template(self.name, time.perf_counter() - start)
+                return
+            profile.add_template(self.name, time.perf_counter() - start)
+            yield fragment
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=True,  # igual que Jinja2Templates(directory=...)
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+    bytecode_cache=_bytecode_cache(),
+)
+env.template_class = TimedTemplate
+env.globals["idempotency_field"] = idempotency_field  # token oculto de los formularios POST (app/idempotency.py)
+
+templates = Jinja2Templates(env=env)
+
+def warm_templates() -> int:
+    """Precompila todas las plantillas (se llama en el arranque): el primer render ya no compila."""
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+# Jinja emite muchos fragmentos pequeños: se agrupan para no mandar un chunk HTTP por cada uno.
+STREAM_CHUNK_SIZE = 16 * 1024
+
+def _buffered(fragments, size: int = STREAM_CHUNK_SIZE):
+    buffer, length = [], 0
+    for fragment in fragments:
+        buffer.append(fragment)
+        length += len(fragment)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+def stream_template(request, name: str, context: dict) -> StreamingResponse:
+    """
+    Renderiza con template.generate(): el HTML sale a medida que se itera el contexto.
+    Si el contexto trae generadores (p. ej. una sección por vez), ni la memoria ni el
+    primer byte dependen del tamaño total de la página.
+    """
+    context.setdefault("request", request)
+    return StreamingResponse(_buffered(env.get_template(name).generate(context)), media_type="text/html")
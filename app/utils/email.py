@@ -1,26 +1,32 @@
 # app/utils/email.py
 import os
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from pydantic import EmailStr
+from functools import lru_cache
 from typing import List
 
-# Configuración cargada desde las variables de entorno
-conf = ConnectionConfig(
-    MAIL_USERNAME=os.getenv("MAIL_USERNAME", ""),
-    MAIL_PASSWORD=os.getenv("MAIL_PASSWORD", ""),
-    MAIL_FROM=os.getenv("MAIL_FROM", "afernandezl@uandina.edu.pe"),
-    MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
-    MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
-    MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "True") == "True",
-    MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False") == "True",
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
-)
+# fastapi_mail (y aiosmtplib) se importan al enviar el primer correo, no al arrancar el worker.
+@lru_cache(maxsize=1)
+def get_mail_conf():
+    """Configuración cargada desde las variables de entorno."""
+    from fastapi_mail import ConnectionConfig
+    return ConnectionConfig(
+        MAIL_USERNAME=os.getenv("MAIL_USERNAME", ""),
+        MAIL_PASSWORD=os.getenv("MAIL_PASSWORD", ""),
+        MAIL_FROM=os.getenv("MAIL_FROM", "afernandezl@uandina.edu.pe"),
+        MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
+        MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
+        MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "True") == "True",
+        MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False") == "True",
+        # Sin credenciales ni certificados para un SMTP local (p. ej. el sumidero de benchmarks/loadtest.py)
+        USE_CREDENTIALS=os.getenv("MAIL_USE_CREDENTIALS", "True") == "True",
+        VALIDATE_CERTS=os.getenv("MAIL_VALIDATE_CERTS", "True") == "True"
+    )
 
 async def send_email_async(subject: str, email_to: List[str], body: str):
     """
     Envía un correo electrónico simple (texto/html).
     """
+    from fastapi_mail import FastMail, MessageSchema, MessageType
+
     message = MessageSchema(
         subject=subject,
         recipients=email_to,
@@ -28,12 +34,12 @@ async def send_email_async(subject: str, email_to: List[str], body: str):
         subtype=MessageType.html
     )
 
-    fm = FastMail(conf)
-    
+    fm = FastMail(get_mail_conf())
+
     try:
         await fm.send_message(message)
         print(f"✅ Correo enviado a {email_to}")
         return True
     except Exception as e:
         print(f"❌ Error enviando correo: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,103 @@
+# app/utils/files.py
+import os
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+UPLOADS_DIR = "uploads"
+
+# Caché de ETags: ruta -> (tamaño, mtime, hash del contenido), LRU acotada.
+# Los documentos no cambian después de subirse, así que solo se hashea una vez por worker;
+# una sola entrada por ruta (si el archivo se reemplaza, se pisa la anterior).
+ETAG_CACHE_MAX_ENTRIES = int(os.getenv("ETAG_CACHE_MAX_ENTRIES", 2048))
+_etag_cache = OrderedDict()
+_etag_lock = threading.Lock()
+
+def resolve_upload_path(file_name: str) -> Optional[str]:
+    """
+    Devuelve la ruta absoluta de un documento dentro de UPLOADS_DIR,
+    o None si el nombre intenta salir de la carpeta o el archivo no existe.
+    """
+    if not file_name:
+        return None
+    base = os.path.realpath(UPLOADS_DIR)
+    full_path = os.path.realpath(os.path.join(base, file_name))
+    if os.path.commonpath([base, full_path]) != base:
+        return None
+    if not os.path.isfile(full_path):
+        return None
+    return full_path
+
+def get_file_etag(full_path: str, stat_result: os.stat_result = None) -> str:
+    """
+    ETag fuerte basado en el SHA-256 del contenido del archivo.
+    """
+    st = stat_result or os.stat(full_path)
+    version = (st.st_size, st.st_mtime_ns)
+    with _etag_lock:
+        cached = _etag_cache.get(full_path)
+        if cached and cached[0] == version:
+            _etag_cache.move_to_end(full_path)
+            return cached[1]
+
+    digest = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()}"'
+
+    with _etag_lock:
+        _etag_cache[full_path] = (version, etag)
+        _etag_cache.move_to_end(full_path)
+        while len(_etag_cache) > ETAG_CACHE_MAX_ENTRIES:
+            _etag_cache.popitem(last=False)
+    return etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evalúa la cabecera If-None-Match (comparación débil, según RFC 9110).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+class ZipStreamBuffer:
+    """
+    Destino de escritura para zipfile sin seek ni tell: zipfile escribe en modo
+    'streaming' (con data descriptors) y nosotros vamos vaciando lo acumulado.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def save_upload(upload, file_name: str) -> str:
+    """
+    Guarda un UploadFile en UPLOADS_DIR copiando por bloques.
+    Es bloqueante: se llama desde rutas 'def' (threadpool), nunca desde el event loop.
+    """
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    upload.file.seek(0)
+    with open(os.path.join(UPLOADS_DIR, file_name), "wb") as out:
+        shutil.copyfileobj(upload.file, out, 1024 * 1024)
+    return file_name
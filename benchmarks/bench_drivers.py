@@ -0,0 +1,159 @@
+# benchmarks/bench_drivers.py
+"""
+Compara drivers de MySQL (síncronos y asíncronos) con la mezcla real de consultas:
+dashboard de RRHH, saldos (un SUM por usuario, como el reporte de saldos) y exportación del historial.
+
+Uso (desde la raíz del proyecto, con las variables DB_* apuntando a la BD):
+    python -m benchmarks.bench_drivers --drivers mysqldb,pymysql,mysqlconnector --async-drivers asyncmy,aiomysql
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, select, func, and_, or_
+from sqlalchemy.orm import Session, joinedload
+
+from app import models
+from app.db import build_database_url, connect_args_for
+
+ACTIVE_STATUSES = ['draft', 'pending_hr', 'approved', 'pending_modification', 'pending_suspension']
+
+def dashboard_statements():
+    """Las mismas consultas que crud.get_dashboard_data hace para RRHH."""
+    vp = models.VacationPeriod
+    today = date.today()
+    base = select(vp).options(joinedload(vp.user))
+    return [
+        base.where(vp.status == 'draft'),
+        base.where(vp.status == 'pending_hr'),
+        select(models.ModificationRequest).where(models.ModificationRequest.status == 'pending_review'),
+        select(models.SuspensionRequest).where(models.SuspensionRequest.status == 'pending_review'),
+        base.where(vp.status == 'approved', vp.start_date >= today).order_by(vp.start_date),
+        base.where(or_(vp.status.in_(['rejected', 'suspended']), and_(vp.status == 'approved', vp.start_date < today))).order_by(vp.start_date.desc()),
+    ]
+
+def eligible_users_statement():
+    """Equivalente a reports.get_base_query: personal programable activo."""
+    u = models.User
+    return select(u).where(
+        u.is_active == True,
+        or_(u.role == 'employee', and_(u.role == 'manager', u.can_request_own_vacation == True))
+    )
+
+def balance_statement(user_id: int):
+    vp = models.VacationPeriod
+    return select(func.sum(vp.days)).where(vp.user_id == user_id, vp.status.in_(ACTIVE_STATUSES))
+
+def export_statement():
+    vp = models.VacationPeriod
+    return select(vp).options(joinedload(vp.user))
+
+# --- EJECUCIÓN SÍNCRONA ---
+
+def run_sync_scenarios(session: Session) -> dict:
+    timings = {}
+
+    start = time.perf_counter()
+    for stmt in dashboard_statements():
+        session.execute(stmt).unique().scalars().all()
+    timings["dashboard"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    users = session.execute(eligible_users_statement()).scalars().all()
+    for u in users:
+        session.execute(balance_statement(u.id)).scalar()
+    timings["balances"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = session.execute(export_statement()).unique().scalars().all()
+    [(v.id, v.user.full_name, v.user.area, v.start_date, v.end_date, v.days, v.status) for v in rows]
+    timings["export"] = time.perf_counter() - start
+
+    session.expunge_all()
+    return timings
+
+def bench_sync_driver(driver: str, iterations: int) -> dict:
+    url = build_database_url(driver)
+    engine = create_engine(url, connect_args=connect_args_for(driver), pool_pre_ping=True)
+    samples = {}
+    with Session(engine) as session:
+        run_sync_scenarios(session)  # calentamiento (conexión, caché de sentencias)
+        for _ in range(iterations):
+            for name, seconds in run_sync_scenarios(session).items():
+                samples.setdefault(name, []).append(seconds)
+    engine.dispose()
+    return samples
+
+# --- EJECUCIÓN ASÍNCRONA ---
+
+async def run_async_scenarios(session) -> dict:
+    timings = {}
+
+    start = time.perf_counter()
+    for stmt in dashboard_statements():
+        (await session.execute(stmt)).unique().scalars().all()
+    timings["dashboard"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    users = (await session.execute(eligible_users_statement())).scalars().all()
+    for u in users:
+        (await session.execute(balance_statement(u.id))).scalar()
+    timings["balances"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = (await session.execute(export_statement())).unique().scalars().all()
+    [(v.id, v.user.full_name, v.user.area, v.start_date, v.end_date, v.days, v.status) for v in rows]
+    timings["export"] = time.perf_counter() - start
+
+    session.expunge_all()
+    return timings
+
+async def bench_async_driver(driver: str, iterations: int) -> dict:
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    url = build_database_url(driver)
+    engine = create_async_engine(url, connect_args=connect_args_for(driver), pool_pre_ping=True)
+    samples = {}
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await run_async_scenarios(session)
+        for _ in range(iterations):
+            for name, seconds in (await run_async_scenarios(session)).items():
+                samples.setdefault(name, []).append(seconds)
+    await engine.dispose()
+    return samples
+
+# --- REPORTE ---
+
+def summarize(samples: list) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return f"media {statistics.mean(ordered) * 1000:8.1f} ms | p95 {p95 * 1000:8.1f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de drivers MySQL con la mezcla de consultas del sistema.")
+    parser.add_argument("--drivers", default="mysqldb,pymysql,mysqlconnector")
+    parser.add_argument("--async-drivers", default="asyncmy,aiomysql")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {}
+    for driver in filter(None, args.drivers.split(",")):
+        try:
+            results[driver] = bench_sync_driver(driver, args.iterations)
+        except ImportError as e:
+            print(f"⚠️  {driver}: no instalado ({e})")
+
+    for driver in filter(None, args.async_drivers.split(",")):
+        try:
+            results[f"{driver} (async)"] = asyncio.run(bench_async_driver(driver, args.iterations))
+        except ImportError as e:
+            print(f"⚠️  {driver}: no instalado ({e})")
+
+    for driver, samples in results.items():
+        print(f"\n=== {driver} ===")
+        for scenario, values in samples.items():
+            print(f"  {scenario:<10} {summarize(values)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# benchmarks/bench_suite.py
+"""
+Benchmarks de las rutas y funciones más pesadas sobre un conjunto de datos sintético
+(ver benchmarks/synthetic.py), con baselines guardados para detectar regresiones.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.synthetic --users 10000 --url sqlite:///bench_10k.db --reset
+    python -m benchmarks.bench_suite --url sqlite:///bench_10k.db              # compara con el baseline
+    python -m benchmarks.bench_suite --url sqlite:///bench_10k.db --save       # guarda un nuevo baseline
+    python -m benchmarks.bench_suite --url sqlite:///bench_10k.db --only dashboard,calculator
+
+Los baselines se guardan por el tamaño y la fecha de referencia con que se generó la base
+(--users y --today de benchmarks.synthetic: "1000u@2026-10-19", ...) en benchmarks/baselines.json;
+se leen de la propia base, así agregar usuarios después (p. ej. benchmarks.concurrency_check) no
+cambia de baseline. Sale con código 1 si la mediana de algún benchmark supera su baseline en
+más de --tolerance, o si no hay baseline con qué comparar (salvo con --save). Los tiempos
+dependen de la máquina: regenere los baselines (--save) en la máquina donde se van a comparar.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, crud, models
+from app.db import get_db
+from app.logic.vacation_calculator import VacationCalculator
+from app.routers.reports import get_base_query
+from benchmarks.synthetic import DATASET_KEY, REFERENCE_DATE
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+class Suite:
+    def __init__(self, url: str):
+        self.engine = create_engine(url)
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False)
+        with self.SessionLocal() as db:
+            self.n_users = db.scalar(select(func.count()).select_from(models.User))
+            self.dataset = db.scalar(select(models.SystemConfig.value).where(models.SystemConfig.key == DATASET_KEY))
+            # Fecha de referencia con que se generó ("1000u@2026-10-19"): las fechas de prueba salen de ella
+            self.today = date.fromisoformat(self.dataset.split("@")[1]) if self.dataset and "@" in self.dataset else REFERENCE_DATE
+            self.admin_email = db.scalar(select(models.User.email).where(models.User.role == "admin").limit(1))
+            self.hr_id = db.scalar(select(models.User.id).where(models.User.role == "hr").limit(1))
+            # El jefe con más subordinados: el peor caso del dashboard de jefe
+            self.manager_id = db.scalar(
+                select(models.User.manager_id).where(models.User.manager_id != None)
+                .group_by(models.User.manager_id).order_by(func.count().desc()).limit(1)
+            )
+            self.employee_id = db.scalar(
+                select(models.VacationPeriod.user_id).group_by(models.VacationPeriod.user_id)
+                .order_by(func.count().desc()).limit(1)
+            )
+        if not self.admin_email:
+            raise SystemExit("La base no tiene datos sintéticos: ejecute primero benchmarks.synthetic.")
+        self._client = None
+
+    @property
+    def client(self):
+        """TestClient de la app con get_db apuntando a la base del benchmark (sin lifespan: no siembra ni abre MySQL)."""
+        if self._client is None:
+            from fastapi.testclient import TestClient
+            from app.main import app
+
+            def bench_db():
+                db = self.SessionLocal()
+                try:
+                    yield db
+                finally:
+                    db.close()
+            app.dependency_overrides[get_db] = bench_db
+            self._client = TestClient(app, root_path="/gestion")
+            self._client.cookies.set("access_token", auth.create_access_token({"sub": self.admin_email}))
+        return self._client
+
+    # --- Benchmarks: cada uno abre su propia sesión (sin identity map caliente entre rondas) ---
+
+    def _dashboard(self, user_id):
+        with self.SessionLocal() as db:
+            crud.get_dashboard_data(db, db.get(models.User, user_id))
+
+    def bench_dashboard_hr(self):
+        self._dashboard(self.hr_id)
+
+    def bench_dashboard_manager(self):
+        self._dashboard(self.manager_id)
+
+    def bench_dashboard_employee(self):
+        self._dashboard(self.employee_id)
+
+    def bench_balances_all(self):
+        with self.SessionLocal() as db:
+            crud.get_balances_for_users(db, get_base_query(db).all())
+
+    def bench_balance_single_x100(self):
+        with self.SessionLocal() as db:
+            for user in get_base_query(db).limit(100):
+                crud.get_user_vacation_balance(db, user)
+
+    def bench_calculator(self):
+        """Lo que hace /api/calculate: construir el calculador y calcular 20 fechas."""
+        with self.SessionLocal() as db:
+            user = db.get(models.User, self.employee_id)
+            calc = VacationCalculator(db, user)
+            start = date(self.today.year + 1, 1, 5)
+            for i in range(20):
+                day = start + timedelta(days=7 * i)
+                calc.validate_start_date(day)
+                calc.check_period_type_limit(day, 7)
+                try:
+                    calc.calculate_end_date(day, 15)
+                except ValueError:
+                    pass
+
+    def _get(self, url: str):
+        response = self.client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} respondió {response.status_code}")
+
+    def bench_http_reports_panel(self):
+        self._get("/reports/")
+
+    def bench_http_master_report(self):
+        self._get("/reports/master")
+
+    def bench_http_export_planned(self):
+        self._get("/reports/download/planned")
+
+    def bench_http_export_history(self):
+        self._get("/reports/download/history")
+
+    def bench_http_export_balances(self):
+        self._get("/reports/download/balances")
+
+    def benchmarks(self) -> dict:
+        return {name[len("bench_"):]: getattr(self, name) for name in dir(self) if name.startswith("bench_")}
+
+def run(func, rounds: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(times),
+        "median_ms": statistics.median(times),
+        "mean_ms": statistics.mean(times),
+        "stddev_ms": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "rounds": rounds,
+    }
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sobre datos sintéticos, comparados con baselines guardados.")
+    parser.add_argument("--url", required=True, help="URL de la base generada con benchmarks.synthetic")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--only", default="", help="Nombres (o prefijos) separados por comas")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Regresión permitida sobre la mediana (0.25 = +25%%)")
+    parser.add_argument("--save", action="store_true", help="Guarda los resultados como baseline de este tamaño")
+    parser.add_argument("--dataset", default=None,
+                        help="Baseline a usar (p. ej. 1000u@2026-10-19) en bases generadas antes de que synthetic lo registrara")
+    args = parser.parse_args()
+
+    suite = Suite(args.url)
+    dataset = args.dataset or suite.dataset
+    if not dataset:
+        raise SystemExit(f"La base no registra su tamaño ({DATASET_KEY}): regenérela con benchmarks.synthetic "
+                         "o indique --dataset.")
+    selected = [s.strip() for s in args.only.split(",") if s.strip()]
+    benches = {name: func for name, func in suite.benchmarks().items()
+               if not selected or any(name.startswith(s) for s in selected)}
+
+    baselines = load_baselines()
+    baseline = baselines.get(dataset, {})
+    results, regressions = {}, []
+
+    print(f"Conjunto de datos: {dataset} ({suite.n_users} usuarios) | {args.rounds} rondas (+{args.warmup} de calentamiento)")
+    print(f"{'benchmark':<26} {'min':>9} {'mediana':>9} {'media':>9} {'desv':>8} {'baseline':>9} {'cambio':>8}")
+    for name, func in benches.items():
+        stats = run(func, args.rounds, args.warmup)
+        results[name] = stats
+        ref = baseline.get(name, {}).get("median_ms")
+        change = ""
+        if ref:
+            ratio = stats["median_ms"] / ref - 1
+            change = f"{ratio:+.0%}"
+            if ratio > args.tolerance:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:<26} {stats['min_ms']:>9.1f} {stats['median_ms']:>9.1f} {stats['mean_ms']:>9.1f} "
+              f"{stats['stddev_ms']:>8.1f} {(f'{ref:.1f}' if ref else '-'):>9} {change:>8}")
+
+    if args.save:
+        baseline.update({name: {"median_ms": round(s["median_ms"], 2), "min_ms": round(s["min_ms"], 2)}
+                         for name, s in results.items()})
+        baselines[dataset] = baseline
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline '{dataset}' guardado en {BASELINES_PATH}")
+        return
+
+    missing = [name for name in results if not baseline.get(name, {}).get("median_ms")]
+    if missing:
+        print(f"FALLA: sin baseline '{dataset}' para: {', '.join(missing)} "
+              f"(guárdelo con --save; hay baselines para: {', '.join(sorted(baselines)) or 'ninguno'})")
+        sys.exit(1)
+    if regressions:
+        print(f"FALLA: regresión mayor a {args.tolerance:.0%} en: {', '.join(regressions)}")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
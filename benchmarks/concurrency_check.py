@@ -0,0 +1,122 @@
+# benchmarks/concurrency_check.py
+"""
+Prueba de concurrencia de las escrituras que consumen saldo (crud.create_vacation).
+
+Lanza varias creaciones simultáneas para UN mismo empleado (como si el empleado y su jefe
+enviaran a la vez), cada una con su propia sesión y soltadas juntas con una barrera.
+El saldo solo alcanza para algunas: si se confirman más días de los que tiene, el
+bloqueo por usuario (crud.lock_user_for_write) no está funcionando.
+
+Uso (desde la raíz del proyecto; necesita una base real, no SQLite en memoria):
+    python -m benchmarks.synthetic --users 1000 --url sqlite:///bench_1k.db --reset
+    python -m benchmarks.concurrency_check --url sqlite:///bench_1k.db
+    python -m benchmarks.concurrency_check --url sqlite:///bench_1k.db --without-lock   # reproduce la carrera
+
+Crea (o reutiliza) un usuario propio "concurrency_check" y borra sus solicitudes en cada corrida.
+Sale con código 1 si el saldo queda sobregirado.
+"""
+import argparse
+import sys
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.db import engine_options
+from app.logic.vacation_calculator import VacationCalculator
+
+USERNAME = "concurrency_check"
+
+def prepare_user(db, days_total: int) -> models.User:
+    user = db.query(models.User).filter(models.User.username == USERNAME).first()
+    if user is None:
+        user = models.User(username=USERNAME, full_name="Prueba de concurrencia", role="employee",
+                           area="PRUEBAS", location="CUSCO", email=None)
+        db.add(user)
+        db.flush()
+    user.vacation_days_total = days_total
+    ids = [v.id for v in db.query(models.VacationPeriod.id).filter(models.VacationPeriod.user_id == user.id)]
+    if ids:
+        db.query(models.VacationLog).filter(models.VacationLog.vacation_period_id.in_(ids)).delete(synchronize_session=False)
+        db.query(models.VacationPeriod).filter(models.VacationPeriod.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    return user
+
+def candidate_dates(db, user: models.User, count: int, period: int) -> list:
+    """Una fecha válida por año (el tope por tipo de periodo es anual), sin cruces entre sí."""
+    calc = VacationCalculator(db, user)
+    dates, year = [], date.today().year + 1
+    while len(dates) < count:
+        day = date(year, 3, 1)
+        for _ in range(60):
+            if calc.validate_start_date(day)[0]:
+                try:
+                    calc.calculate_end_date(day, period)
+                    dates.append(day)
+                    break
+                except ValueError:
+                    pass
+            day += timedelta(days=1)
+        year += 1
+    return dates
+
+def main():
+    parser = argparse.ArgumentParser(description="Creaciones simultáneas para un mismo empleado: el saldo no debe sobregirarse.")
+    parser.add_argument("--url", required=True, help="URL de la base (SQLite en archivo o MySQL)")
+    parser.add_argument("--threads", type=int, default=8, help="Solicitudes simultáneas")
+    parser.add_argument("--period", type=int, default=15, help="Días de cada solicitud (7, 8, 15 o 30)")
+    parser.add_argument("--days-total", type=int, default=30, help="Saldo del empleado de prueba")
+    parser.add_argument("--without-lock", action="store_true", help="Desactiva el bloqueo para reproducir la carrera")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url, **engine_options(args.url))
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    if args.without_lock:
+        crud.lock_user_for_write = lambda db, user_id: None
+
+    with SessionLocal() as db:
+        user_id = prepare_user(db, args.days_total).id
+        starts = candidate_dates(db, db.get(models.User, user_id), args.threads, args.period)
+
+    barrier = threading.Barrier(args.threads)
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker(start: date):
+        with SessionLocal() as db:
+            user = db.get(models.User, user_id)
+            barrier.wait()
+            try:
+                crud.create_vacation(db, user, start.isoformat(), args.period)
+                kind = "creada"
+            except Exception as e:
+                kind = str(e).split(".")[0][:70]
+        with lock:
+            outcomes[kind] += 1
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in starts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with SessionLocal() as db:
+        user = db.get(models.User, user_id)
+        used = sum(v.days for v in db.query(models.VacationPeriod).filter(models.VacationPeriod.user_id == user_id))
+        balance = crud.get_user_vacation_balance(db, user)
+
+    print(f"{args.threads} solicitudes simultáneas de {args.period} días | saldo inicial {args.days_total}"
+          f"{' | SIN bloqueo' if args.without_lock else ''}")
+    for kind, n in outcomes.most_common():
+        print(f"  {n:>3}  {kind}")
+    print(f"Días confirmados: {used} | saldo final: {balance}")
+    if balance < 0:
+        print("FALLA: saldo sobregirado por escrituras concurrentes.")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/explain_indexes.py
+"""
+Verifica que las consultas calientes usan los índices compuestos de la migración 94803891266c.
+
+Ejecuta las funciones reales de la app (saldo, cruces, tope por tipo de periodo, historial de
+una solicitud, bandejas del dashboard de RRHH) capturando el SQL que emiten, y pide el plan de
+cada sentencia a la base: EXPLAIN QUERY PLAN en SQLite, EXPLAIN en MySQL. Cada chequeo pasa si
+alguna de sus sentencias usa el índice esperado.
+
+Uso (desde la raíz del proyecto; conviene una base con volumen para que el planificador elija
+como en producción):
+    python -m benchmarks.synthetic --users 1000 --url sqlite:///bench_1k.db --reset
+    python -m benchmarks.explain_indexes --url sqlite:///bench_1k.db
+    python -m benchmarks.explain_indexes --url sqlite:///bench_1k.db --verbose   # muestra los planes
+
+Sale con código 1 si alguna consulta no usa su índice.
+"""
+import argparse
+import sys
+from datetime import date
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.db import engine_options
+from app.logic.vacation_calculator import VacationCalculator
+
+def checks(db, employee, hr, vacation_id):
+    """(nombre, índice esperado, llamada a la función real)."""
+    calc = VacationCalculator(db, employee)
+    year = date.today().year
+    return [
+        ("saldo", "ix_vacation_periods_user_status",
+         lambda: crud.get_user_vacation_balance(db, employee)),
+        ("cruce de fechas", "ix_vacation_periods_user_start",
+         lambda: calc.check_overlap(date(year, 3, 1), date(year, 3, 15))),
+        ("tope por tipo de periodo", "ix_vacation_periods_user_start",
+         lambda: calc.check_period_type_limit(date(year, 3, 1), 7)),
+        ("historial de la solicitud", "ix_vacation_logs_period_created",
+         lambda: crud.get_logs_for_vacation(db, vacation_id)),
+        ("cola de aprobadas (dashboard RRHH)", "ix_vacation_periods_status_start",
+         lambda: crud.get_dashboard_data(db, hr)),
+        ("bandeja de modificaciones", "ix_modification_requests_status_period",
+         lambda: crud.get_dashboard_data(db, hr)),
+        ("bandeja de suspensiones", "ix_suspension_requests_status_period",
+         lambda: crud.get_dashboard_data(db, hr)),
+    ]
+
+def explain(conn, statement, parameters) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return "\n".join(" | ".join(str(v) for v in row) for row in rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Comprueba con EXPLAIN que las consultas calientes usan sus índices.")
+    parser.add_argument("--url", required=True, help="URL de la base (p. ej. generada con benchmarks.synthetic)")
+    parser.add_argument("--verbose", action="store_true", help="Imprime el plan de cada sentencia")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url, **engine_options(args.url))
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    failed = []
+    with SessionLocal() as db:
+        # El empleado con más historial y una de sus solicitudes: el peor caso de cada consulta
+        employee_id, vacation_id = db.execute(
+            select(models.VacationPeriod.user_id, func.max(models.VacationPeriod.id))
+            .group_by(models.VacationPeriod.user_id).order_by(func.count().desc()).limit(1)
+        ).first() or (None, None)
+        hr = db.scalar(select(models.User).where(models.User.role == "hr").limit(1))
+        if employee_id is None or hr is None:
+            raise SystemExit("La base no tiene datos: ejecute primero benchmarks.synthetic.")
+        employee = db.get(models.User, employee_id)
+
+        for name, index, call in checks(db, employee, hr, vacation_id):
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                call()
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+            conn = db.connection()
+            plans = [explain(conn, statement, parameters) for statement, parameters in captured]
+            used = any(index in plan for plan in plans)
+            print(f"{'OK   ' if used else 'FALLA'} {name:<36} {index}")
+            if args.verbose or not used:
+                for (statement, _), plan in zip(captured, plans):
+                    print("      " + " ".join(statement.split())[:140])
+                    print("\n".join("        " + line for line in plan.splitlines()))
+            if not used:
+                failed.append(name)
+
+    if failed:
+        print(f"FALLA: {len(failed)} consultas no usan su índice: {', '.join(failed)}")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/import_budget.py
+"""
+Perfil de importación con 'python -X importtime': qué módulos pesan al importar app.main
+y si alguno de los que deben cargarse bajo demanda (pandas, openpyxl, fastapi_mail) se coló al arranque.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.import_budget --budget-ms 2500 --top 15
+
+Sale con código 1 si se supera el presupuesto o si se importó un módulo perezoso.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+# Módulos que solo se usan en rutas puntuales: deben importarse dentro de la función que los usa.
+LAZY_MODULES = ["pandas", "openpyxl", "fastapi_mail", "aiosmtplib"]
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def profile_imports(target: str) -> list:
+    """Devuelve [(modulo, self_us, acumulado_us, nivel)] en el orden que reporta -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"No se pudo importar {target}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil -X importtime de app.main contra un presupuesto.")
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=2500.0)
+    parser.add_argument("--top", type=int, default=15, help="Módulos de primer nivel más pesados a mostrar")
+    args = parser.parse_args()
+
+    rows = profile_imports(args.target)
+    total_ms = next((cum for name, _, cum, _ in rows if name == args.target), 0) / 1000
+
+    # Nivel 1 = dependencias directas del objetivo; da una vista útil sin ruido
+    direct = sorted((r for r in rows if r[3] == 1), key=lambda r: r[2], reverse=True)
+    print(f"{'Módulo':<45}{'acumulado (ms)':>16}")
+    for name, _, cum, _ in direct[:args.top]:
+        print(f"{name:<45}{cum / 1000:>16.1f}")
+    print(f"\nTotal {args.target}: {total_ms:.0f} ms (presupuesto {args.budget_ms:.0f} ms)")
+
+    loaded = {name for name, _, _, _ in rows}
+    leaked = [m for m in LAZY_MODULES if m in loaded]
+
+    failed = False
+    if total_ms > args.budget_ms:
+        print("FALLA: la importación supera el presupuesto.")
+        failed = True
+    if leaked:
+        print(f"FALLA: se importaron al arranque módulos que deben ser perezosos: {', '.join(leaked)}")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/query_budget_check.py
+"""
+Verifica los presupuestos de consultas (@query_budget, app/query_stats.py) sobre datos sintéticos.
+
+Recorre con TestClient cada ruta con presupuesto, con los usuarios que la hacen más pesada
+(el dashboard con admin, RRHH, el jefe con más subordinados y el empleado con más historial),
+en modo estricto (QUERY_BUDGET_STRICT): si una ruta hace más consultas que su presupuesto,
+la petición falla con QueryBudgetExceeded. Cada caso corre con la caché vacía (peor caso).
+También falla si hay una ruta con presupuesto que este chequeo no recorre.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.synthetic --users 10000 --url sqlite:///bench_10k.db --reset
+    python -m benchmarks.query_budget_check --url sqlite:///bench_10k.db
+
+Sale con código 1 si algún presupuesto se excede o queda sin verificar.
+"""
+import argparse
+import os
+import sys
+
+def iter_routes(routes):
+    """Rutas de la app incluidas las de los routers (include_router las agrupa)."""
+    for route in routes:
+        if hasattr(route, "original_router"):
+            yield from iter_routes(route.original_router.routes)
+        else:
+            yield route
+
+def main():
+    parser = argparse.ArgumentParser(description="Recorre las rutas con @query_budget en modo estricto.")
+    parser.add_argument("--url", required=True, help="URL de la base generada con benchmarks.synthetic")
+    args = parser.parse_args()
+
+    # Antes de importar la app: los contadores escuchan al engine de app.db
+    os.environ["DATABASE_URL"] = args.url
+    os.environ["QUERY_BUDGET_STRICT"] = "true"
+    os.environ.setdefault("RATELIMIT_ENABLED", "false")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+    from app import auth, models
+    from app.cache import cache
+    from app.db import SessionLocal
+    from app.main import app
+    from app.query_stats import QueryBudgetExceeded
+
+    with SessionLocal() as db:
+        # El jefe con más subordinados y el empleado con más historial: el peor caso del dashboard
+        manager_id = db.scalar(
+            select(models.User.manager_id).where(models.User.manager_id != None)
+            .group_by(models.User.manager_id).order_by(func.count().desc()).limit(1)
+        )
+        employee_id = db.scalar(
+            select(models.VacationPeriod.user_id).group_by(models.VacationPeriod.user_id)
+            .order_by(func.count().desc()).limit(1)
+        )
+        email = select(models.User.email).where(models.User.email != None).limit(1)
+        actors = {
+            "admin": db.scalar(email.where(models.User.role == "admin")),
+            "hr": db.scalar(email.where(models.User.role == "hr")),
+            "manager": db.scalar(email.where(models.User.id == manager_id)),
+            "employee": db.scalar(email.where(models.User.id == employee_id)),
+        }
+    if not all(actors.values()):
+        raise SystemExit("La base no tiene datos sintéticos: ejecute primero benchmarks.synthetic.")
+
+    # (nombre de la ruta, ruta, actor)
+    cases = [
+        ("dashboard", "/app", "admin"),
+        ("dashboard", "/app", "hr"),
+        ("dashboard", "/app", "manager"),
+        ("dashboard", "/app", "employee"),
+        ("admin_reports_panel", "/reports/", "admin"),
+        ("admin_master_report", "/reports/master", "admin"),
+    ]
+
+    client = TestClient(app, root_path="/gestion")  # sin lifespan: no siembra ni toca otra BD
+    failed = []
+    for name, path, actor in cases:
+        cache.clear()
+        client.cookies.set("access_token", auth.create_access_token({"sub": actors[actor]}))
+        try:
+            response = client.get(path, follow_redirects=False)
+            count = response.headers.get("Server-Timing", "").rsplit('desc="', 1)[-1].split(" ")[0]
+            if response.status_code != 200:
+                raise RuntimeError(f"respondió {response.status_code}")
+            print(f"OK    {name:<22} {actor:<9} {count:>4} consultas (al enviar cabeceras)")
+        except QueryBudgetExceeded as e:
+            print(f"FALLA {name:<22} {actor:<9} {e}")
+            failed.append(f"{name} ({actor})")
+        except RuntimeError as e:
+            print(f"FALLA {name:<22} {actor:<9} {e}")
+            failed.append(f"{name} ({actor})")
+
+    covered = {name for name, _, _ in cases}
+    budgeted = {route.name: route.endpoint.query_budget for route in iter_routes(app.routes)
+                if getattr(getattr(route, "endpoint", None), "query_budget", None) is not None}
+    unchecked = sorted(set(budgeted) - covered)
+    if unchecked:
+        print(f"FALLA: rutas con presupuesto sin verificar en este chequeo: {', '.join(unchecked)}")
+        failed += unchecked
+
+    if failed:
+        print(f"FALLA: {len(failed)} casos: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"OK ({len(cases)} casos, presupuestos: " + ", ".join(f"{n}={b}" for n, b in sorted(budgeted.items())) + ")")
+
+if __name__ == "__main__":
+    main()
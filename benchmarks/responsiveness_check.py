@@ -0,0 +1,136 @@
+# benchmarks/responsiveness_check.py
+"""
+Prueba de que una llamada lenta a la BD no frena al resto de las peticiones.
+
+Levanta la app en un uvicorn de UN worker (un solo event loop) contra la base indicada y
+vuelve lenta una llamada de BD (crud.get_user_by_id duerme --slow-seconds con time.sleep,
+como una consulta bloqueada). Mientras la ficha de usuario del admin espera esa llamada, se
+lanzan --light peticiones livianas simultáneas (/admin/db-pool): como las rutas síncronas
+corren en el threadpool, deben terminar dentro de --budget-ms sin esperar a la lenta.
+Por defecto el presupuesto es lo que tarda la misma ráfaga sola (medida antes, así no depende
+de la máquina) más la mitad de la llamada lenta.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.synthetic --users 1000 --url sqlite:///bench_1k.db --reset
+    python -m benchmarks.responsiveness_check --url sqlite:///bench_1k.db
+    python -m benchmarks.responsiveness_check --url sqlite:///bench_1k.db --async-handler   # reproduce el bloqueo
+
+Con --async-handler la llamada lenta se hace desde una ruta 'async def' (como antes de pasar
+las rutas al threadpool): bloquea el event loop y las livianas quedan detrás de ella.
+Sale con código 1 si alguna petición liviana supera el presupuesto.
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("RATELIMIT_ENABLED", "false")  # todas las peticiones salen de la misma IP
+
+import httpx
+import uvicorn
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, crud, models
+from app.db import engine_options, get_db
+
+SLOW_PATH = "/admin/users/{user_id}/edit"
+ASYNC_SLOW_PATH = "/admin/_responsiveness_check/{user_id}"
+LIGHT_PATH = "/admin/db-pool"
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def install(app, SessionLocal, slow_seconds: float):
+    """get_db contra la base del chequeo, la llamada lenta y la ruta async de comparación."""
+    def check_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = check_db
+
+    original = crud.get_user_by_id
+    def slow_get_user_by_id(db, user_id):
+        time.sleep(slow_seconds)  # la "consulta" bloqueada: ocupa el hilo que la llama
+        return original(db, user_id)
+    crud.get_user_by_id = slow_get_user_by_id
+
+    async def slow_async(user_id: int):
+        with SessionLocal() as db:
+            user = crud.get_user_by_id(db, user_id)  # sin threadpool: bloquea el event loop
+            return {"id": user.id if user else None}
+    app.add_api_route(ASYNC_SLOW_PATH, slow_async, methods=["GET"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Una llamada lenta a la BD no debe frenar las demás peticiones.")
+    parser.add_argument("--url", required=True, help="URL de la base (p. ej. generada con benchmarks.synthetic)")
+    parser.add_argument("--slow-seconds", type=float, default=3.0, help="Duración de la llamada lenta")
+    parser.add_argument("--light", type=int, default=10, help="Peticiones livianas simultáneas")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Tiempo máximo de cada petición liviana (por defecto, la ráfaga sola + --slow-seconds/2)")
+    parser.add_argument("--async-handler", action="store_true", help="Hace la llamada lenta desde una ruta async (reproduce el bloqueo)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url, **engine_options(args.url))
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    with SessionLocal() as db:
+        admin = db.scalar(select(models.User).where(models.User.role == "admin", models.User.email != None).limit(1))
+        if admin is None:
+            raise SystemExit("La base no tiene un admin con email: ejecute primero benchmarks.synthetic.")
+        admin_id, admin_email = admin.id, admin.email
+
+    from app.main import app
+    install(app, SessionLocal, args.slow_seconds)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}/gestion"
+    cookies = {"access_token": auth.create_access_token({"sub": admin_email})}
+    slow_path = (ASYNC_SLOW_PATH if args.async_handler else SLOW_PATH).format(user_id=admin_id)
+
+    def timed_get(path):
+        start = time.perf_counter()
+        with httpx.Client(base_url=base_url, cookies=cookies, timeout=max(30.0, args.slow_seconds * 10)) as client:
+            status = client.get(path).status_code
+        return status, (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.light + 1) as pool:
+        timed_get(LIGHT_PATH)  # calentamiento (plantillas, conexiones, imports perezosos)
+        # Referencia: la misma ráfaga sin la llamada lenta
+        alone = [f.result() for f in [pool.submit(timed_get, LIGHT_PATH) for _ in range(args.light)]]
+        alone_max = max(ms for _, ms in alone)
+        budget_ms = args.budget_ms or alone_max + args.slow_seconds * 1000 / 2
+
+        slow = pool.submit(timed_get, slow_path)
+        time.sleep(min(0.3, args.slow_seconds / 4))  # la lenta ya está esperando su llamada
+        light = [f.result() for f in [pool.submit(timed_get, LIGHT_PATH) for _ in range(args.light)]]
+        slow_status, slow_ms = slow.result()
+    server.should_exit = True
+
+    times = [ms for _, ms in light]
+    errors = [status for status, _ in light if status != 200] + ([slow_status] if slow_status != 200 else [])
+    print(f"Ruta lenta {'async' if args.async_handler else 'síncrona (threadpool)'}: {slow_ms:.0f} ms "
+          f"(llamada de {args.slow_seconds * 1000:.0f} ms)")
+    print(f"{args.light} livianas simultáneas: mediana {statistics.median(times):.0f} ms | "
+          f"máx {max(times):.0f} ms (solas: máx {alone_max:.0f} ms | presupuesto {budget_ms:.0f} ms)")
+    if errors:
+        print(f"FALLA: respuestas con error: {errors}")
+        sys.exit(1)
+    if max(times) > budget_ms:
+        print("FALLA: las peticiones livianas esperaron a la llamada lenta.")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/startup_budget.py
+"""
+Presupuesto de arranque: mide cuánto tarda 'import app.main' en un proceso nuevo
+(lo que paga cada worker de uvicorn) y verifica que importar no abra conexiones a la BD.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.startup_budget --runs 5 --budget-ms 2500
+
+Sale con código 1 si la mediana supera el presupuesto o si el import tocó la BD,
+para poder usarlo en CI o antes de un despliegue.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Se ejecuta en un proceso limpio: sin módulos ya cargados que falseen el tiempo.
+CHILD_CODE = """
+import json, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+from app.db import get_pool_stats
+stats = get_pool_stats()  # también con pools sin checkedout() (StaticPool, NullPool)
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "db_checkouts": stats["checkouts"] + stats["checked_out"],
+}))
+"""
+
+def measure_once() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE],
+        capture_output=True, text=True, check=True
+    ).stdout
+    # La última línea es el JSON; lo anterior son prints de la app
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de 'import app.main' contra un presupuesto.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2500.0)
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    times = [s["import_ms"] for s in samples]
+    median = statistics.median(times)
+    touched_db = any(s["db_checkouts"] for s in samples)
+
+    print(f"import app.main: mediana {median:.0f} ms | min {min(times):.0f} ms | max {max(times):.0f} ms "
+          f"({args.runs} procesos, presupuesto {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if median > args.budget_ms:
+        print("FALLA: el arranque supera el presupuesto.")
+        failed = True
+    if touched_db:
+        print("FALLA: importar la app abrió conexiones a la BD.")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
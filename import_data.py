@@ -1,6 +1,7 @@
 import os
 import csv
-from app import models
+import argparse
+from app import crud
 from app.db import SessionLocal
 from sqlalchemy.orm import Session
 
@@ -9,133 +10,111 @@ ADMIN_EMAIL = 'afernandezl@uandina.edu.pe'
 HR_EMAIL = 'rhumanos@uandina.edu.pe'
 CSV_FILENAME = "usuarios.csv"
 
-def import_data():
-    print("🚀 INICIANDO CARGA (CON NOMBRES DE JEFES)...")
+# Sincronización incremental con el archivo maestro de RRHH (por email):
+# altas, cambios de nombre/área/rol, reactivaciones, bajas lógicas (is_active=False) y cambios de jefe.
+# No borra usuarios ni historial (vacaciones, logs, modificaciones, suspensiones).
+# Todo se aplica en una sola transacción; con --dry-run solo se muestra el plan.
+#
+#   python import_data.py --dry-run
+#   python import_data.py --csv /ruta/usuarios.csv
+
+def read_csv(csv_path: str) -> dict:
+    """Filas del archivo por email. Los jefes que no tienen fila propia se agregan como usuarios 'fantasma'."""
+    rows = {}
+    with open(csv_path, mode='r', encoding='utf-8-sig') as f:
+        # Detectar delimitador automáticamente (; o ,)
+        line = f.readline()
+        delimiter = ';' if ';' in line else ','
+        f.seek(0)
+
+        reader = csv.DictReader(f, delimiter=delimiter)
+        bosses = {}
+
+        for row in reader:
+            # Limpieza de datos del empleado
+            email = (row.get("CORREO") or "").strip().lower()
+            name = (row.get("NOMBRES") or "").strip()
+            area = (row.get("AREA") or "").strip()
+
+            # Limpieza de datos del jefe
+            boss_email = (row.get("CORREO_JEFE") or "").strip().lower()
+            boss_name = (row.get("NOMBRE_JEFE") or "").strip()
+
+            if not email or "@" not in email: continue
+
+            # (Si el email se repite, gana la última fila)
+            rows[email] = {"full_name": name, "area": area, "manager_email": None, "is_boss": False}
+
+            if boss_email and "@" in boss_email:
+                rows[email]["manager_email"] = boss_email
+                # Nombre y área del jefe por si no tiene fila propia: los de su primer subordinado
+                bosses.setdefault(boss_email, {
+                    "full_name": boss_name or f"Jefe ({boss_email.split('@')[0]})",
+                    "area": area,
+                })
+
+    for boss_email, data in bosses.items():
+        if boss_email not in rows:
+            print(f"   ✨ Jefe sin fila propia: {boss_email} -> {data['full_name']}")
+            rows[boss_email] = {"full_name": data["full_name"], "area": data["area"], "manager_email": None,
+                               "is_boss": True, "phantom": True}
+        else:
+            rows[boss_email]["is_boss"] = True
+    return rows
+
+def print_plan(plan: dict, limit: int = 20):
+    print(f"   Nuevos: {len(plan['new'])} | Con cambios: {len(plan['changed'])} | "
+          f"Desactivados: {len(plan['deactivated'])} | Cambios de jefe: {len(plan['manager_changes'])}")
+    for u in plan["new"][:limit]:
+        print(f"   + {u['email']} ({u['role']}, {u['area']})")
+    for c in plan["changed"][:limit]:
+        detail = ", ".join(f"{field}: {old!r} -> {new!r}" for field, (old, new) in c["changes"].items())
+        print(f"   ~ {c['email']}: {detail}")
+    for d in plan["deactivated"][:limit]:
+        print(f"   - {d['email']} ({d['full_name']})")
+    for m in plan["manager_changes"][:limit]:
+        print(f"   ↳ {m['email']}: jefe {m['old'] or '(ninguno)'} -> {m['new']}")
+    shown = max(len(v) for v in plan.values()) if any(plan.values()) else 0
+    if shown > limit:
+        print(f"   ... (se muestran hasta {limit} por tipo)")
+
+def import_data(csv_path: str = None, dry_run: bool = False):
+    print("🚀 SINCRONIZANDO USUARIOS CON EL ARCHIVO DE RRHH..." + (" (DRY-RUN)" if dry_run else ""))
+    csv_path = csv_path or os.path.join(os.path.dirname(__file__), CSV_FILENAME)
     db: Session = SessionLocal()
 
     try:
-        # 1. LIMPIEZA
-        print("\n[1/4] Limpiando base de datos...")
-        db.query(models.VacationLog).delete()
-        db.query(models.SuspensionRequest).delete()
-        db.query(models.ModificationRequest).delete()
-        db.query(models.VacationPeriod).delete()
-        db.query(models.User).update({models.User.manager_id: None})
-        db.commit()
-        db.query(models.User).delete()
-        db.commit()
-        print("✅ Base de datos limpia.")
-
-        # 2. LECTURA
-        print("\n[2/4] Leyendo archivo...")
-        script_dir = os.path.dirname(__file__)
-        csv_path = os.path.join(script_dir, CSV_FILENAME)
-
-        users_to_create = {}
-        relationships = []
-
-        with open(csv_path, mode='r', encoding='utf-8-sig') as f:
-            # Detectar delimitador automáticamente (; o ,)
-            line = f.readline()
-            delimiter = ';' if ';' in line else ','
-            f.seek(0)
-            
-            reader = csv.DictReader(f, delimiter=delimiter)
-            
-            for row in reader:
-                # Limpieza de datos del empleado
-                email = row.get("CORREO", "").strip().lower()
-                name = row.get("NOMBRES", "").strip()
-                area = row.get("AREA", "").strip()
-                
-                # Limpieza de datos del jefe
-                boss_email = row.get("CORREO_JEFE", "").strip().lower()
-                boss_name = row.get("NOMBRE_JEFE", "").strip() # <--- CAPTURAR NOMBRE DEL JEFE
-
-                if not email or "@" not in email: continue
-
-                # Guardar Empleado Principal
-                # (Si ya existe, se actualiza con los datos de esta fila)
-                users_to_create[email] = {
-                    "username": email.split('@')[0],
-                    "full_name": name,
-                    "email": email,
-                    "role": "employee", # Se ajustará a manager más abajo si corresponde
-                    "area": area
-                }
-                
-                # Procesar Jefe
-                if boss_email and "@" in boss_email:
-                    relationships.append((email, boss_email))
-                    
-                    # Si el jefe NO está en la lista de usuarios aún, lo creamos (Fantasma)
-                    if boss_email not in users_to_create:
-                        
-                        # Usar el nombre del CSV si existe, sino uno genérico
-                        final_boss_name = boss_name if boss_name else f"Jefe ({boss_email.split('@')[0]})"
-                        
-                        print(f"   ✨ Creando jefe fantasma: {boss_email} -> {final_boss_name}")
-                        
-                        users_to_create[boss_email] = {
-                            "username": boss_email.split('@')[0],
-                            "full_name": final_boss_name, # <--- AQUI USAMOS EL NOMBRE REAL
-                            "email": boss_email,
-                            "role": "manager",
-                            "area": area # Asumimos el área del subordinado
-                        }
-                    
-                    # Si el jefe YA existe (porque se cargó como empleado antes o después), 
-                    # nos aseguramos de que tenga el rol de manager.
-                    elif users_to_create[boss_email]["role"] == "employee":
-                        users_to_create[boss_email]["role"] = "manager"
-
-        # 3. INSERCIÓN
-        print(f"\n[3/4] Insertando {len(users_to_create)} usuarios...")
-        
-        # Asignar Roles Especiales (Admin / HR)
-        if ADMIN_EMAIL in users_to_create: users_to_create[ADMIN_EMAIL]["role"] = "admin"
-        if HR_EMAIL in users_to_create: users_to_create[HR_EMAIL]["role"] = "hr"
-
-        db_objects = []
-        for data in users_to_create.values():
-            u = models.User(
-                username=data["username"],
-                full_name=data["full_name"],
-                email=data["email"],
-                role=data["role"],
-                area=data["area"],
-                vacation_days_total=30
-            )
-            db_objects.append(u)
-        
-        db.add_all(db_objects)
-        db.commit()
-        print("✅ Usuarios creados.")
-
-        # 4. VINCULACIÓN
-        print("\n[4/4] Conectando jerarquías...")
-        email_to_id = {u.email: u.id for u in db.query(models.User).all()}
-        
-        links = 0
-        for emp_email, boss_email in relationships:
-            emp_id = email_to_id.get(emp_email)
-            boss_id = email_to_id.get(boss_email)
-            
-            if emp_id and boss_id:
-                db.query(models.User).filter(models.User.id == emp_id).update({"manager_id": boss_id})
-                links += 1
-        
-        db.commit()
-        print(f"✅ {links} vínculos creados exitosamente.")
+        print("\n[1/3] Leyendo archivo...")
+        rows = read_csv(csv_path)
+        print(f"✅ {len(rows)} usuarios en el archivo.")
+
+        print("\n[2/3] Comparando con la base de datos...")
+        plan = crud.plan_user_sync(db, rows, special_roles={ADMIN_EMAIL: "admin", HR_EMAIL: "hr"})
+        print_plan(plan)
+
+        if dry_run:
+            print("\n[3/3] Dry-run: no se aplicó ningún cambio.")
+            return plan
+        if not any(plan.values()):
+            print("\n[3/3] Sin cambios: la base ya está al día.")
+            return plan
+
+        print("\n[3/3] Aplicando cambios (una transacción)...")
+        crud.apply_user_sync(db, plan)
+        print("✅ Sincronización aplicada.")
+        return plan
 
     except FileNotFoundError:
-        print(f"❌ ERROR: No encuentro '{CSV_FILENAME}' en la carpeta.")
+        print(f"❌ ERROR: No encuentro '{csv_path}'.")
     except Exception as e:
-        print(f"❌ ERROR: {str(e)}")
-        db.rollback()
+        print(f"❌ ERROR: {str(e)} (no se aplicó ningún cambio)")
     finally:
         db.close()
-        print("\n✨ CARGA COMPLETA ✨")
+        print("\n✨ SINCRONIZACIÓN COMPLETA ✨")
 
 if __name__ == "__main__":
-    import_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sincroniza los usuarios con el archivo maestro de RRHH (por email).")
+    parser.add_argument("--csv", default=None, help=f"Ruta del archivo (por defecto {CSV_FILENAME} junto a este script)")
+    parser.add_argument("--dry-run", action="store_true", help="Muestra los cambios sin aplicarlos")
+    args = parser.parse_args()
+    import_data(args.csv, dry_run=args.dry_run)
@@ -1,5 +1,29 @@
 
-# helper to initialize DB tables (if running without Alembic)
-from app.db import engine, Base
-print("Creating tables...")
-print("Done.")
+# helper to initialize DB tables (if running without Alembic) and seed default data
+# Uso:
+#   python init_db.py                  -> solo siembra (idempotente)
+#   python init_db.py --create-tables  -> crea tablas faltantes y siembra
+import argparse
+
+from app.db import engine, Base, SessionLocal
+from app import crud, models  # noqa: F401  (registra los modelos en Base.metadata)
+
+def main():
+    parser = argparse.ArgumentParser(description="Inicializa la BD del sistema de vacaciones.")
+    parser.add_argument("--create-tables", action="store_true", help="Crear tablas con metadata.create_all (sin Alembic)")
+    args = parser.parse_args()
+
+    if args.create_tables:
+        print("Creating tables...")
+        Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        created = crud.seed_initial_data(db)
+    finally:
+        db.close()
+    print(f"Ajustes por defecto creados: {created}")
+    print("Done.")
+
+if __name__ == "__main__":
+    main()